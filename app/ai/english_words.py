@@ -0,0 +1,95 @@
+"""
+English cooking vocabulary for the translator's short-query check.
+
+langdetect cannot tell a one- to few-word query apart ("pasta" -> lv,
+"beef stew" -> af), so short ASCII queries made only of these words are
+taken as English. The list is hand-picked, not taken from the corpus: a
+recipe corpus also holds "pollo", "con", "queso", "de", ... and those
+must keep going to the translator. Function words of other languages
+("al", "de", "con", "la", "mit", "med", "et", "di", "e") and dish names
+that read as foreign ("carne", "pollo", "queso") are deliberately left
+out. Loanwords used as is in English menus (pasta, salsa, taco, ...)
+are in: translating them would not change the query.
+
+Plurals are matched by english_word(), not listed.
+"""
+
+ENGLISH_FOOD_WORDS = frozenset(
+    """
+    almond anchovy appetizer apple apricot artichoke arugula asparagus avocado
+    bacon bagel baguette bake baked baking balsamic banana barbecue barley
+    basil bass batter bbq bean beef beer beet berry biscuit bisque black
+    blackberry blue blueberry boil boiled bok bone boneless bourbon bowl
+    braised bran brandy bread breadcrumb breaded breakfast breast brie brine
+    brisket broccoli broil broth brown brownie brunch brussels buckwheat
+    bun burger burrito butter buttermilk butternut cabbage cajun cake candy
+    canned cantaloupe caper caramel caramelized carrot casserole cashew
+    catfish cauliflower celery cereal cheddar cheese cheesecake cherry
+    chestnut chewy chicken chickpea chili chilled chip chipotle chive
+    chocolate chop chopped chowder chunky cider cilantro cinnamon citrus
+    clam classic clove cobbler cocktail cocoa coconut cod coffee cold
+    coleslaw collard cookie corn cornbread cornmeal cottage crab cracker
+    cranberry cream creamed creamy crisp crispy crouton crumb crumble
+    crunchy crust crusted cucumber cumin cupcake curd curry custard cutlet
+    dairy date delicious dessert deviled dill dinner dip dough doughnut
+    dressing dried drink duck dumpling easy egg eggplant eggnog enchilada
+    fajita fast fat fennel feta fig filet fillet fish flank flatbread flour
+    fluffy fondue free french fresh fried frittata fritter frosting frozen
+    fruit fry fudge game garden garlic garlicky gelatin ginger gingerbread
+    glaze glazed gluten goat golden goose grain granola grape grapefruit
+    gravy greek green grill grilled grits ground guacamole gumbo halibut
+    ham hamburger hash hazelnut healthy hearty herb herbed holiday homemade
+    honey horseradish hot hummus ice icing indian italian jalapeno jam
+    jelly jerk juice juicy kale kebab ketchup kid kidney kiwi lamb lasagna
+    leek leftover lemon lemonade lentil lettuce light lime liver lobster
+    loaf loin low lunch macaroni mango maple marinade marinated marmalade
+    marshmallow mashed mayonnaise meal meat meatball meatless meatloaf
+    mediterranean melon meringue mexican milk mince minced mint mixed
+    molasses moist muffin mushroom mussel mustard noodle nut nutmeg oat
+    oatmeal octopus oil olive omelet omelette onion orange oregano organic
+    oven oxtail oyster pancake paprika parfait parmesan parsley parsnip
+    party pasta pastry pea peach peanut pear pecan pepper peppermint
+    pepperoni pesto pickle pickled pie pineapple pistachio pita pizza
+    plum poached pomegranate popcorn popover pork porridge pot potato
+    poultry pound prawn pretzel protein pudding pulled pumpkin punch puree
+    quiche quick quinoa rabbit radish raisin ranch raspberry raw recipe red
+    relish rhubarb rib rice ricotta roast roasted roll rolled rosemary rub
+    rum rye sage salad salami salmon salsa salt salted sandwich sauce
+    saucy sausage sauteed savory scallion scallop scone seafood seared
+    seasoned seasoning seed sesame shake shallot shellfish shepherd sherry
+    shortbread shortcake shredded shrimp side simple skillet slaw sloppy
+    slow smoked smoky smoothie snack snap soda soft sole sorbet souffle
+    soup sour sourdough soy spaghetti spice spiced spicy spinach spread
+    spring sprout squash squid steak steamed stew stewed stir stock
+    strawberry stuffed stuffing sugar summer sundae sunday supper sushi
+    sweet swiss syrup taco tangy tart tea tender teriyaki thai thanksgiving
+    thick thyme toast toasted toffee tofu tomato topping torte tortilla
+    trout truffle tuna turkey turmeric turnip vanilla veal vegan vegetable
+    vegetarian veggie venison vinaigrette vinegar waffle walnut warm wasabi
+    water watermelon wheat whipped white whole wild wine wing winter wrap
+    yam yeast yellow yogurt zesty zucchini
+    all any best but by cheap crock dairy few for from fun gluten good
+    healthy how in kids large leftovers less lots low made more my new
+    no not of off on one over pan party pot quick recipes sheet small
+    some style that top two under up using very what without your
+    breakfast lunch dinner dessert appetizers weeknight minute minutes
+    hour hours day week family easy simple ideas
+    bake boil braise broil brown chop cook cooked cooker cooking fry grill
+    marinate mash mix poach roast saute sear simmer slice steam stuff toss
+    whip instant pressure air fryer baked grilled
+    """.split()
+)
+
+
+def english_word(token: str) -> bool:
+    """
+    Whether token is in ENGLISH_FOOD_WORDS, directly or as a regular
+    plural (cookies, tomatoes, dishes), or is a number.
+    """
+    if token in ENGLISH_FOOD_WORDS or token.isdigit():
+        return True
+    if token.endswith("ies") and token[:-3] + "y" in ENGLISH_FOOD_WORDS:
+        return True
+    if token.endswith("es") and token[:-2] in ENGLISH_FOOD_WORDS:
+        return True
+    return token.endswith("s") and token[:-1] in ENGLISH_FOOD_WORDS
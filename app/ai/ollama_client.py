@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+
+from app.core.config import (
+    OLLAMA_BACKOFF_MS,
+    OLLAMA_BASE_URL,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_KEEPALIVE,
+    OLLAMA_RETRIES,
+)
+
+
+# Failures where the request was never sent, so sending it again is safe:
+# connection not established / no pool slot. Not RemoteProtocolError: the
+# connection can drop after the server ran the generation.
+_RETRY_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+)
+# Overloaded / unavailable: rejected before any work was done
+_RETRY_STATUS = {429, 503}
+
+
+class OllamaClient:
+    """
+    Pooled HTTP client for one Ollama server, sync and async.
+
+    Connections are kept alive and reused (max_connections in flight,
+    max_keepalive idle). Only failures where the request was not
+    processed are retried, with full-jitter exponential backoff; read
+    timeouts and other HTTP errors are returned / raised at once.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_BASE_URL,
+        max_connections: int = OLLAMA_MAX_CONNECTIONS,
+        max_keepalive: int = OLLAMA_MAX_KEEPALIVE,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 60.0,
+        retries: int = OLLAMA_RETRIES,
+        backoff_ms: float = OLLAMA_BACKOFF_MS,
+        backoff_cap_ms: float = 2000.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.backoff_ms = backoff_ms
+        self.backoff_cap_ms = backoff_cap_ms
+
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._timeout = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+
+        self._client: Optional[httpx.Client] = None
+        # one AsyncClient per event loop, with the guard that closes it
+        self._async_clients: Dict[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, AsyncIterator]] = {}
+        self._lock = threading.Lock()
+
+        self.retried = 0
+
+    # --------------------------------------------------------
+    # Clients (created on first use)
+    # --------------------------------------------------------
+
+    def _sync(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    base_url=self.base_url, limits=self._limits, timeout=self._timeout
+                )
+            return self._client
+
+    async def _async(self) -> httpx.AsyncClient:
+        """
+        The running loop's AsyncClient. Its connections belong to that
+        loop, so every loop (asyncio.run in scripts) gets its own, closed
+        on the same loop by a guard generator: asyncio.run and uvicorn
+        finalize async generators (shutdown_asyncgens) before closing the
+        loop. Clients of loops closed without that are dropped.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async_clients.get(loop)
+            if entry is not None:
+                return entry[0]
+            for stale in [other for other in self._async_clients if other.is_closed()]:
+                del self._async_clients[stale]
+            client = httpx.AsyncClient(base_url=self.base_url, limits=self._limits, timeout=self._timeout)
+            guard = self._close_with_loop(loop, client)
+            self._async_clients[loop] = (client, guard)
+
+        # first step registers the generator with the loop
+        await guard.__anext__()
+        return client
+
+    async def _close_with_loop(self, loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> AsyncIterator[None]:
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._async_clients.get(loop, (None,))[0] is client:
+                    del self._async_clients[loop]
+            await client.aclose()
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        """
+        Closes the sync client and the running loop's async client
+        (clients of other loops close with their loop).
+        """
+        with self._lock:
+            entry = self._async_clients.get(asyncio.get_running_loop())
+        if entry is not None:
+            await entry[1].aclose()
+        self.close()
+
+    # --------------------------------------------------------
+    # Requests
+    # --------------------------------------------------------
+
+    def post(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> httpx.Response:
+        client = self._sync()
+        for attempt in range(self.retries + 1):
+            try:
+                response = client.post(path, json=payload, timeout=self._request_timeout(timeout))
+            except _RETRY_ERRORS:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code not in _RETRY_STATUS or attempt >= self.retries:
+                    return response
+            self._count_retry()
+            time.sleep(self._backoff(attempt))
+        raise AssertionError("unreachable")
+
+    async def apost(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> httpx.Response:
+        client = await self._async()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await client.post(path, json=payload, timeout=self._request_timeout(timeout))
+            except _RETRY_ERRORS:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code not in _RETRY_STATUS or attempt >= self.retries:
+                    return response
+            self._count_retry()
+            await asyncio.sleep(self._backoff(attempt))
+        raise AssertionError("unreachable")
+
+    def _count_retry(self) -> None:
+        with self._lock:
+            self.retried += 1
+
+    def _request_timeout(self, timeout: Optional[float]):
+        if timeout is None:
+            return self._timeout
+        return httpx.Timeout(timeout, connect=min(timeout, 5.0))
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        ceiling = min(self.backoff_cap_ms, self.backoff_ms * (2 ** attempt))
+        return random.uniform(0.0, ceiling) / 1000.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"base_url": self.base_url, "retried": self.retried}
+
+
+# --------------------------------------------------------
+# Shared clients (one pool per server and process)
+# --------------------------------------------------------
+
+_clients: Dict[str, OllamaClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url: str = OLLAMA_BASE_URL) -> OllamaClient:
+    key = base_url.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = OllamaClient(key)
+        return client
+
+
+async def close_ollama_clients() -> None:
+    with _clients_lock:
+        clients: List[OllamaClient] = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        await client.aclose()
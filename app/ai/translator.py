@@ -1,17 +1,155 @@
-import requests
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import threading
+
+from langdetect import DetectorFactory, LangDetectException, detect_langs
+
+from app.ai.english_words import english_word
+from app.ai.ollama_client import OllamaClient, get_ollama_client
+from app.core.lru_cache import LRUCache
+from app.core.single_flight import SingleFlight
+from app.retrieval.tokenizer import tokenize
 
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma3:4b"
 TIMEOUT_SECONDS = 10
 
+# langdetect is randomized; fixed seed = same answer for the same text
+DetectorFactory.seed = 0
+
 
 class Translator:
+    """
+    Translates queries to English with the LLM, unless they already are:
+    ASCII ingredient lists, short ASCII queries (up to wordlist_max_words
+    tokens) made only of English cooking words (app.ai.english_words) and
+    text langdetect reads as English (with probability >= min_en_prob)
+    are returned as is. LLM translations are cached by normalized input
+    (memory LRU + optional SQLite file);
+    concurrent misses of the same input wait for one LLM call.
+    """
+
+    def __init__(
+        self,
+        cache_mb: float = 8,
+        cache_path: Optional[Path] = None,
+        cache_disk_rows: int = 100_000,
+        min_en_prob: float = 0.9,
+        client: Optional[OllamaClient] = None,
+        wordlist_max_words: int = 4,
+    ):
+        self.client = client or get_ollama_client()
+        self.min_en_prob = min_en_prob
+        self.wordlist_max_words = wordlist_max_words
+        self.cache = LRUCache(
+            max_bytes=int(cache_mb * 2**20), disk_path=cache_path, disk_max_rows=cache_disk_rows
+        )
+
+        self._lock = threading.Lock()
+        self._counts = {"english": 0, "cached": 0, "llm": 0}
+        self.flights = SingleFlight()
+
+    def translate(self, text: str, ingredients: bool = False) -> str:
+        """
+        ingredients: text is a joined ingredient list (no sentence, too
+        short for reliable language detection).
+        """
+        if not text or not text.strip():
+            return text
 
-    def translate(self, text: str) -> str:
+        result, key = self._fast_path(text, ingredients)
+        if result is None:
+            # concurrent misses of the same text share one LLM call
+            result = self.flights.do(key, lambda: self._llm(text, key))
+        return result
+
+    async def atranslate(self, text: str, ingredients: bool = False) -> str:
+        """
+        translate() without blocking the event loop: language detection
+        and the cache lookup (which may read SQLite) run in a worker
+        thread, the LLM call is awaited. Cache writes only queue the disk
+        row (see LRUCache), so they stay on the loop.
+        """
         if not text or not text.strip():
             return text
 
+        result, key = await asyncio.to_thread(self._fast_path, text, ingredients)
+        if result is None:
+            result = await self.flights.ado(key, lambda: self._allm(text, key))
+        return result
+
+    def _llm(self, text: str, key: str) -> str:
+        self._count("llm")
+        try:
+            response = self.client.post("/api/generate", self._payload(text), timeout=TIMEOUT_SECONDS)
+        except Exception as e:
+            raise RuntimeError(f"Translator connection failed: {e}")
+        result = self._parse(response)
+        self.cache.put(key, result)
+        return result
+
+    async def _allm(self, text: str, key: str) -> str:
+        self._count("llm")
+        try:
+            response = await self.client.apost("/api/generate", self._payload(text), timeout=TIMEOUT_SECONDS)
+        except Exception as e:
+            raise RuntimeError(f"Translator connection failed: {e}")
+        result = self._parse(response)
+        self.cache.put(key, result)
+        return result
+
+    def _fast_path(self, text: str, ingredients: bool) -> Tuple[Optional[str], str]:
+        """
+        (text itself or cached translation, cache key); None when the LLM is needed.
+        """
+        if self.is_english(text, ingredients=ingredients):
+            self._count("english")
+            return text, ""
+
+        key = _normalize(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("cached")
+            return cached, key
+
+        return None, key
+
+    def is_english(self, text: str, ingredients: bool = False) -> bool:
+        if not text.isascii():
+            return self._detect_english(text)
+        if ingredients:
+            return True
+
+        # langdetect has too little to go on in one to a few words
+        tokens = tokenize(text)
+        if 0 < len(tokens) <= self.wordlist_max_words and all(english_word(t) for t in tokens):
+            return True
+        return self._detect_english(text)
+
+    def _detect_english(self, text: str) -> bool:
+        try:
+            langs = detect_langs(text)
+        except LangDetectException:
+            # no letters (numbers, symbols): nothing to translate
+            return True
+        return any(lang.lang == "en" and lang.prob >= self.min_en_prob for lang in langs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["coalesced"] = self.flights.coalesced
+        total = sum(counts.values())
+        counts["requests"] = total
+        counts["llm_share"] = round(counts["llm"] / total, 4) if total else 0.0
+        counts["cache"] = self.cache.stats()
+        return counts
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def _payload(self, text: str) -> Dict[str, Any]:
         prompt = (
             "You are a translation engine.\n"
             "Translate the input to English only.\n"
@@ -21,7 +159,7 @@ class Translator:
             f"Input:\n{text}\n\nOutput:"
         )
 
-        payload = {
+        return {
             "model": MODEL_NAME,
             "prompt": prompt,
             "stream": False,
@@ -30,15 +168,7 @@ class Translator:
             }
         }
 
-        try:
-            response = requests.post(
-                OLLAMA_URL,
-                json=payload,
-                timeout=TIMEOUT_SECONDS
-            )
-        except Exception as e:
-            raise RuntimeError(f"Translator connection failed: {e}")
-
+    def _parse(self, response) -> str:
         if response.status_code != 200:
             raise RuntimeError(
                 f"Translator HTTP error {response.status_code}: {response.text}"
@@ -56,3 +186,7 @@ class Translator:
             raise RuntimeError("Translator output suspiciously long")
 
         return translated
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
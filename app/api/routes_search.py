@@ -1,6 +1,13 @@
-from fastapi import APIRouter
-from app.api.schemas import SearchRequest, SearchResponse
+from fastapi import APIRouter, HTTPException
+from app.api.schemas import (
+    BatchSearchRequest,
+    BatchSearchResponse,
+    SearchMeta,
+    SearchRequest,
+    SearchResponse,
+)
 from app.core.search_service import SearchService
+import app.core.container as container
 
 router = APIRouter()
 
@@ -8,6 +15,33 @@ search_service = SearchService()
 
 
 @router.post("/search", response_model=SearchResponse)
-def search_endpoint(request: SearchRequest):
-    results = search_service.search(request)
-    return SearchResponse(results=results, total=len(results))
+async def search_endpoint(request: SearchRequest):
+    meta = {}
+    try:
+        # translation awaited on the event loop, retrieval in the threadpool
+        results = await search_service.asearch(request, meta=meta)
+    except ValueError as e:
+        # invalid filters / retrieval mode
+        raise HTTPException(status_code=400, detail=str(e))
+    return SearchResponse(
+        results=results,
+        total=len(results),
+        meta=SearchMeta(**meta) if meta else None,
+    )
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+def search_batch_endpoint(request: BatchSearchRequest):
+    try:
+        batches = search_service.search_batch(request.requests)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    responses = [SearchResponse(results=r, total=len(r)) for r in batches]
+    return BatchSearchResponse(responses=responses, total=len(responses))
+
+
+@router.get("/stats/translation")
+def translation_stats():
+    # share of queries that needed the LLM (vs English fast path / cache)
+    return container.translator.stats()
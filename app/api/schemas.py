@@ -9,9 +9,26 @@ class SearchRequest(BaseModel):
     ingredients: Optional[List[str]] = None
     session_id: Optional[str] = None
 
-    # NEW: bm25 | vector | hybrid
+    # NEW: bm25 | vector | hybrid | two_stage
+    # (ingredient-only requests default to INGREDIENTS_RETRIEVAL_MODE)
     retrieval_mode: Optional[str] = None
 
+    # Hybrid score fusion: weighted | rrf | zscore (default HYBRID_FUSION)
+    fusion: Optional[str] = None
+
+    # ANN search knobs (ivf / ivfpq: nprobe, hnsw: ef_search)
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+
+    # Cross-encoder rerank of the top N within a time budget
+    # (default RERANK_TOP_N / RERANK_BUDGET_MS, 0 = no rerank)
+    rerank_top_n: Optional[int] = None
+    rerank_budget_ms: Optional[float] = None
+
+    # Metadata filters, e.g. {"source": "allrecipes", "totalTime": {"lte": 30}}
+    # (times in minutes, dates as "YYYY-MM-DD")
+    filters: Optional[Dict[str, Any]] = None
+
 
 class ResultItem(BaseModel):
     id: str
@@ -19,6 +36,33 @@ class ResultItem(BaseModel):
     metadata: Dict[str, Any]
 
 
+class SearchMeta(BaseModel):
+    # True when a hybrid leg missed its deadline (results from the other leg)
+    partial: bool = False
+    timed_out: List[str] = []
+    # Wall time per retrieval leg (bm25 / vector)
+    timings_ms: Dict[str, float] = {}
+    # Candidates fetched per leg, fetch rounds (adaptive depth) and fusion used
+    candidates: Dict[str, int] = {}
+    rounds: int = 1
+    fusion: Optional[str] = None
+    # Candidates re-scored by the cross-encoder (of them from its cache)
+    reranked: int = 0
+    rerank_cached: int = 0
+
+
 class SearchResponse(BaseModel):
     results: List[ResultItem]
     total: int
+    meta: Optional[SearchMeta] = None
+
+
+class BatchSearchRequest(BaseModel):
+    # Requests without session_id are stateless in a batch
+    requests: List[SearchRequest]
+
+
+class BatchSearchResponse(BaseModel):
+    # One response per request, in request order
+    responses: List[SearchResponse]
+    total: int
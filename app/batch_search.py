@@ -0,0 +1,80 @@
+"""
+Offline batch search: runs a file of queries through SearchService
+in-process (no HTTP) and writes one JSON line per query.
+
+Input lines are either plain query text or a JSON SearchRequest, e.g.
+    chicken coconut garlic
+    {"query": "pasta", "filters": {"totalTime": {"lte": 30}}, "retrieval_mode": "bm25"}
+
+Usage:
+    python -m app.batch_search queries.txt -o results.jsonl [--chunk 512]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from app.api.schemas import SearchRequest
+from app.core.search_service import SearchService
+from app.main import load_engine
+
+
+def read_requests(path: Path) -> Iterator[Tuple[int, SearchRequest]]:
+    with path.open("r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                yield line_no, SearchRequest(**json.loads(line))
+            else:
+                yield line_no, SearchRequest(query=line)
+
+
+def chunks(items: Iterator, size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("queries", type=Path, help="text (one query per line) or JSONL SearchRequests")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="JSONL output file")
+    parser.add_argument("--chunk", type=int, default=512, help="queries searched together")
+    args = parser.parse_args()
+
+    load_engine()
+    service = SearchService()
+
+    start = time.perf_counter()
+    done = 0
+
+    # chunked: memory stays bounded whatever the input size
+    with args.output.open("w", encoding="utf-8") as out:
+        for chunk in chunks(read_requests(args.queries), max(1, args.chunk)):
+            results = service.search_batch([request for _, request in chunk])
+
+            for (line_no, request), items in zip(chunk, results):
+                record = {
+                    "line": line_no,
+                    "request": request.model_dump(exclude_none=True),
+                    "results": [item.model_dump() for item in items],
+                    "total": len(items),
+                }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            done += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"[Batch] {done} queries | {done / elapsed:.1f} q/s")
+
+
+if __name__ == "__main__":
+    main()
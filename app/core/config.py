@@ -12,10 +12,104 @@ ACTIVE_DOMAIN = "structured_text"
 DATASET_FILE = "20170107-061401-recipeitems.json"
 
 # Retrieval
-RETRIEVER_TYPE = "hybrid"  # "hybrid" or "bm25" or "vector"
+RETRIEVER_TYPE = "hybrid"  # "hybrid" or "bm25" or "vector" or "two_stage"
+
+# Mode for requests with only an ingredient list (no query, no
+# retrieval_mode): BM25 candidates ranked by exact cosine, no ANN search
+INGREDIENTS_RETRIEVAL_MODE = "two_stage"  # None = default mode
 
 TOP_K = 20
 
+# Hybrid: BM25 and vector legs run concurrently, one in the request
+# thread and one on a shared pool. A pooled leg missing its deadline
+# (counted from when it starts) is dropped and the response flagged partial.
+# The timeout only bounds the pooled (vector) leg: BM25 runs inline in the
+# request thread and cannot be cut short, so a slow BM25 query (common
+# terms under a selective filter) still takes as long as it takes and
+# the request can exceed HYBRID_LEG_TIMEOUT_MS by that much.
+HYBRID_LEG_TIMEOUT_MS = 2000  # None = always wait for both legs
+HYBRID_LEG_WORKERS = 40  # one pooled leg per request: match the request threadpool (anyio default 40)
+
+# Hybrid score fusion: "weighted" (max-normalized BM25 + (cos+1)/2),
+# "rrf" (reciprocal rank) or "zscore"
+HYBRID_FUSION = "weighted"
+
+# Adaptive candidate depth: legs start at top_k * 2 and one leg is
+# fetched twice as deep while the fused top_k can still change (up to
+# top_k * 20; zscore always fetches top_k * 20). False = fixed top_k * 5
+# from both legs.
+HYBRID_ADAPTIVE_DEPTH = False
+
+# Ollama HTTP client (translation / Ollama embeddings): pooled keep-alive
+# connections; only requests that were never sent (connect / pool
+# errors) or were rejected (429 / 503) are retried, with jittered
+# exponential backoff
+OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_MAX_CONNECTIONS = 16
+OLLAMA_MAX_KEEPALIVE = 8
+OLLAMA_RETRIES = 2
+OLLAMA_BACKOFF_MS = 100
+
+# Translation: ASCII ingredient lists and queries detected as English
+# (probability >= TRANSLATE_MIN_EN_PROB) skip the LLM; LLM translations
+# are cached by normalized input, in memory and in a SQLite file in /data
+TRANSLATE_MIN_EN_PROB = 0.9
+# ASCII queries of at most this many words, all from the English cooking
+# wordlist (app/ai/english_words.py), count as English without langdetect,
+# which misreads short queries ("pasta" -> lv, "beef stew" -> af); 0 = off
+TRANSLATE_WORDLIST_MAX_WORDS = 4
+TRANSLATION_CACHE_MAX_MB = 8
+TRANSLATION_CACHE_FILE = "translation_cache.sqlite"  # None = memory only
+TRANSLATION_CACHE_DISK_ROWS = 100_000  # least recently used rows dropped beyond this
+
+# Cross-encoder reranking of the top RERANK_TOP_N results (0 = off),
+# overridable per request (rerank_top_n / rerank_budget_ms). Scoring
+# stops when the time budget is spent; pair scores are cached.
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_TOP_N = 0
+RERANK_BUDGET_MS = 200
+RERANK_CACHE_MAX_MB = 16
+
+# Cache of compiled metadata filter bitmaps (one byte per document each)
+FILTER_CACHE_MAX_MB = 32
+
+# BM25 query execution: "exhaustive" or "blockmax" (dynamic pruning)
+BM25_STRATEGY = "exhaustive"
+
+# Processes for the BM25 index build (0 = one per CPU core)
+BM25_BUILD_WORKERS = 0
+
+# Token positions in the BM25 index: phrase/proximity scoring and snippets
+# (about 12 bytes per token of extra index memory, so off by default)
+BM25_POSITIONS = False
+
+# Persisted BM25 index directory inside /data (next to faiss.index)
+BM25_INDEX_DIR = "bm25_index"
+
+# FAISS index type: "flat" (exact), "ivf", "hnsw" or "ivfpq", vector
+# storage ("float32", "float16", "int8", "pq") and build/search
+# parameters (see IndexSpec), e.g.
+# {"kind": "hnsw", "hnsw_m": 32, "ef_search": 64, "storage": "int8", "rescore": 4}
+VECTOR_INDEX_SPEC = {"kind": "flat"}
+
+# Embedding inference: "torch" (SentenceTransformer), "onnx" or
+# "onnx-int8" (ONNX Runtime; the model is exported once into /data/onnx)
+EMBED_BACKEND = "torch"
+
+# Processes embedding the corpus during index builds
+# (1 = in-process, 0 = one per CPU core; each worker loads its own model)
+EMBED_WORKERS = 1
+
+# Query embedding cache: memory cap and optional SQLite file inside /data
+# (written in batches by a background thread)
+EMBED_CACHE_MAX_MB = 64
+EMBED_CACHE_FILE = "embed_cache.sqlite"  # None = memory only
+EMBED_CACHE_DISK_ROWS = 200_000  # least recently used rows dropped beyond this
+
+# Vector build checkpoints: commit after this many vectors or seconds
+VECTOR_CHECKPOINT_VECTORS = 20000
+VECTOR_CHECKPOINT_SECONDS = 300
+
 
 # --------------------------------------------------
 # Paths
@@ -6,5 +6,6 @@ from app.ai.translator import Translator
 
 index_memory = IndexMemory()
 retriever = None
+reranker = None
 memory = SessionMemory()
 translator = Translator()
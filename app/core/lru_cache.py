@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import atexit
+import json
+import sqlite3
+import sys
+import threading
+import time
+
+
+# Rough per-entry bookkeeping cost (OrderedDict node, tuple, refs)
+_ENTRY_OVERHEAD = 100
+
+# Disk tier: pending writes are committed in one transaction at most
+# this often (or sooner once this many are queued)
+_FLUSH_INTERVAL_SEC = 0.5
+_FLUSH_BATCH = 512
+
+
+def _default_sizeof(value: Any) -> int:
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    return sys.getsizeof(value)
+
+
+def _json_encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def _json_decode(data: bytes) -> Any:
+    return json.loads(data.decode("utf-8"))
+
+
+class LRUCache:
+    """
+    Thread-safe LRU map bounded by an approximate memory budget.
+
+    Keys are strings. With disk_path, puts are also written to a SQLite
+    table and memory misses fall back to it, so entries survive restarts
+    (and are shared by processes using the same file). Writes are queued
+    and committed in batches by a background thread, never under the
+    cache lock; the table keeps at most disk_max_rows rows, dropping the
+    least recently used. encode/decode turn values into bytes for that
+    tier (JSON by default).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        sizeof: Callable[[Any], int] = _default_sizeof,
+        disk_path: Optional[Path] = None,
+        encode: Callable[[Any], bytes] = _json_encode,
+        decode: Callable[[bytes], Any] = _json_decode,
+        disk_max_rows: int = 100_000,
+    ):
+        self.max_bytes = int(max_bytes)
+        self.disk_max_rows = int(disk_max_rows)
+        self._sizeof = sizeof
+        self._encode = encode
+        self._decode = decode
+
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.disk_writes = 0
+        self.disk_evictions = 0
+        self.disk_errors = 0
+
+        # disk tier: readers share one connection (own lock), the writer
+        # thread has its own; WAL lets them run concurrently
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending: Dict[str, Any] = {}
+        self._touched: Dict[str, float] = {}
+        self._wake = threading.Condition(threading.Lock())
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+
+        if disk_path is not None:
+            self._disk_path = str(disk_path)
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = self._connect()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB)")
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(cache)")}
+            if "used" not in columns:
+                # tables written before the row cap existed
+                self._db.execute("ALTER TABLE cache ADD COLUMN used REAL NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache (used)")
+            self._db.commit()
+            atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._disk_path, timeout=5.0, check_same_thread=False)
+
+    # --------------------------------------------------------
+    # Access
+    # --------------------------------------------------------
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            if self._db is None:
+                self.misses += 1
+                return None
+
+        value = self._read_disk(key)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self._insert(key, value)
+            self.disk_hits += 1
+        self._enqueue(touched=key)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._insert(key, value)
+        if self._db is not None:
+            self._enqueue(key=key, value=value)
+
+    # --------------------------------------------------------
+    # Disk tier
+    # --------------------------------------------------------
+
+    def _read_disk(self, key: str) -> Optional[Any]:
+        with self._wake:
+            # queued but not committed yet (and dropped from memory)
+            if key in self._pending:
+                return self._pending[key]
+        try:
+            with self._db_lock:
+                row = self._db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            self._disk_error("read", e)
+            return None
+        return self._decode(row[0]) if row is not None else None
+
+    def _enqueue(self, key: Optional[str] = None, value: Any = None, touched: Optional[str] = None) -> None:
+        with self._wake:
+            if self._closed:
+                return
+            if key is not None:
+                self._pending[key] = value
+            if touched is not None:
+                self._touched[touched] = time.time()
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="lru-cache-writer", daemon=True)
+                self._writer.start()
+            if len(self._pending) >= _FLUSH_BATCH:
+                self._wake.notify()
+
+    def _write_loop(self) -> None:
+        db = self._connect()
+        while True:
+            with self._wake:
+                if not self._closed and len(self._pending) < _FLUSH_BATCH:
+                    self._wake.wait(_FLUSH_INTERVAL_SEC)
+                pending, self._pending = self._pending, {}
+                touched, self._touched = self._touched, {}
+                closed = self._closed
+            if pending or touched:
+                self._write(db, pending, touched)
+            if closed:
+                db.close()
+                return
+
+    def _write(self, db: sqlite3.Connection, pending: Dict[str, Any], touched: Dict[str, float]) -> None:
+        now = time.time()
+        try:
+            db.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, used) VALUES (?, ?, ?)",
+                [(key, self._encode(value), now) for key, value in pending.items()],
+            )
+            db.executemany(
+                "UPDATE cache SET used = ? WHERE key = ?",
+                [(used, key) for key, used in touched.items() if key not in pending],
+            )
+            (rows,) = db.execute("SELECT COUNT(*) FROM cache").fetchone()
+            excess = rows - self.disk_max_rows
+            if excess > 0:
+                db.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used LIMIT ?)",
+                    (excess,),
+                )
+            db.commit()
+        except sqlite3.Error as e:
+            # best effort ("database is locked" past the busy timeout): the
+            # entries stay in memory, they just do not reach the file
+            db.rollback()
+            self._disk_error("write", e)
+            return
+
+        with self._lock:
+            self.disk_writes += len(pending)
+            self.disk_evictions += max(0, excess)
+
+    def _disk_error(self, op: str, error: Exception) -> None:
+        with self._lock:
+            self.disk_errors += 1
+        print(f"[LRUCache] disk {op} failed: {error}")
+
+    def flush(self) -> None:
+        """
+        Commits the queued disk writes now (in the calling thread).
+        """
+        if self._db is None:
+            return
+        with self._wake:
+            pending, self._pending = self._pending, {}
+            touched, self._touched = self._touched, {}
+        if pending or touched:
+            with self._db_lock:
+                self._write(self._db, pending, touched)
+
+    def close(self) -> None:
+        """
+        Stops the writer after it commits what is queued.
+        """
+        with self._wake:
+            if self._closed:
+                return
+            self._closed = True
+            writer = self._writer
+            self._wake.notify()
+        if writer is not None:
+            writer.join(timeout=10)
+        self.flush()
+
+    def _insert(self, key: str, value: Any) -> None:
+        size = self._sizeof(value) + sys.getsizeof(key) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._bytes -= self._sizes[key]
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            old_key, _ = self._entries.popitem(last=False)
+            self._bytes -= self._sizes.pop(old_key)
+            self.evictions += 1
+
+    # --------------------------------------------------------
+    # Introspection
+    # --------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+            if self._db is not None:
+                stats.update(
+                    disk_writes=self.disk_writes,
+                    disk_evictions=self.disk_evictions,
+                    disk_errors=self.disk_errors,
+                    disk_max_rows=self.disk_max_rows,
+                )
+            return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
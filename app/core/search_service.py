@@ -1,22 +1,78 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import re
+from fastapi.concurrency import run_in_threadpool
 from app.api.schemas import SearchRequest, ResultItem
 import app.core.container as container
-from app.core.config import TOP_K
+from app.core.config import (
+    INGREDIENTS_RETRIEVAL_MODE,
+    RERANK_BUDGET_MS,
+    RERANK_TOP_N,
+    TOP_K,
+)
+
+
+_QUOTED_RE = re.compile(r'"([^"]+)"')
 
 
 class SearchService:
 
-    def search(self, request: SearchRequest) -> List[ResultItem]:
+    def search(self, request: SearchRequest, meta: Optional[Dict[str, Any]] = None) -> List[ResultItem]:
+        """
+        meta (optional) is filled with retrieval stats: partial, timed_out,
+        timings_ms and candidates per leg, and the rerank counts.
+        """
         query_text = self._build_query_text(request)
         if not query_text:
             return []
 
-        session_id = request.session_id or "default"
+        doc_filter, rerank = self._validate(request)
 
         # 1) translate (translator must be strict translator; you required fail-fast)
-        translated_query = container.translator.translate(query_text)
+        # (English queries and ASCII ingredient lists skip the LLM)
+        translated_query = container.translator.translate(
+            query_text, ingredients=self._is_ingredient_list(request)
+        )
+
+        return self._search_translated(request, translated_query, doc_filter, rerank, meta)
+
+    async def asearch(self, request: SearchRequest, meta: Optional[Dict[str, Any]] = None) -> List[ResultItem]:
+        """
+        search() for async endpoints: the LLM translation is awaited on the
+        event loop, retrieval (CPU bound) runs in the threadpool.
+        """
+        query_text = self._build_query_text(request)
+        if not query_text:
+            return []
+
+        doc_filter, rerank = self._validate(request)
+
+        translated_query = await container.translator.atranslate(
+            query_text, ingredients=self._is_ingredient_list(request)
+        )
+
+        return await run_in_threadpool(
+            self._search_translated, request, translated_query, doc_filter, rerank, meta
+        )
+
+    def _validate(self, request: SearchRequest) -> Tuple[Any, Tuple[int, Optional[float]]]:
+        # compiled (and cached) before any translation / retrieval work,
+        # so an invalid filter fails fast
+        doc_filter = container.index_memory.compile_filter(request.filters)
+        return doc_filter, self._rerank(request)
+
+    def _search_translated(
+        self,
+        request: SearchRequest,
+        translated_query: str,
+        doc_filter: Any,
+        rerank: Tuple[int, Optional[float]],
+        meta: Optional[Dict[str, Any]],
+    ) -> List[ResultItem]:
+        session_id = request.session_id or "default"
+        rerank_n, budget_ms = rerank
 
         # 2) store in memory
         container.memory.store_query(session_id, translated_query)
@@ -31,19 +87,112 @@ class SearchService:
         enhanced_query = container.memory.build_enhanced_query(session_id, translated_query)
 
         # 4) retrieval mode switch (optional override)
-        mode = None
-        if request.retrieval_mode:
-            mode = request.retrieval_mode.strip().lower()
+        mode = self._retrieval_mode(request)
 
         # Router will fall back to its default_mode if mode is None
-        search_results = container.retriever.search(enhanced_query, TOP_K, mode=mode)
+        search_results = container.retriever.search(
+            enhanced_query,
+            max(TOP_K, rerank_n),
+            mode=mode,
+            phrases=self._extract_phrases(translated_query),
+            vector_params=self._vector_params(request),
+            doc_filter=doc_filter,
+            stats=meta,
+            fusion=request.fusion,
+        )
+
+        # 5) optional cross-encoder rerank of the head
+        if rerank_n:
+            search_results = container.reranker.rerank(
+                enhanced_query, search_results, rerank_n, budget_ms=budget_ms, stats=meta
+            )
+
+        return self._to_items(search_results[:TOP_K], enhanced_query, mode)
+
+    def search_batch(self, requests: List[SearchRequest]) -> List[List[ResultItem]]:
+        """
+        Many searches in one pass: each distinct query text is translated
+        once, and requests sharing retrieval mode, fusion, ANN knobs and
+        filters are retrieved together (one embed_batch + one matrix search,
+        BM25 scored across queries).
 
+        Requests with a session_id update and use their session in order,
+        like consecutive /search calls; requests without one are
+        stateless (no shared "default" session across the batch).
+        """
+        out: List[List[ResultItem]] = [[] for _ in requests]
+
+        texts = [self._build_query_text(r) for r in requests]
+        filters = [container.index_memory.compile_filter(r.filters) for r in requests]
+
+        translated: Dict[Tuple[str, bool], str] = {}
+        sources: List[Tuple[str, bool]] = []
+        for text, request in zip(texts, requests):
+            source = (text, self._is_ingredient_list(request))
+            sources.append(source)
+            if text and source not in translated:
+                translated[source] = container.translator.translate(text, ingredients=source[1])
+
+        groups: Dict[Tuple[Any, ...], List[int]] = {}
+        enhanced: List[str] = [""] * len(requests)
+        phrases: List[Optional[List[str]]] = [None] * len(requests)
+        modes: List[Optional[str]] = [None] * len(requests)
+
+        for i, request in enumerate(requests):
+            if not texts[i]:
+                continue
+            query = translated[sources[i]]
+
+            if request.session_id:
+                container.memory.store_query(request.session_id, query)
+                container.memory.store_terms(request.session_id, query.split())
+                enhanced[i] = container.memory.build_enhanced_query(request.session_id, query)
+            else:
+                enhanced[i] = query
+
+            phrases[i] = self._extract_phrases(query)
+            modes[i] = self._retrieval_mode(request)
+
+            params = self._vector_params(request)
+            key = (
+                modes[i],
+                filters[i].key if filters[i] is not None else None,
+                json.dumps(params, sort_keys=True),
+                request.fusion,
+                self._rerank(request)[0],
+            )
+            groups.setdefault(key, []).append(i)
+
+        for (*_, rerank_n), idx in groups.items():
+            first = idx[0]
+            batch_results = container.retriever.search_many(
+                [enhanced[i] for i in idx],
+                max(TOP_K, rerank_n),
+                mode=modes[first],
+                phrases=[phrases[i] for i in idx],
+                vector_params=self._vector_params(requests[first]),
+                doc_filter=filters[first],
+                fusion=requests[first].fusion,
+            )
+            for i, search_results in zip(idx, batch_results):
+                if rerank_n:
+                    search_results = container.reranker.rerank(
+                        enhanced[i], search_results, rerank_n, budget_ms=self._rerank(requests[i])[1]
+                    )
+                out[i] = self._to_items(search_results[:TOP_K], enhanced[i], modes[i])
+
+        return out
+
+    def _to_items(self, search_results: List[Dict], enhanced_query: str, mode: Optional[str]) -> List[ResultItem]:
+        # snippets only for what is returned (not every fused candidate)
+        container.retriever.add_snippets(search_results)
 
         results: List[ResultItem] = []
         for item in search_results:
             doc = item["document"]
             score = item["score"]
             matched_terms = item.get("matched_terms", [])
+            snippet = item.get("snippet")
 
             results.append(
                 ResultItem(
@@ -53,14 +202,65 @@ class SearchService:
                         "name": doc.metadata.get("name"),
                         "matched_terms": matched_terms,
                         "enhanced_query": enhanced_query,
-                        "preview": (doc.text or "")[:200],
+                        "preview": snippet or (doc.text or "")[:200],
+                        "phrase_matches": item.get("phrase_matches", []),
                         "retrieval_mode": mode,
+                        "rerank_score": item.get("rerank_score"),
                     },
                 )
             )
 
         return results
 
+    def _extract_phrases(self, query: str) -> List[str]:
+        """
+        Quoted parts of the query are explicit phrases; otherwise the
+        current query itself (not the session-enhanced one, whose word
+        order is lost) is used for proximity scoring.
+        """
+        quoted = _QUOTED_RE.findall(query or "")
+        if quoted:
+            return [q for q in quoted if q.strip()]
+        return [query] if query else []
+
+    def _retrieval_mode(self, request: SearchRequest) -> Optional[str]:
+        """
+        The requested mode; ingredient-only requests default to
+        INGREDIENTS_RETRIEVAL_MODE when the router has it.
+        """
+        if request.retrieval_mode:
+            return request.retrieval_mode.strip().lower()
+        if (
+            self._is_ingredient_list(request)
+            and INGREDIENTS_RETRIEVAL_MODE
+            and container.retriever.has_mode(INGREDIENTS_RETRIEVAL_MODE)
+        ):
+            return INGREDIENTS_RETRIEVAL_MODE
+        return None
+
+    def _is_ingredient_list(self, request: SearchRequest) -> bool:
+        return bool(request.ingredients) and not (request.query or "").strip()
+
+    def _rerank(self, request: SearchRequest) -> Tuple[int, Optional[float]]:
+        """
+        (top N to rerank, budget in ms); N = 0 when reranking is off.
+        """
+        top_n = request.rerank_top_n if request.rerank_top_n is not None else RERANK_TOP_N
+        if top_n < 0:
+            raise ValueError("rerank_top_n must be >= 0.")
+        if top_n and container.reranker is None:
+            raise ValueError("Reranking is not available.")
+        budget_ms = request.rerank_budget_ms if request.rerank_budget_ms is not None else RERANK_BUDGET_MS
+        return top_n, budget_ms
+
+    def _vector_params(self, request: SearchRequest) -> Dict[str, int]:
+        params = {}
+        if request.nprobe:
+            params["nprobe"] = request.nprobe
+        if request.ef_search:
+            params["ef_search"] = request.ef_search
+        return params
+
     def _build_query_text(self, request: SearchRequest) -> str:
         if request.query:
             return request.query.strip()
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import asyncio
+import threading
+
+
+class FlightAbandoned(Exception):
+    """
+    The leader was cancelled or interrupted before finishing: nothing to
+    share, the waiter should retry (and may lead the retry).
+    """
+
+
+class Flight:
+    """
+    One in-progress call. Waiters block (wait) or await (wait_async)
+    until the leader finishes it with a value or an exception, or
+    abandons it (FlightAbandoned).
+    """
+
+    __slots__ = ("value", "error", "abandoned", "_done", "_lock", "_async_waiters")
+
+    def __init__(self):
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.abandoned = False
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def wait(self) -> Any:
+        self._done.wait()
+        return self._result()
+
+    async def wait_async(self) -> Any:
+        with self._lock:
+            if not self._done.is_set():
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            else:
+                future = None
+        if future is not None:
+            await future
+        return self._result()
+
+    def _finish(self, value: Any, error: Optional[BaseException], abandoned: bool = False) -> None:
+        with self._lock:
+            self.value = value
+            self.error = error
+            self.abandoned = abandoned
+            self._done.set()
+            waiters, self._async_waiters = self._async_waiters, []
+
+        # the leader may run on another thread / loop than the waiters
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # loop closed: nobody left to wake
+
+    def _result(self) -> Any:
+        if self.abandoned:
+            raise FlightAbandoned()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller
+    (leader) does the work, callers arriving while it runs get its result
+    or its exception. Nothing is kept once the call is done; caching is
+    up to the caller. Sync and async callers of one key share the flight.
+
+    Only Exceptions are shared. A leader cancelled or interrupted
+    (CancelledError, KeyboardInterrupt, SystemExit: one client going
+    away) abandons the flight instead, and its waiters retry: the first
+    of them leads the new flight.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    def begin(self, key: Hashable) -> Tuple[Flight, bool]:
+        """
+        (flight, True) when the caller leads and must finish() it,
+        (flight, False) when the caller should wait on it.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.leaders += 1
+            return flight, True
+
+    def finish(
+        self,
+        key: Hashable,
+        flight: Flight,
+        value: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """
+        Hands value or error to the waiters; an error that is not an
+        Exception (cancellation, interrupt) abandons the flight instead.
+        """
+        if error is not None and not isinstance(error, Exception):
+            self.abandon(key, flight)
+            return
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight._finish(value, error)
+
+    def abandon(self, key: Hashable, flight: Flight) -> None:
+        """
+        Ends the flight without a result: waiters get FlightAbandoned.
+        """
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight._finish(None, None, abandoned=True)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        while True:
+            flight, leader = self.begin(key)
+            if leader:
+                break
+            try:
+                return flight.wait()
+            except FlightAbandoned:
+                continue  # leader interrupted: retry, maybe as leader
+
+        try:
+            value = fn()
+        except Exception as e:
+            self.finish(key, flight, error=e)
+            raise
+        except BaseException:
+            self.abandon(key, flight)
+            raise
+        self.finish(key, flight, value=value)
+        return value
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            flight, leader = self.begin(key)
+            if leader:
+                break
+            try:
+                return await flight.wait_async()
+            except FlightAbandoned:
+                continue  # leader cancelled: retry, maybe as leader
+
+        try:
+            value = await fn()
+        except Exception as e:
+            self.finish(key, flight, error=e)
+            raise
+        except BaseException:
+            self.abandon(key, flight)
+            raise
+        self.finish(key, flight, value=value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+            }
@@ -1,9 +1,15 @@
+from typing import Any, Dict
+
 from app.domain.base import DomainAdapter
+from app.domain.recipes import RECIPE_FILTER_FIELDS, RECIPE_FILTER_KEYS, recipe_filter_values
 from app.storage.models import Document
 
 
 class StructuredTextAdapter(DomainAdapter):
 
+    # Metadata filters on the recipe fields (see app.domain.recipes)
+    filter_fields = RECIPE_FILTER_FIELDS
+
     def normalize(self, raw_record: dict) -> Document:
 
         doc_id = raw_record.get("_id", {}).get("$oid")
@@ -18,9 +24,15 @@ class StructuredTextAdapter(DomainAdapter):
         metadata = {
             "name": name
         }
+        # filter inputs only: text and id are unchanged
+        for key in RECIPE_FILTER_KEYS:
+            metadata[key] = raw_record.get(key)
 
         return Document(
             id=doc_id,
             text=full_text,
             metadata=metadata
         )
+
+    def filter_values(self, document: Document) -> Dict[str, Any]:
+        return recipe_filter_values(document.metadata)
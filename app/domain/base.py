@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Any, Dict
 from app.storage.models import Document
 
 
@@ -8,6 +9,16 @@ class DomainAdapter(ABC):
     Engine should not know any domain-specific structure.
     """
 
+    # Filterable fields: name -> "keyword" | "number" | "date"
+    filter_fields: Dict[str, str] = {}
+
     @abstractmethod
     def normalize(self, raw_record: dict) -> Document:
         pass
+
+    def filter_values(self, document: Document) -> Dict[str, Any]:
+        """
+        Parsed values of filter_fields for one document
+        (str for keyword, float for number, "YYYY-MM-DD" for date, None if missing).
+        """
+        return {}
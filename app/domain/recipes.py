@@ -1,14 +1,49 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import re
+
 from app.domain.base import DomainAdapter
 from app.storage.models import Document
 
 
+# ISO 8601 durations as used by schema.org recipes: PT1H30M, P0DT0H20M, PT45M
+_DURATION_RE = re.compile(
+    r"^P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_DATE_RE = re.compile(r"^(\d{4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?")
+
+# Metadata filters on recipe records (times in minutes; totalTime =
+# cookTime + prepTime), shared by the recipe-shaped adapters
+RECIPE_FILTER_FIELDS = {
+    "source": "keyword",
+    "cookTime": "number",
+    "prepTime": "number",
+    "totalTime": "number",
+    "recipeYield": "number",
+    "datePublished": "date",
+}
+
+# Raw record keys recipe_filter_values() reads from document metadata
+RECIPE_FILTER_KEYS = ("source", "cookTime", "prepTime", "recipeYield", "datePublished")
+
+
 class RecipeDomainAdapter(DomainAdapter):
     """
     Domain adapter for recipe dataset.
     All cookbook-specific logic lives here.
     """
 
+    filter_fields = RECIPE_FILTER_FIELDS
+
+    def normalize(self, raw: Dict[str, Any]) -> Document:
+        return Document(
+            id=self.extract_id(raw),
+            text=self.build_text(raw),
+            metadata=self.build_metadata(raw),
+        )
+
     def extract_id(self, raw: Dict[str, Any]) -> str:
         """
         Extract Mongo-style ID safely.
@@ -21,8 +56,10 @@ class RecipeDomainAdapter(DomainAdapter):
         if raw_id:
             return str(raw_id)
 
-        # Fallback (should not happen normally)
-        return str(hash(str(raw)))
+        # Fallback (should not happen normally): stable across processes,
+        # unlike hash(), so persisted indexes and client ids stay valid
+        canonical = json.dumps(raw, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
 
     def build_text(self, raw: Dict[str, Any]) -> str:
         """
@@ -78,3 +115,60 @@ class RecipeDomainAdapter(DomainAdapter):
             "recipeYield": metadata.get("recipeYield"),
             "source": metadata.get("source"),
         }
+
+    def filter_values(self, document: Document) -> Dict[str, Any]:
+        return recipe_filter_values(document.metadata)
+
+
+def recipe_filter_values(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parsed RECIPE_FILTER_FIELDS from recipe metadata (raw record fields).
+    """
+    cook = parse_duration(metadata.get("cookTime"))
+    prep = parse_duration(metadata.get("prepTime"))
+    total = None
+    if cook is not None or prep is not None:
+        total = (cook or 0.0) + (prep or 0.0)
+
+    source = metadata.get("source")
+
+    return {
+        "source": str(source).strip().lower() if source else None,
+        "cookTime": cook,
+        "prepTime": prep,
+        "totalTime": total,
+        "recipeYield": parse_number(metadata.get("recipeYield")),
+        "datePublished": parse_date(metadata.get("datePublished")),
+    }
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """
+    ISO 8601 duration -> minutes ("PT1H30M" -> 90.0), None if empty or invalid.
+    """
+    m = _DURATION_RE.match(str(value or "").strip().upper())
+    if not m or not any(m.groupdict().values()):
+        return None
+    parts = {k: int(v or 0) for k, v in m.groupdict().items()}
+    return parts["days"] * 1440.0 + parts["hours"] * 60.0 + parts["minutes"] + parts["seconds"] / 60.0
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """
+    First number in a free-text field ("Serves 4-6" -> 4.0).
+    """
+    m = _NUMBER_RE.search(str(value or ""))
+    return float(m.group()) if m else None
+
+
+def parse_date(value: Any) -> Optional[str]:
+    """
+    "2013-03-12", "2013-03" or "2013" -> "YYYY-MM-DD" (missing parts = 01).
+    """
+    m = _DATE_RE.match(str(value or "").strip())
+    if not m:
+        return None
+    year, month, day = m.group(1), m.group(2) or "1", m.group(3) or "1"
+    if not (1 <= int(month) <= 12 and 1 <= int(day) <= 31):
+        return None
+    return f"{year}-{int(month):02d}-{int(day):02d}"
@@ -8,6 +8,7 @@ class DomainRegistry:
 
     _registry = {
         "structured_text": StructuredTextAdapter(),
+        "recipes": RecipeDomainAdapter(),
     }
 
     @classmethod
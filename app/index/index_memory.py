@@ -1,4 +1,6 @@
-from typing import List
+from typing import Any, Dict, List, Optional
+from app.core.config import FILTER_CACHE_MAX_MB
+from app.index.metadata_filter import DocFilter, MetadataFilterIndex
 from app.storage.models import Document
 
 
@@ -6,18 +8,57 @@ class IndexMemory:
 
     def __init__(self):
         self._documents: List[Document] = []
+        self._ordinals: Dict[str, int] = {}
+        self._filters: Optional[MetadataFilterIndex] = None
 
-    def load_documents(self, documents: List[Document]) -> None:
+    def load_documents(self, documents: List[Document], adapter: Any = None) -> None:
         """
-        Load normalized documents into memory.
+        Load normalized documents into memory and index their ids
+        (id -> position in the document list, first occurrence wins).
+        With a domain adapter that declares filter_fields, the metadata
+        filter columns are built as well.
         """
         self._documents = documents
 
+        ordinals: Dict[str, int] = {}
+        for i, doc in enumerate(documents):
+            ordinals.setdefault(str(doc.id), i)
+        self._ordinals = ordinals
+
+        self._filters = None
+        fields = getattr(adapter, "filter_fields", None)
+        if fields:
+            self._filters = MetadataFilterIndex.build(
+                documents,
+                fields,
+                adapter.filter_values,
+                cache_mb=FILTER_CACHE_MAX_MB,
+            )
+
     def get_all_documents(self) -> List[Document]:
         """
         Return all documents stored in memory.
         """
         return self._documents
 
+    def ordinal(self, doc_id: str) -> Optional[int]:
+        """
+        Position of the document with this id, or None.
+        """
+        return self._ordinals.get(str(doc_id))
+
+    def get_document(self, ordinal: int) -> Document:
+        return self._documents[ordinal]
+
+    def compile_filter(self, filters: Optional[Dict[str, Any]]) -> Optional[DocFilter]:
+        """
+        Document bitmap for structured filters (see MetadataFilterIndex).
+        """
+        if not filters:
+            return None
+        if self._filters is None:
+            raise ValueError("The active domain has no filterable fields.")
+        return self._filters.compile(filters)
+
     def __len__(self):
         return len(self._documents)
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+import json
+
+import numpy as np
+
+from app.core.lru_cache import LRUCache
+
+
+_RANGE_OPS = {"gt", "gte", "lt", "lte"}
+_OPS = _RANGE_OPS | {"eq", "in"}
+
+
+@dataclass(frozen=True)
+class DocFilter:
+    """
+    Compiled filter: one bit per document ordinal (IndexMemory position).
+    key is the canonical JSON of the filter, used for caching downstream.
+    """
+
+    key: str
+    mask: np.ndarray   # bool, len = number of documents
+    docs: np.ndarray   # sorted ordinals where mask is True
+
+    @property
+    def count(self) -> int:
+        return int(self.docs.size)
+
+
+class MetadataFilterIndex:
+    """
+    Columnar copy of the filterable metadata fields.
+
+    keyword : value codes (int32, -1 = missing); bitmaps of the most
+              common values are precomputed
+    number  : float64 (NaN = missing)
+    date    : datetime64[D] (NaT = missing)
+
+    Filters are {field: condition}, all fields must match:
+      "allrecipes"                 equal (case-insensitive for keywords)
+      ["allrecipes", "cookstr"]    any of
+      {"lte": 30, "gt": 0}         range (number / date), combined with AND
+      {"eq": ..., "in": [...]}     explicit forms
+    Compiled DocFilters are cached in an LRU bounded by cache_mb.
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, str],
+        columns: Dict[str, np.ndarray],
+        vocab: Dict[str, Dict[str, int]],
+        num_docs: int,
+        cache_mb: float = 32,
+        common_values: int = 32,
+    ):
+        self.fields = fields
+        self.columns = columns
+        self.vocab = vocab
+        self.num_docs = num_docs
+
+        self._cache = LRUCache(
+            max_bytes=int(cache_mb * 2**20),
+            sizeof=lambda f: f.mask.nbytes + f.docs.nbytes,
+        )
+
+        # precomputed bitmaps of frequent keyword values
+        self._common: Dict[str, Dict[int, np.ndarray]] = {}
+        for field, codes in columns.items():
+            if fields[field] != "keyword":
+                continue
+            counts = np.bincount(codes[codes >= 0], minlength=len(vocab[field]))
+            top = np.argsort(-counts, kind="stable")[:common_values]
+            self._common[field] = {int(c): codes == c for c in top if counts[c]}
+
+    # --------------------------------------------------------
+    # Build
+    # --------------------------------------------------------
+
+    @classmethod
+    def build(
+        cls,
+        documents: List[Any],
+        fields: Dict[str, str],
+        values: Callable[[Any], Dict[str, Any]],
+        **params: Any,
+    ) -> "MetadataFilterIndex":
+        n = len(documents)
+        vocab: Dict[str, Dict[str, int]] = {f: {} for f, t in fields.items() if t == "keyword"}
+        columns: Dict[str, np.ndarray] = {}
+
+        for field, kind in fields.items():
+            if kind == "keyword":
+                columns[field] = np.full(n, -1, dtype=np.int32)
+            elif kind == "number":
+                columns[field] = np.full(n, np.nan, dtype=np.float64)
+            elif kind == "date":
+                columns[field] = np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")
+            else:
+                raise ValueError(f"Unknown filter field type '{kind}' for {field}")
+
+        for i, doc in enumerate(documents):
+            for field, value in values(doc).items():
+                if value is None or field not in columns:
+                    continue
+                if fields[field] == "keyword":
+                    codes = vocab[field]
+                    value = str(value).strip().lower()
+                    columns[field][i] = codes.setdefault(value, len(codes))
+                else:
+                    columns[field][i] = value
+
+        return cls(fields, columns, vocab, n, **params)
+
+    # --------------------------------------------------------
+    # Compile
+    # --------------------------------------------------------
+
+    def compile(self, filters: Optional[Dict[str, Any]]) -> Optional[DocFilter]:
+        """
+        Bitmap of the documents matching every condition, or None when
+        there is nothing to filter. Raises ValueError on unknown fields
+        or operators.
+        """
+        if not filters:
+            return None
+
+        key = json.dumps(filters, sort_keys=True, default=str)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        mask = np.ones(self.num_docs, dtype=bool)
+        for field, condition in filters.items():
+            if field not in self.fields:
+                raise ValueError(
+                    f"Unknown filter field '{field}'. Filterable: {', '.join(sorted(self.fields))}."
+                )
+            mask &= self._field_mask(field, condition)
+
+        docs = np.flatnonzero(mask)
+        # shared through the cache: read-only
+        mask.setflags(write=False)
+        docs.setflags(write=False)
+
+        doc_filter = DocFilter(key=key, mask=mask, docs=docs)
+        self._cache.put(key, doc_filter)
+        return doc_filter
+
+    def _field_mask(self, field: str, condition: Any) -> np.ndarray:
+        if isinstance(condition, dict):
+            ops = condition
+        elif isinstance(condition, (list, tuple)):
+            ops = {"in": list(condition)}
+        else:
+            ops = {"eq": condition}
+
+        unknown = set(ops) - _OPS
+        if unknown:
+            raise ValueError(f"Unknown filter operator(s) {sorted(unknown)} for '{field}'.")
+
+        kind = self.fields[field]
+        column = self.columns[field]
+        mask = np.ones(self.num_docs, dtype=bool)
+
+        for op, value in ops.items():
+            if op == "eq":
+                mask &= self._in(field, [value])
+            elif op == "in":
+                if not isinstance(value, (list, tuple)):
+                    raise ValueError(f"'in' for '{field}' expects a list.")
+                mask &= self._in(field, list(value))
+            else:
+                if kind == "keyword":
+                    raise ValueError(f"Range operator '{op}' is not supported for keyword field '{field}'.")
+                bound = self._parse(field, value)
+                if op == "gt":
+                    mask &= column > bound
+                elif op == "gte":
+                    mask &= column >= bound
+                elif op == "lt":
+                    mask &= column < bound
+                else:
+                    mask &= column <= bound
+
+        return mask
+
+    def _in(self, field: str, values: List[Any]) -> np.ndarray:
+        column = self.columns[field]
+        mask = np.zeros(self.num_docs, dtype=bool)
+
+        if self.fields[field] != "keyword":
+            for value in values:
+                mask |= column == self._parse(field, value)
+            return mask
+
+        common = self._common.get(field, {})
+        for value in values:
+            code = self.vocab[field].get(str(value).strip().lower())
+            if code is None:
+                continue
+            mask |= common[code] if code in common else column == code
+        return mask
+
+    def _parse(self, field: str, value: Any):
+        try:
+            if self.fields[field] == "date":
+                return np.datetime64(str(value)[:10], "D")
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value {value!r} for filter field '{field}'.") from None
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
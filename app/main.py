@@ -5,12 +5,23 @@ from app.api.routes_search import router as search_router
 from app.ingest.loader import load_json_dataset
 from app.ingest.normalize import normalize_documents
 from app.retrieval.factory import create_retriever
+from app.retrieval.cross_encoder_reranker import CrossEncoderReranker
+from app.ai.translator import Translator
+from app.ai.ollama_client import close_ollama_clients
 from app.domain.registry import DomainRegistry
 import app.core.container as container
 from app.core.config import (
     ACTIVE_DOMAIN,
     DATASET_FILE,
     DATA_DIR,
+    RERANK_CACHE_MAX_MB,
+    RERANK_MODEL,
+    RERANK_TOP_N,
+    TRANSLATE_MIN_EN_PROB,
+    TRANSLATE_WORDLIST_MAX_WORDS,
+    TRANSLATION_CACHE_DISK_ROWS,
+    TRANSLATION_CACHE_FILE,
+    TRANSLATION_CACHE_MAX_MB,
 )
 
 
@@ -37,6 +48,19 @@ DATA_DIR = BASE_DIR / "data"
 
 @app.on_event("startup")
 def startup_event():
+    load_engine()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_ollama_clients()
+
+
+def load_engine():
+    """
+    Loads the dataset and builds (or loads) the indexes into the container.
+    Also used by offline tools (app.batch_search).
+    """
 
     dataset_path = DATA_DIR / DATASET_FILE
 
@@ -48,13 +72,27 @@ def startup_event():
 
     documents = normalize_documents(raw_data, adapter)
 
-    container.index_memory.load_documents(documents)
+    container.index_memory.load_documents(documents, adapter)
 
     container.retriever = create_retriever(
     index_memory=container.index_memory,
     data_dir=DATA_DIR,
+    dataset_path=dataset_path,
     )
 
+    container.translator = Translator(
+        cache_mb=TRANSLATION_CACHE_MAX_MB,
+        cache_path=DATA_DIR / TRANSLATION_CACHE_FILE if TRANSLATION_CACHE_FILE else None,
+        cache_disk_rows=TRANSLATION_CACHE_DISK_ROWS,
+        min_en_prob=TRANSLATE_MIN_EN_PROB,
+        wordlist_max_words=TRANSLATE_WORDLIST_MAX_WORDS,
+    )
+
+    # model loads on first use unless reranking is on by default
+    container.reranker = CrossEncoderReranker(RERANK_MODEL, cache_mb=RERANK_CACHE_MAX_MB)
+    if RERANK_TOP_N > 0:
+        container.reranker.load()
+
 
     print(f"Loaded {len(documents)} documents.")
     print("Index built.")
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.retrieval.bm25_index import BM25Index
+
+
+# Slack for float rounding when comparing upper bounds to the threshold
+_BOUND_EPS = 1e-9
+
+# Queries without a selective term go to the flat scan when more than this
+# share of their dense blocks survives theta (gathering blocks costs more
+# per posting than scanning whole lists)
+_DENSE_KEEP_RATIO = 0.5
+
+
+@dataclass
+class BlockMaxMetadata:
+    """
+    Per-block max-score metadata over the doc-id ordered postings of a BM25Index.
+
+    Blocks of term t are block_max[term_block_offsets[t]:term_block_offsets[t + 1]];
+    each block covers block_size consecutive postings and records the largest
+    BM25 term impact inside it and the last doc id it contains.
+    """
+
+    block_size: int
+    term_block_offsets: np.ndarray
+    block_max: np.ndarray
+    block_last_doc: np.ndarray
+    term_max: np.ndarray
+
+    @classmethod
+    def build(cls, index: BM25Index, block_size: int = 128) -> "BlockMaxMetadata":
+        df = np.diff(index.term_offsets)
+        num_terms = df.size
+
+        term_of_posting = np.repeat(np.arange(num_terms), df)
+        impacts = index.term_scores(term_of_posting, index.post_docs, index.post_tfs)
+
+        nblocks = (df + block_size - 1) // block_size
+        term_block_offsets = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(nblocks, out=term_block_offsets[1:])
+
+        block_term = np.repeat(np.arange(num_terms), nblocks)
+        local = np.arange(int(term_block_offsets[-1])) - term_block_offsets[:-1][block_term]
+        block_start = index.term_offsets[:-1][block_term] + local * block_size
+        block_end = np.minimum(block_start + block_size, index.term_offsets[1:][block_term])
+
+        if block_start.size:
+            block_max = np.maximum.reduceat(impacts, block_start)
+            term_max = np.maximum.reduceat(block_max, term_block_offsets[:-1])
+        else:
+            block_max = np.zeros(0, dtype=np.float64)
+            term_max = np.zeros(0, dtype=np.float64)
+
+        return cls(
+            block_size=block_size,
+            term_block_offsets=term_block_offsets,
+            block_max=block_max,
+            block_last_doc=index.post_docs[block_end - 1],
+            term_max=term_max,
+        )
+
+
+def block_max_search(
+    index: BM25Index,
+    blocks: BlockMaxMetadata,
+    tokens: Sequence[str],
+    top_k: int,
+    stats: Optional[Dict] = None,
+    sparse_ratio: float = 0.02,
+    doc_filter=None,
+) -> List[Tuple[int, float, List[str]]]:
+    """
+    Dynamic-pruning top-k over block-max metadata (vectorized Block-Max WAND).
+
+    1. Sparse (selective) query terms are scored exactly: their documents
+       form the seed candidates, completed by probing the dense lists.
+       The k-th best complete score is the threshold theta. Without a
+       sparse term, theta comes from scoring the highest-bound blocks;
+       when that prunes no block at all (block maxima all close to the
+       term maxima) the query goes to the flat BM25Index.search.
+    2. Documents without a sparse term can only score through the dense
+       terms ("salt", "butter", "flour", ...). The doc-id space is cut at
+       every block boundary of the dense lists and each interval gets an
+       upper bound = sum of the dense block maxima covering it. Blocks
+       that only cover intervals below theta are skipped unscored.
+
+    With doc_filter, postings of filtered-out documents are dropped before
+    scoring (theta then comes from allowed documents only); selective
+    filters go straight to BM25Index.search, which probes their documents.
+    """
+    terms = index.query_terms(tokens)
+    if not terms or top_k <= 0:
+        return []
+
+    mask = None
+    if doc_filter is not None:
+        if not doc_filter.count or index.probes_filter(terms, doc_filter):
+            return index.search(tokens, top_k, stats=stats, doc_filter=doc_filter)
+        mask = doc_filter.mask
+
+    sparse_df = max(blocks.block_size, int(index.num_docs * sparse_ratio))
+    sparse = []
+    dense = []
+    for term in terms:
+        df = index.term_offsets[term[1] + 1] - index.term_offsets[term[1]]
+        (sparse if df <= sparse_df else dense).append(term)
+
+    evaluated = 0
+    intervals = _interval_bounds(blocks, dense) if dense else None
+
+    # 1) exact scores for every document holding a sparse term
+    doc_parts = []
+    score_parts = []
+    for _, term_id, qf in sparse:
+        docs, tfs = index.postings(term_id)
+        if mask is not None:
+            keep = mask[docs]
+            docs, tfs = docs[keep], tfs[keep]
+        doc_parts.append(docs)
+        score_parts.append(qf * index.term_scores(term_id, docs, tfs))
+        evaluated += docs.size
+
+    seed_docs = np.zeros(0, dtype=index.post_docs.dtype)
+    seed_scores = np.zeros(0, dtype=np.float64)
+    if sparse:
+        seed_docs, seed_scores = index.accumulate(doc_parts, score_parts)
+
+    # theta: complete the best partial seeds against the dense terms
+    theta = -np.inf
+    if not sparse:
+        # all terms common: seed theta from the highest-bound blocks
+        theta, seeded = _dense_theta(index, blocks, dense, intervals, top_k, mask)
+        kept = _surviving_blocks(intervals, theta)
+        if sum(blk.size for blk in kept) > _DENSE_KEEP_RATIO * sum(_block_counts(blocks, dense)):
+            # bounds too flat to skip much: the flat scan is cheaper
+            if stats is not None:
+                stats["evaluated"] = stats.get("evaluated", 0) + seeded
+            return index.search(tokens, top_k, stats=stats, doc_filter=doc_filter)
+        evaluated += seeded
+    elif seed_docs.size >= top_k:
+        part = np.argpartition(-seed_scores, top_k - 1)[:top_k]
+        full = seed_scores[part].copy()
+        for _, term_id, qf in dense:
+            full += qf * _probe(index, term_id, seed_docs[part])
+        evaluated += top_k * len(dense)
+        theta = float(full.min())
+
+    # complete only the seeds whose upper bound can still reach theta
+    dense_ub = sum(qf * blocks.term_max[term_id] for _, term_id, qf in dense)
+    alive = seed_scores + dense_ub >= theta - _BOUND_EPS
+    seed_docs = seed_docs[alive]
+    seed_scores = seed_scores[alive]
+    for _, term_id, qf in dense:
+        seed_scores = seed_scores + qf * _probe(index, term_id, seed_docs)
+    evaluated += seed_docs.size * len(dense)
+
+    # 2) dense-only documents, restricted to blocks that can beat theta
+    cand_docs = [seed_docs]
+    cand_scores = [seed_scores]
+
+    if dense:
+        if sparse:
+            kept = _surviving_blocks(intervals, theta)
+
+        doc_parts = []
+        score_parts = []
+        for (_, term_id, qf), blk in zip(dense, kept):
+            idx = _block_postings(index, blocks, term_id, blk)
+            if mask is not None:
+                idx = idx[mask[index.post_docs[idx]]]
+            docs = index.post_docs[idx]
+            doc_parts.append(docs)
+            score_parts.append(qf * index.term_scores(term_id, docs, index.post_tfs[idx]))
+            evaluated += idx.size
+
+        dense_docs, dense_scores = index.accumulate(doc_parts, score_parts)
+
+        # seed docs already carry their complete score
+        fresh = ~np.isin(dense_docs, seed_docs, assume_unique=True)
+        cand_docs.append(dense_docs[fresh])
+        cand_scores.append(dense_scores[fresh])
+
+    if stats is not None:
+        stats["evaluated"] = stats.get("evaluated", 0) + evaluated
+        stats["sparse_terms"] = len(sparse)
+        stats["dense_terms"] = len(dense)
+
+    top_docs, top_scores = index.select_top_k(
+        np.concatenate(cand_docs), np.concatenate(cand_scores), top_k
+    )
+    matched = index.matched_terms(terms, top_docs)
+    return [
+        (int(d), float(s), m)
+        for d, s, m in zip(top_docs, top_scores, matched)
+    ]
+
+
+def _interval_bounds(blocks: BlockMaxMetadata, dense) -> Tuple[np.ndarray, List[Tuple[np.ndarray, np.ndarray]]]:
+    """
+    The doc-id space cut at every block boundary of the dense terms:
+    interval i covers (ends[i - 1], ends[i]] and its bound is the sum of
+    the dense block maxima covering it. Also returns, per dense term, the
+    local block covering each interval and whether the term reaches it.
+    """
+    if len(dense) == 1:
+        # one list: its blocks are the intervals
+        _, term_id, qf = dense[0]
+        b0 = blocks.term_block_offsets[term_id]
+        b1 = blocks.term_block_offsets[term_id + 1]
+        blk = np.arange(b1 - b0)
+        return qf * blocks.block_max[b0:b1], [(blk, np.ones(blk.size, dtype=bool))]
+
+    lasts = []
+    for _, term_id, _ in dense:
+        b0 = blocks.term_block_offsets[term_id]
+        b1 = blocks.term_block_offsets[term_id + 1]
+        lasts.append(blocks.block_last_doc[b0:b1])
+
+    ends = np.unique(np.concatenate(lasts))
+    covering = []
+    bound = np.zeros(ends.size, dtype=np.float64)
+
+    for (_, term_id, qf), last in zip(dense, lasts):
+        blk = np.searchsorted(last, ends)
+        inside = blk < last.size
+        b0 = blocks.term_block_offsets[term_id]
+        bound[inside] += qf * blocks.block_max[b0 + blk[inside]]
+        covering.append((blk, inside))
+
+    return bound, covering
+
+
+def _surviving_blocks(intervals, theta: float) -> List[np.ndarray]:
+    """
+    For each dense term, the local block numbers that overlap an
+    interval whose bound can still reach theta.
+    """
+    bound, covering = intervals
+    alive = bound >= theta - _BOUND_EPS
+    return [np.unique(blk[alive & inside]) for blk, inside in covering]
+
+
+def _block_counts(blocks: BlockMaxMetadata, dense) -> List[int]:
+    return [
+        int(blocks.term_block_offsets[term_id + 1] - blocks.term_block_offsets[term_id])
+        for _, term_id, _ in dense
+    ]
+
+
+def _dense_theta(index: BM25Index, blocks: BlockMaxMetadata, dense, intervals, top_k: int, mask) -> Tuple[float, int]:
+    """
+    Threshold when no term is selective: the blocks of the intervals with
+    the highest bounds are scored (starting with a few, doubling until
+    they hold top_k documents). Their summed scores are lower bounds of
+    the true scores, so the k-th best of them is a safe theta.
+    Returns (theta, postings scored).
+    """
+    bound, covering = intervals
+    order = np.argsort(-bound, kind="stable")
+    evaluated = 0
+    take = 4
+
+    while True:
+        chosen = np.zeros(bound.size, dtype=bool)
+        chosen[order[:take]] = True
+
+        doc_parts = []
+        score_parts = []
+        for (_, term_id, qf), (blk, inside) in zip(dense, covering):
+            idx = _block_postings(index, blocks, term_id, np.unique(blk[chosen & inside]))
+            if mask is not None:
+                idx = idx[mask[index.post_docs[idx]]]
+            docs = index.post_docs[idx]
+            doc_parts.append(docs)
+            score_parts.append(qf * index.term_scores(term_id, docs, index.post_tfs[idx]))
+            evaluated += idx.size
+
+        _, partial = index.accumulate(doc_parts, score_parts)
+        if partial.size >= top_k:
+            return float(-np.partition(-partial, top_k - 1)[top_k - 1]), evaluated
+        if take >= bound.size:
+            return -np.inf, evaluated
+        take *= 2
+
+
+def _block_postings(index: BM25Index, blocks: BlockMaxMetadata, term_id: int, blk: np.ndarray) -> np.ndarray:
+    """
+    Flat posting positions of the given local blocks of term_id.
+    """
+    start = index.term_offsets[term_id]
+    end = index.term_offsets[term_id + 1]
+
+    first = start + blk * blocks.block_size
+    size = np.minimum(first + blocks.block_size, end) - first
+    if not size.size:
+        return np.zeros(0, dtype=np.int64)
+
+    offsets = np.repeat(first - np.concatenate(([0], np.cumsum(size)[:-1])), size)
+    return offsets + np.arange(int(size.sum()))
+
+
+def _probe(index: BM25Index, term_id: int, docs: np.ndarray) -> np.ndarray:
+    """
+    Term score of term_id for each doc in docs (0 when absent).
+    """
+    return index.probe(term_id, docs)[0]
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Dict, List, Optional, Sequence
+import math
+import os
+
+import numpy as np
+
+from app.retrieval.token_corpus import TokenCorpus
+
+
+# Below this many documents per worker, process start-up costs more than it saves
+MIN_DOCS_PER_WORKER = 2000
+
+
+@dataclass
+class PartialPostings:
+    """
+    Postings of one chunk of documents, with chunk-local term and doc ids.
+
+    terms lists the chunk vocabulary in first-occurrence order; postings
+    are sorted by (term, doc) like the final CSR arrays.
+
+    With positions, each posting owns post_tfs[i] consecutive entries of
+    positions (token positions inside the doc, ascending), and
+    token_starts/token_ends give the character span of every token.
+    """
+
+    terms: List[str]
+    post_terms: np.ndarray
+    post_docs: np.ndarray
+    post_tfs: np.ndarray
+    doc_len: np.ndarray
+    positions: Optional[np.ndarray] = None
+    token_starts: Optional[np.ndarray] = None
+    token_ends: Optional[np.ndarray] = None
+
+
+@dataclass
+class MergedPostings:
+    vocab: Dict[str, int]
+    term_offsets: np.ndarray
+    post_docs: np.ndarray
+    post_tfs: np.ndarray
+    doc_len: np.ndarray
+    positions: Optional[np.ndarray] = None
+    token_starts: Optional[np.ndarray] = None
+    token_ends: Optional[np.ndarray] = None
+
+
+# --------------------------------------------------------
+# Partial build
+# --------------------------------------------------------
+
+def partial_from_corpus(corpus: TokenCorpus) -> PartialPostings:
+    """
+    One unique-count over (term, doc) keys yields postings grouped by
+    term with ascending doc ids and their tf.
+    """
+    num_docs = max(corpus.num_docs, 1)
+    doc_len = corpus.doc_lengths()
+
+    doc_of_token = np.repeat(np.arange(corpus.num_docs, dtype=np.int64), doc_len)
+    keys = corpus.token_ids.astype(np.int64) * num_docs + doc_of_token
+
+    positions = None
+    if corpus.token_starts is None:
+        keys, tfs = np.unique(keys, return_counts=True)
+    else:
+        # stable sort keeps the positions of each (term, doc) ascending
+        order = np.argsort(keys, kind="stable")
+        positions = (order - corpus.doc_offsets[doc_of_token[order]]).astype(np.int32)
+        keys = keys[order]
+
+        boundary = np.ones(keys.size, dtype=bool)
+        boundary[1:] = keys[1:] != keys[:-1]
+        first = np.flatnonzero(boundary)
+        tfs = np.diff(np.append(first, keys.size))
+        keys = keys[first]
+
+    post_terms = keys // num_docs
+    post_docs = keys - post_terms * num_docs
+
+    terms = [""] * len(corpus.vocab)
+    for term, term_id in corpus.vocab.items():
+        terms[term_id] = term
+
+    return PartialPostings(
+        terms=terms,
+        post_terms=post_terms.astype(np.int32),
+        post_docs=post_docs.astype(np.int32),
+        post_tfs=tfs.astype(np.int32),
+        doc_len=doc_len,
+        positions=positions,
+        token_starts=corpus.token_starts,
+        token_ends=corpus.token_ends,
+    )
+
+
+def build_partial(texts: Sequence[str], positions: bool = False) -> PartialPostings:
+    return partial_from_corpus(TokenCorpus.from_texts(texts, with_spans=positions))
+
+
+# --------------------------------------------------------
+# Merge
+# --------------------------------------------------------
+
+def merge_partials(partials: Sequence[PartialPostings]) -> MergedPostings:
+    """
+    Merges chunk postings (in document order) into global ids.
+
+    Interning the chunk vocabularies in chunk order reproduces the
+    global first-occurrence order, and a stable sort by global term id
+    keeps doc ids ascending within each term, so the result is identical
+    to building over all documents at once.
+    """
+    vocab: Dict[str, int] = {}
+    intern = vocab.setdefault
+
+    post_terms = []
+    post_docs = []
+    doc_base = 0
+
+    for p in partials:
+        remap = np.array([intern(t, len(vocab)) for t in p.terms], dtype=np.int32)
+        post_terms.append(remap[p.post_terms])
+        post_docs.append(p.post_docs + np.int32(doc_base))
+        doc_base += p.doc_len.size
+
+    terms = _concat(post_terms, np.int32)
+    order = np.argsort(terms, kind="stable")
+
+    term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=len(vocab)), out=term_offsets[1:])
+
+    tfs = _concat([p.post_tfs for p in partials], np.int32)
+
+    merged = MergedPostings(
+        vocab=vocab,
+        term_offsets=term_offsets,
+        post_docs=_concat(post_docs, np.int32)[order],
+        post_tfs=tfs[order],
+        doc_len=_concat([p.doc_len for p in partials], np.int32),
+    )
+
+    if partials and all(p.positions is not None for p in partials):
+        merged.positions = _permute_groups(_concat([p.positions for p in partials], np.int32), tfs, order)
+        merged.token_starts = _concat([p.token_starts for p in partials], np.int32)
+        merged.token_ends = _concat([p.token_ends for p in partials], np.int32)
+
+    return merged
+
+
+def _permute_groups(values: np.ndarray, sizes: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """
+    values is split into consecutive groups of the given sizes;
+    returns the groups concatenated in the given order.
+    """
+    starts = np.zeros(sizes.size, dtype=np.int64)
+    np.cumsum(sizes[:-1], out=starts[1:])
+
+    new_sizes = sizes[order].astype(np.int64)
+    new_starts = np.zeros(new_sizes.size, dtype=np.int64)
+    np.cumsum(new_sizes[:-1], out=new_starts[1:])
+
+    gather = np.repeat(starts[order] - new_starts, new_sizes) + np.arange(int(new_sizes.sum()))
+    return values[gather]
+
+
+def _concat(parts, dtype) -> np.ndarray:
+    if not parts:
+        return np.zeros(0, dtype=dtype)
+    return np.concatenate(parts).astype(dtype, copy=False)
+
+
+# --------------------------------------------------------
+# Entry point
+# --------------------------------------------------------
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """
+    0 / None means one worker per CPU core.
+    """
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def build_postings(
+    texts: Sequence[str],
+    workers: int = 1,
+    positions: bool = False,
+) -> MergedPostings:
+    """
+    Tokenizes and indexes texts, optionally across a process pool.
+    Output is byte-identical for any worker count.
+    """
+    workers = min(resolve_workers(workers), max(1, len(texts) // MIN_DOCS_PER_WORKER))
+
+    if workers <= 1:
+        return merge_partials([build_partial(texts, positions=positions)])
+
+    # A few chunks per worker keeps the pool busy when chunks differ in cost
+    chunk_size = math.ceil(len(texts) / (workers * 4))
+    chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(partial(build_partial, positions=positions), chunks))
+
+    return merge_partials(partials)
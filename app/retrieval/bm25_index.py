@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.retrieval.bm25_build import (
+    MergedPostings,
+    build_postings,
+    merge_partials,
+    partial_from_corpus,
+)
+from app.retrieval.token_corpus import TokenCorpus
+
+
+# A filter allowing fewer docs than postings / _PROBE_RATIO is evaluated
+# by probing each query term for the allowed docs instead of masking postings
+_PROBE_RATIO = 8
+
+
+class BM25Index:
+    """
+    Inverted-index BM25 (Okapi) engine.
+
+    Postings are stored CSR-style: the postings of term t live in
+    post_docs[term_offsets[t]:term_offsets[t + 1]] (ascending doc ids)
+    with matching term frequencies in post_tfs.
+
+    Scoring only touches the postings of the query terms, so query cost
+    is proportional to the matched postings instead of the corpus size.
+    IDF follows rank_bm25.BM25Okapi so scores are identical.
+
+    Optionally positional: posting i owns positions[pos_offsets[i]:pos_offsets[i + 1]]
+    (token positions in the doc) and token_starts/token_ends map every
+    token of doc d (from doc_token_offsets[d]) to its character span.
+    """
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        term_offsets: np.ndarray,
+        post_docs: np.ndarray,
+        post_tfs: np.ndarray,
+        doc_len: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+        idf: Optional[np.ndarray] = None,
+        length_norm: Optional[np.ndarray] = None,
+        positions: Optional[np.ndarray] = None,
+        pos_offsets: Optional[np.ndarray] = None,
+        token_starts: Optional[np.ndarray] = None,
+        token_ends: Optional[np.ndarray] = None,
+    ):
+        self.vocab = vocab
+        self.term_offsets = term_offsets
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.num_docs = int(len(doc_len))
+        self.avgdl = float(doc_len.sum()) / self.num_docs if self.num_docs else 0.0
+
+        # Precomputed arrays can be handed in when loading a persisted index
+        self.idf = idf if idf is not None else self._compute_idf()
+        self.length_norm = length_norm if length_norm is not None else self._compute_length_norm()
+
+        self.positions = positions
+        self.pos_offsets = None
+        self.token_starts = token_starts
+        self.token_ends = token_ends
+        self.doc_token_offsets = None
+
+        if positions is not None:
+            self.pos_offsets = pos_offsets if pos_offsets is not None else _offsets(post_tfs)
+            self.doc_token_offsets = _offsets(doc_len)
+
+    @property
+    def has_positions(self) -> bool:
+        return self.positions is not None
+
+    # --------------------------------------------------------
+    # Build
+    # --------------------------------------------------------
+
+    @classmethod
+    def from_corpus(cls, corpus: TokenCorpus, **params) -> "BM25Index":
+        return cls._from_merged(merge_partials([partial_from_corpus(corpus)]), **params)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: Sequence[str],
+        workers: int = 1,
+        positions: bool = False,
+        **params,
+    ) -> "BM25Index":
+        """
+        Tokenize + index texts; workers > 1 builds partial indexes in a
+        process pool and merges them (same result as a serial build).
+        """
+        merged = build_postings(texts, workers=workers, positions=positions)
+        return cls._from_merged(merged, **params)
+
+    @classmethod
+    def _from_merged(cls, merged: MergedPostings, **params) -> "BM25Index":
+        return cls(
+            merged.vocab,
+            merged.term_offsets,
+            merged.post_docs,
+            merged.post_tfs,
+            merged.doc_len,
+            positions=merged.positions,
+            token_starts=merged.token_starts,
+            token_ends=merged.token_ends,
+            **params,
+        )
+
+    def _compute_idf(self) -> np.ndarray:
+        df = np.diff(self.term_offsets).astype(np.float64)
+        if df.size == 0:
+            return df
+
+        idf = np.log(self.num_docs - df + 0.5) - np.log(df + 0.5)
+
+        # Same floor as rank_bm25: negative idf -> epsilon * average idf
+        eps = self.epsilon * (idf.sum() / idf.size)
+        idf[idf < 0] = eps
+        return idf
+
+    def _compute_length_norm(self) -> np.ndarray:
+        if not self.num_docs:
+            return np.zeros(0, dtype=np.float64)
+        # all-blank corpus: every doc_len is 0, avoid 0 / 0
+        return self.k1 * (1.0 - self.b + self.b * self.doc_len / (self.avgdl or 1.0))
+
+    # --------------------------------------------------------
+    # Query
+    # --------------------------------------------------------
+
+    def query_terms(self, tokens: Sequence[str]) -> List[Tuple[str, int, int]]:
+        """
+        (term, term_id, query_frequency) for query tokens present in the vocabulary.
+        """
+        out = []
+        for term, qf in Counter(tokens).items():
+            term_id = self.vocab.get(term)
+            if term_id is not None:
+                out.append((term, term_id, qf))
+        return out
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        start = self.term_offsets[term_id]
+        end = self.term_offsets[term_id + 1]
+        return self.post_docs[start:end], self.post_tfs[start:end]
+
+    def doc_posting(self, term_id: int, doc_id: int) -> int:
+        """
+        Flat posting index of (term_id, doc_id), or -1 if the doc lacks the term.
+        """
+        start = int(self.term_offsets[term_id])
+        end = int(self.term_offsets[term_id + 1])
+        i = start + int(np.searchsorted(self.post_docs[start:end], doc_id))
+        if i < end and self.post_docs[i] == doc_id:
+            return i
+        return -1
+
+    def term_positions(self, term_id: int, doc_id: int) -> np.ndarray:
+        i = self.doc_posting(term_id, doc_id)
+        if i < 0:
+            return np.zeros(0, dtype=np.int32)
+        return self.positions[self.pos_offsets[i]:self.pos_offsets[i + 1]]
+
+    def term_scores(self, term_id: int, docs: np.ndarray, tfs: np.ndarray) -> np.ndarray:
+        tfs = tfs.astype(np.float64)
+        return self.idf[term_id] * (tfs * (self.k1 + 1.0) / (tfs + self.length_norm[docs]))
+
+    def probe(self, term_id: int, docs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Term score of term_id for each doc in docs (0 when absent) and
+        whether the doc holds the term.
+        """
+        post_docs, post_tfs = self.postings(term_id)
+        pos = np.searchsorted(post_docs, docs)
+        pos[pos >= post_docs.size] = 0
+        hit = post_docs[pos] == docs
+
+        out = np.zeros(docs.size, dtype=np.float64)
+        out[hit] = self.term_scores(term_id, docs[hit], post_tfs[pos[hit]])
+        return out, hit
+
+    def probes_filter(self, terms, doc_filter) -> bool:
+        """
+        True when the filter is selective enough to score its documents
+        directly rather than scanning the query terms' postings.
+        """
+        postings = sum(
+            int(self.term_offsets[term_id + 1] - self.term_offsets[term_id])
+            for _, term_id, _ in terms
+        )
+        return doc_filter.count * _PROBE_RATIO < postings
+
+    def search(
+        self,
+        tokens: Sequence[str],
+        top_k: int,
+        stats: Optional[Dict] = None,
+        doc_filter=None,
+    ) -> List[Tuple[int, float, List[str]]]:
+        """
+        Returns [(doc_id, score, matched_terms)] for the top_k documents
+        that contain at least one query term.
+
+        doc_filter (DocFilter: bool mask + sorted docs) restricts the
+        candidates: postings of other documents are skipped before scoring.
+        """
+        terms = self.query_terms(tokens)
+        if not terms or top_k <= 0:
+            return []
+
+        mask = None
+        if doc_filter is not None:
+            if not doc_filter.count:
+                return []
+            if self.probes_filter(terms, doc_filter):
+                cand_docs, cand_scores = self.score_docs(terms, doc_filter.docs, stats=stats)
+                return self._top_hits(terms, cand_docs, cand_scores, top_k)
+            mask = doc_filter.mask
+
+        doc_parts = []
+        score_parts = []
+        for _, term_id, qf in terms:
+            docs, tfs = self.postings(term_id)
+            if mask is not None:
+                keep = mask[docs]
+                docs, tfs = docs[keep], tfs[keep]
+            doc_parts.append(docs)
+            score_parts.append(qf * self.term_scores(term_id, docs, tfs))
+
+        if stats is not None:
+            stats["evaluated"] = stats.get("evaluated", 0) + sum(d.size for d in doc_parts)
+
+        cand_docs, cand_scores = self.accumulate(doc_parts, score_parts)
+        return self._top_hits(terms, cand_docs, cand_scores, top_k)
+
+    def search_many(
+        self,
+        queries: Sequence[Sequence[str]],
+        top_k: int,
+        doc_filter=None,
+        max_bytes: int = 256 * 2**20,
+    ) -> List[List[Tuple[int, float, List[str]]]]:
+        """
+        search() for many token lists at once: same results, per query.
+
+        Queries are scored in chunks into a dense (chunk x num_docs) score
+        matrix, so the term scores of a term shared by several queries are
+        computed once per chunk. The chunk size keeps the matrices under
+        max_bytes. Selective filters fall back to per-query probing.
+        """
+        results: List[List[Tuple[int, float, List[str]]]] = [[] for _ in queries]
+        if top_k <= 0 or not self.num_docs:
+            return results
+
+        query_terms = [self.query_terms(tokens) for tokens in queries]
+        if doc_filter is not None and not doc_filter.count:
+            return results
+
+        todo = []
+        for qi, terms in enumerate(query_terms):
+            if not terms:
+                continue
+            if doc_filter is not None and self.probes_filter(terms, doc_filter):
+                results[qi] = self.search(queries[qi], top_k, doc_filter=doc_filter)
+            else:
+                todo.append(qi)
+
+        # float64 scores + bool hits per document
+        chunk = max(1, int(max_bytes // (self.num_docs * 9)))
+
+        for start in range(0, len(todo), chunk):
+            rows = todo[start : start + chunk]
+            scores = np.zeros((len(rows), self.num_docs), dtype=np.float64)
+            hits = np.zeros((len(rows), self.num_docs), dtype=bool)
+            cache: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+            for r, qi in enumerate(rows):
+                # same term order as search(): identical float sums
+                for _, term_id, qf in query_terms[qi]:
+                    if term_id not in cache:
+                        docs, tfs = self.postings(term_id)
+                        cache[term_id] = (docs, self.term_scores(term_id, docs, tfs))
+                    docs, term_scores = cache[term_id]
+                    scores[r, docs] += qf * term_scores
+                    hits[r, docs] = True
+
+            if doc_filter is not None:
+                hits &= doc_filter.mask
+
+            for r, qi in enumerate(rows):
+                cand = np.flatnonzero(hits[r])
+                results[qi] = self._top_hits(query_terms[qi], cand, scores[r, cand], top_k)
+
+        return results
+
+    def score_docs(self, terms, docs: np.ndarray, stats: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scores of the given docs (sorted) that hold at least one query term.
+        """
+        scores = np.zeros(docs.size, dtype=np.float64)
+        hit = np.zeros(docs.size, dtype=bool)
+        for _, term_id, qf in terms:
+            term_scores, term_hit = self.probe(term_id, docs)
+            scores += qf * term_scores
+            hit |= term_hit
+
+        if stats is not None:
+            stats["evaluated"] = stats.get("evaluated", 0) + docs.size * len(terms)
+
+        return docs[hit], scores[hit]
+
+    def _top_hits(self, terms, cand_docs: np.ndarray, cand_scores: np.ndarray, top_k: int):
+        top_docs, top_scores = self.select_top_k(cand_docs, cand_scores, top_k)
+
+        matched = self.matched_terms(terms, top_docs)
+        return [
+            (int(d), float(s), m)
+            for d, s, m in zip(top_docs, top_scores, matched)
+        ]
+
+    def accumulate(self, doc_parts, score_parts) -> Tuple[np.ndarray, np.ndarray]:
+        if len(doc_parts) == 1:
+            return doc_parts[0], score_parts[0]
+
+        docs = np.concatenate(doc_parts)
+        scores = np.concatenate(score_parts)
+
+        # Few postings relative to the corpus: sparse accumulation
+        if docs.size * 8 < self.num_docs:
+            uniq, inverse = np.unique(docs, return_inverse=True)
+            return uniq, np.bincount(inverse, weights=scores, minlength=uniq.size)
+
+        dense = np.bincount(docs, weights=scores, minlength=self.num_docs)
+        hit = np.bincount(docs, minlength=self.num_docs) > 0
+        uniq = np.flatnonzero(hit)
+        return uniq, dense[uniq]
+
+    @staticmethod
+    def select_top_k(docs: np.ndarray, scores: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if docs.size > top_k:
+            part = np.argpartition(-scores, top_k - 1)[:top_k]
+            # keep every doc tied with the k-th score so tie order is deterministic
+            keep = scores >= scores[part].min()
+            docs = docs[keep]
+            scores = scores[keep]
+
+        # score desc, doc id asc on ties
+        order = np.lexsort((docs, -scores))[:top_k]
+        return docs[order], scores[order]
+
+    def matched_terms(self, terms, top_docs: np.ndarray) -> List[List[str]]:
+        matched: List[List[str]] = [[] for _ in range(len(top_docs))]
+        if not len(top_docs):
+            return matched
+
+        for term, term_id, _ in sorted(terms):
+            docs, _ = self.postings(term_id)
+            pos = np.searchsorted(docs, top_docs)
+            pos[pos >= docs.size] = 0
+            for i in np.flatnonzero(docs[pos] == top_docs):
+                matched[i].append(term)
+
+        return matched
+
+
+def _offsets(sizes: np.ndarray) -> np.ndarray:
+    out = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=out[1:])
+    return out
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from collections import Counter
+from html import escape
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.retrieval.bm25_index import BM25Index
+from app.retrieval.tokenizer import tokenize
+
+
+# A phrase is its text plus the vocabulary ids of its tokens (None = unknown term)
+Phrase = Tuple[str, List[Optional[int]]]
+
+
+def parse_phrases(index: BM25Index, phrases: Sequence[str]) -> List[Phrase]:
+    out: List[Phrase] = []
+    for text in phrases or []:
+        tokens = tokenize(text or "")
+        if len(tokens) < 2:
+            continue
+        out.append((" ".join(tokens), [index.vocab.get(t) for t in tokens]))
+    return out
+
+
+# --------------------------------------------------------
+# Phrase / proximity scoring
+# --------------------------------------------------------
+
+def proximity_score(
+    index: BM25Index,
+    doc_id: int,
+    phrases: Sequence[Phrase],
+    window: int = 5,
+) -> Tuple[float, List[str]]:
+    """
+    Bonus for consecutive phrase terms occurring close together in the doc.
+
+    Each adjacent pair (a, b) within `window` tokens adds min(idf_a, idf_b) / d^2,
+    so an exact bigram (d = 1) counts like an extra matched term and the
+    bonus fades quickly with distance; reversed order counts one token farther.
+    Also returns the phrases that occur verbatim.
+    """
+    bonus = 0.0
+    exact: List[str] = []
+
+    for text, term_ids in phrases:
+        positions = [
+            index.term_positions(t, doc_id) if t is not None else None
+            for t in term_ids
+        ]
+
+        for i in range(len(term_ids) - 1):
+            pa, pb = positions[i], positions[i + 1]
+            if pa is None or pb is None or not pa.size or not pb.size:
+                continue
+            d = _pair_distance(pa, pb)
+            if d <= window:
+                bonus += min(index.idf[term_ids[i]], index.idf[term_ids[i + 1]]) / (d * d)
+
+        if _contains_phrase(positions):
+            exact.append(text)
+
+    return float(bonus), exact
+
+
+def _pair_distance(pa: np.ndarray, pb: np.ndarray) -> int:
+    """
+    Smallest token distance from an occurrence of a to an occurrence of b
+    (b after a), or reversed distance + 1.
+    """
+    nxt = np.searchsorted(pb, pa, side="right")
+
+    best = np.iinfo(np.int64).max
+    fwd = nxt < pb.size
+    if fwd.any():
+        best = int((pb[nxt[fwd]] - pa[fwd]).min())
+
+    back = nxt > 0
+    if back.any():
+        best = min(best, int((pa[back] - pb[nxt[back] - 1]).min()) + 1)
+
+    return best
+
+
+def _contains_phrase(positions: Sequence[Optional[np.ndarray]]) -> bool:
+    if any(p is None or not p.size for p in positions):
+        return False
+
+    starts = positions[0]
+    for offset, p in enumerate(positions[1:], start=1):
+        starts = starts[np.isin(starts + offset, p, assume_unique=True)]
+        if not starts.size:
+            return False
+    return True
+
+
+# --------------------------------------------------------
+# Snippets
+# --------------------------------------------------------
+
+def build_snippet(
+    index: BM25Index,
+    text: str,
+    doc_id: int,
+    term_ids: Sequence[int],
+    max_tokens: int = 30,
+    highlight: Tuple[str, str] = ("<b>", "</b>"),
+) -> str:
+    """
+    Query-biased snippet: the window of max_tokens tokens holding the
+    most distinct matched terms, cut from the stored token spans and with
+    the matched tokens highlighted. The text is only sliced, never rescanned;
+    the slices are HTML-escaped, only the highlight markup is not.
+    """
+    hits: List[Tuple[int, int]] = []
+    for term_id in term_ids:
+        hits.extend((int(p), term_id) for p in index.term_positions(term_id, doc_id))
+
+    if not hits:
+        return ""
+
+    hits.sort()
+    lo, hi = _best_window(hits, max_tokens)
+
+    # centre the matched region inside the token budget
+    doc_len = int(index.doc_len[doc_id])
+    pad = max(0, max_tokens - (hi - lo + 1)) // 2
+    first = max(0, lo - pad)
+    last = min(doc_len - 1, hi + pad)
+
+    base = int(index.doc_token_offsets[doc_id])
+    cursor = int(index.token_starts[base + first])
+    end = int(index.token_ends[base + last])
+
+    parts = ["…"] if first > 0 else []
+    for pos, _ in hits:
+        if pos < first or pos > last:
+            continue
+        s = int(index.token_starts[base + pos])
+        e = int(index.token_ends[base + pos])
+        parts.append(escape(text[cursor:s]))
+        parts.append(highlight[0] + escape(text[s:e]) + highlight[1])
+        cursor = e
+    parts.append(escape(text[cursor:end]))
+    if last < doc_len - 1:
+        parts.append("…")
+
+    return " ".join("".join(parts).split())
+
+
+def _best_window(hits: List[Tuple[int, int]], max_tokens: int) -> Tuple[int, int]:
+    """
+    Two-pointer scan over sorted (position, term) hits for the span of at
+    most max_tokens tokens with the most distinct terms (then most hits).
+    """
+    counts: Counter = Counter()
+    best = (0, 0, hits[0][0], hits[0][0])
+    left = 0
+
+    for right, (pos, term) in enumerate(hits):
+        counts[term] += 1
+        while pos - hits[left][0] >= max_tokens:
+            counts[hits[left][1]] -= 1
+            if not counts[hits[left][1]]:
+                del counts[hits[left][1]]
+            left += 1
+
+        key = (len(counts), right - left + 1, hits[left][0], pos)
+        if key[:2] > best[:2]:
+            best = key
+
+    return best[2], best[3]
@@ -1,23 +1,51 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Tuple
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
+from app.retrieval.bm25_blockmax import BlockMaxMetadata, block_max_search
+from app.retrieval.bm25_index import BM25Index
+from app.retrieval.bm25_positions import build_snippet, parse_phrases, proximity_score
+from app.retrieval.bm25_store import load_bm25_index, save_bm25_index
 from app.retrieval.tokenizer import tokenize
 
 
+_STRATEGIES = {"exhaustive", "blockmax"}
+
+
 @dataclass
 class BM25Retriever:
     index_memory: Any
+    k1: float = 1.5
+    b: float = 0.75
+
+    # "exhaustive" scores every posting of every query term,
+    # "blockmax" skips documents that cannot enter the top-k
+    strategy: str = "exhaustive"
+
+    # Processes used to tokenize/index the corpus (0 = one per CPU core)
+    build_workers: int = 1
+
+    # Token positions + spans: phrase/proximity scoring and snippets
+    positions: bool = False
+    phrase_weight: float = 1.0
+    proximity_window: int = 5
+    snippet_tokens: int = 30
 
     def __post_init__(self) -> None:
+        self.strategy = (self.strategy or "exhaustive").strip().lower()
+        if self.strategy not in _STRATEGIES:
+            raise ValueError(
+                f"Invalid BM25 strategy '{self.strategy}'. Use exhaustive | blockmax."
+            )
+
         self._built = False
-        self._bm25 = None
+        self._index: BM25Index | None = None
+        self._blocks: BlockMaxMetadata | None = None
         self._docs = []
-        self._doc_texts = []
-        self._tokenized = []
 
-    def build(self) -> None:
+    def _documents(self) -> List[Any]:
         # Robust access to documents
         docs = []
         if hasattr(self.index_memory, "documents"):
@@ -30,22 +58,75 @@ class BM25Retriever:
             docs = self.index_memory.all()
         else:
             raise RuntimeError("IndexMemory does not expose documents (documents/_documents/get_documents/all).")
+        return docs
+
+    def build(self) -> None:
+        docs = self._documents()
 
         self._docs = docs
-        self._doc_texts = [getattr(d, "text", "") or "" for d in docs]
-        self._tokenized = [tokenize(t) for t in self._doc_texts]
 
-        # Minimal BM25 implementation using rank_bm25 if you already had it,
-        # else a fallback simple scorer.
-        try:
-            from rank_bm25 import BM25Okapi  # type: ignore
-            self._bm25 = BM25Okapi(self._tokenized)
-        except Exception:
-            self._bm25 = None
+        # Token-id corpora only live inside the build;
+        # search runs on the postings alone.
+        texts = [getattr(d, "text", "") or "" for d in docs]
+        self._index = BM25Index.from_texts(
+            texts,
+            workers=self.build_workers,
+            positions=self.positions,
+            k1=self.k1,
+            b=self.b,
+        )
+        del texts
+        self._blocks = None
+
+        if self.strategy == "blockmax":
+            self._blocks = BlockMaxMetadata.build(self._index)
 
         self._built = True
 
-    def search(self, query: str, top_k: int) -> List[Dict]:
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+
+    def load(self, directory: Path, fingerprint: str) -> bool:
+        """
+        Use a persisted index if it matches the fingerprint and the loaded documents.
+        """
+        loaded = load_bm25_index(directory, fingerprint)
+        if loaded is None:
+            return False
+
+        index, blocks = loaded
+        docs = self._documents()
+        if index.num_docs != len(docs):
+            return False
+
+        self._docs = docs
+        self._index = index
+        self._blocks = blocks
+        if self.strategy == "blockmax" and self._blocks is None:
+            self._blocks = BlockMaxMetadata.build(self._index)
+
+        self._built = True
+        return True
+
+    def save(self, directory: Path, fingerprint: str) -> None:
+        if not self._built:
+            self.build()
+        save_bm25_index(directory, self._index, fingerprint, blocks=self._blocks)
+
+    # --------------------------------------------------------
+    # Search
+    # --------------------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        strategy: Optional[str] = None,
+        stats: Optional[Dict] = None,
+        phrases: Optional[List[str]] = None,
+        doc_filter=None,
+    ) -> List[Dict]:
         if not self._built:
             self.build()
 
@@ -53,38 +134,110 @@ class BM25Retriever:
         if not q_tokens:
             return []
 
-        # rank_bm25 path
-        if self._bm25 is not None:
-            scores = self._bm25.get_scores(q_tokens)
-            # get top_k indices
-            top_idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_k]
-            results: List[Dict] = []
-            qset = set(q_tokens)
-
-            for i in top_idx:
-                doc = self._docs[i]
-                score = float(scores[i])
-                doc_tokens = set(self._tokenized[i])
-                matched = sorted(list(qset.intersection(doc_tokens)))
-
-                results.append(
-                    {"document": doc, "score": score, "matched_terms": matched}
-                )
-            return results
+        positional = self._index.has_positions
+        parsed = parse_phrases(self._index, phrases) if positional else []
 
-        # fallback simple scoring (term overlap)
-        qset = set(q_tokens)
-        scored: List[Tuple[int, float]] = []
-        for i, toks in enumerate(self._tokenized):
-            dset = set(toks)
-            overlap = len(qset.intersection(dset))
-            if overlap > 0:
-                scored.append((i, float(overlap)))
+        # Phrase/proximity re-scoring needs a few candidates beyond top_k
+        depth = max(top_k * 3, top_k + 20) if parsed else top_k
+
+        selected = (strategy or self.strategy).strip().lower()
+        if selected not in _STRATEGIES:
+            raise ValueError(f"Unknown BM25 strategy: {selected}. Use exhaustive | blockmax.")
+
+        if selected == "blockmax":
+            if self._blocks is None:
+                self._blocks = BlockMaxMetadata.build(self._index)
+            hits = block_max_search(
+                self._index, self._blocks, q_tokens, depth, stats=stats, doc_filter=doc_filter
+            )
+        else:
+            hits = self._index.search(q_tokens, depth, stats=stats, doc_filter=doc_filter)
+
+        return self._results(hits, parsed, top_k)
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int,
+        phrases: Optional[List[Optional[List[str]]]] = None,
+        doc_filter=None,
+    ) -> List[List[Dict]]:
+        """
+        search() for a batch of queries (one result list per query).
+        All queries are scored together by BM25Index.search_many
+        (exhaustive, so results match the exhaustive strategy).
+        """
+        if not self._built:
+            self.build()
+
+        phrases = phrases or [None] * len(queries)
+        positional = self._index.has_positions
+
+        tokens = [tokenize(q or "") for q in queries]
+        parsed = [
+            parse_phrases(self._index, p) if positional else []
+            for p in phrases
+        ]
+
+        # one shared depth: phrase re-scoring needs candidates beyond top_k
+        depth = max(top_k * 3, top_k + 20) if any(parsed) else top_k
+        all_hits = self._index.search_many(tokens, depth, doc_filter=doc_filter)
+
+        return [
+            self._results(hits if p else hits[:top_k], p, top_k)
+            for hits, p in zip(all_hits, parsed)
+        ]
+
+    def _results(self, hits, parsed, top_k: int) -> List[Dict]:
+        if parsed:
+            hits = self._rescore_phrases(hits, parsed)[:top_k]
+        else:
+            hits = [(doc_idx, score, matched, None) for doc_idx, score, matched in hits]
 
-        scored.sort(key=lambda x: x[1], reverse=True)
         results: List[Dict] = []
-        for i, score in scored[:top_k]:
-            doc = self._docs[i]
-            matched = sorted(list(qset.intersection(set(self._tokenized[i]))))
-            results.append({"document": doc, "score": score, "matched_terms": matched})
+        for doc_idx, score, matched, exact in hits:
+            doc = self._docs[doc_idx]
+            item = {"document": doc, "score": score, "matched_terms": matched, "ordinal": doc_idx}
+
+            if exact is not None:
+                item["phrase_matches"] = exact
+
+            results.append(item)
         return results
+
+    def add_snippets(self, results: List[Dict]) -> List[Dict]:
+        """
+        Sets "snippet" (matched terms highlighted, HTML-escaped) on the
+        results that have matched terms and an ordinal. Not part of
+        search: only the results actually returned pay for it, not every
+        candidate a fusion fetched.
+        """
+        if not self._built or not self._index.has_positions:
+            return results
+
+        for item in results:
+            doc_idx = item.get("ordinal")
+            term_ids = [
+                self._index.vocab[t] for t in (item.get("matched_terms") or []) if t in self._index.vocab
+            ]
+            if doc_idx is None or not term_ids or "snippet" in item:
+                continue
+            item["snippet"] = build_snippet(
+                self._index,
+                getattr(self._docs[doc_idx], "text", "") or "",
+                doc_idx,
+                term_ids,
+                max_tokens=self.snippet_tokens,
+            )
+        return results
+
+    def _rescore_phrases(self, hits, phrases) -> List[Tuple[int, float, List[str], List[str]]]:
+        out = []
+        for doc_idx, score, matched in hits:
+            bonus, exact = proximity_score(
+                self._index, doc_idx, phrases, window=self.proximity_window
+            )
+            out.append((doc_idx, score + self.phrase_weight * bonus, matched, exact))
+
+        out.sort(key=lambda h: (-h[1], h[0]))
+        return out
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+from app.retrieval.bm25_blockmax import BlockMaxMetadata
+from app.retrieval.bm25_index import BM25Index
+from app.retrieval.tokenizer import tokenizer_config
+
+
+# Bump whenever the on-disk layout changes
+BM25_INDEX_VERSION = 2
+
+_META_FILE = "meta.json"
+_VOCAB_FILE = "vocab.txt"
+
+_INDEX_ARRAYS = ("term_offsets", "post_docs", "post_tfs", "doc_len", "idf", "length_norm")
+_POSITION_ARRAYS = ("positions", "pos_offsets", "token_starts", "token_ends")
+_BLOCK_ARRAYS = ("term_block_offsets", "block_max", "block_last_doc", "term_max")
+
+# Temp / replaced directories left by a crashed writer are removed
+# once they are this old (a live writer keeps touching its temp dir)
+_STALE_SEC = 3600
+
+
+# --------------------------------------------------------
+# Fingerprint
+# --------------------------------------------------------
+
+def dataset_fingerprint(dataset_path: Path, **config: Any) -> str:
+    """
+    Hash of the dataset bytes, the tokenizer config, the on-disk format
+    version and any extra config (BM25 params, domain, doc count).
+    """
+    h = hashlib.blake2b(digest_size=16)
+
+    with Path(dataset_path).open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+
+    settings = {
+        "version": BM25_INDEX_VERSION,
+        "tokenizer": tokenizer_config(),
+        **config,
+    }
+    h.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+# --------------------------------------------------------
+# Save
+# --------------------------------------------------------
+
+def save_bm25_index(
+    directory: Path,
+    index: BM25Index,
+    fingerprint: str,
+    blocks: Optional[BlockMaxMetadata] = None,
+) -> None:
+    """
+    Writes the index into a temp directory and swaps it in,
+    so readers never see a half-written index.
+
+    Temp names are unique per call, so processes rebuilding at the same
+    time never share one; if another process swaps its index in first,
+    that one is kept and this one discarded.
+    """
+    directory = Path(directory)
+    tag = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    tmp_dir = directory.with_name(f"{directory.name}.tmp-{tag}")
+    old_dir = directory.with_name(f"{directory.name}.old-{tag}")
+
+    _remove_stale(directory)
+    tmp_dir.mkdir(parents=True)
+
+    terms = [""] * len(index.vocab)
+    for term, term_id in index.vocab.items():
+        terms[term_id] = term
+
+    with (tmp_dir / _VOCAB_FILE).open("w", encoding="utf-8") as f:
+        f.write("\n".join(terms))
+
+    for name in _INDEX_ARRAYS:
+        np.save(tmp_dir / f"{name}.npy", getattr(index, name))
+
+    if index.has_positions:
+        for name in _POSITION_ARRAYS:
+            np.save(tmp_dir / f"{name}.npy", getattr(index, name))
+
+    if blocks is not None:
+        for name in _BLOCK_ARRAYS:
+            np.save(tmp_dir / f"{name}.npy", getattr(blocks, name))
+
+    meta = {
+        "fingerprint": fingerprint,
+        "version": BM25_INDEX_VERSION,
+        "num_docs": index.num_docs,
+        "num_terms": len(terms),
+        "num_postings": int(index.post_docs.size),
+        "k1": index.k1,
+        "b": index.b,
+        "epsilon": index.epsilon,
+        "positions": index.has_positions,
+        "block_size": blocks.block_size if blocks is not None else None,
+    }
+    with (tmp_dir / _META_FILE).open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    try:
+        directory.rename(old_dir)
+    except FileNotFoundError:
+        pass  # first build, or another process is mid-swap
+    try:
+        tmp_dir.rename(directory)
+    except OSError:
+        # another process installed its index since our rename
+        print(f"[BM25] {directory.name} was replaced concurrently; keeping that index.")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _remove_stale(directory: Path) -> None:
+    now = time.time()
+    for pattern in (".tmp", ".old", ".tmp-*", ".old-*"):
+        for path in directory.parent.glob(directory.name + pattern):
+            try:
+                if now - path.stat().st_mtime > _STALE_SEC:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+
+# --------------------------------------------------------
+# Load
+# --------------------------------------------------------
+
+def read_meta(directory: Path) -> Optional[Dict[str, Any]]:
+    path = Path(directory) / _META_FILE
+    if not path.exists():
+        return None
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_bm25_index(
+    directory: Path,
+    fingerprint: str,
+) -> Optional[Tuple[BM25Index, Optional[BlockMaxMetadata]]]:
+    """
+    Memory-maps a persisted index read-only.
+    Returns None when it is missing or was built from other data/config.
+    """
+    directory = Path(directory)
+    meta = read_meta(directory)
+
+    if not meta or meta.get("fingerprint") != fingerprint:
+        return None
+
+    with (directory / _VOCAB_FILE).open("r", encoding="utf-8") as f:
+        content = f.read()
+    terms = content.split("\n") if content else []
+    vocab = {term: term_id for term_id, term in enumerate(terms)}
+
+    names = _INDEX_ARRAYS + (_POSITION_ARRAYS if meta.get("positions") else ())
+    arrays = {
+        name: np.load(directory / f"{name}.npy", mmap_mode="r")
+        for name in names
+    }
+
+    index = BM25Index(
+        vocab,
+        arrays["term_offsets"],
+        arrays["post_docs"],
+        arrays["post_tfs"],
+        arrays["doc_len"],
+        k1=meta["k1"],
+        b=meta["b"],
+        epsilon=meta["epsilon"],
+        idf=arrays["idf"],
+        length_norm=arrays["length_norm"],
+        positions=arrays.get("positions"),
+        pos_offsets=arrays.get("pos_offsets"),
+        token_starts=arrays.get("token_starts"),
+        token_ends=arrays.get("token_ends"),
+    )
+
+    blocks = None
+    if meta.get("block_size"):
+        block_arrays = {
+            name: np.load(directory / f"{name}.npy", mmap_mode="r")
+            for name in _BLOCK_ARRAYS
+        }
+        blocks = BlockMaxMetadata(block_size=meta["block_size"], **block_arrays)
+
+    return index, blocks
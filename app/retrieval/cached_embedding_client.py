@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.lru_cache import LRUCache
+from app.core.single_flight import FlightAbandoned, SingleFlight
+
+
+def _encode_vector(value: np.ndarray) -> bytes:
+    return np.asarray(value, dtype=np.float32).tobytes()
+
+
+def _decode_vector(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float32)
+
+
+class CachedEmbeddingClient:
+    """
+    Query embedding cache in front of LocalEmbeddingClient / OllamaEmbeddingClient.
+
+    Keyed by model name + whitespace-normalized text; only the misses of
+    a batch are sent to the wrapped client (in one call). Texts already
+    being embedded for a concurrent caller are not sent again; the
+    caller waits for that result (or error).
+    Meant for query-time embedding; corpus builds should use the raw client.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        max_mb: float = 64,
+        disk_path: Optional[Path] = None,
+        disk_max_rows: int = 200_000,
+    ):
+        self.client = client
+        self.model_name = (
+            getattr(client, "model_name", None)
+            or getattr(client, "model", None)
+            or type(client).__name__
+        )
+        self.cache = LRUCache(
+            max_bytes=int(max_mb * 2**20),
+            disk_path=disk_path,
+            encode=_encode_vector,
+            decode=_decode_vector,
+            disk_max_rows=disk_max_rows,
+        )
+        self.flights = SingleFlight()
+
+    def _key(self, text: str) -> str:
+        return f"{self.model_name}\0{text}"
+
+    # --------------------------------------------------------
+    # Embedding
+    # --------------------------------------------------------
+
+    def embed_batch(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        if not texts:
+            return np.array([])
+
+        # the normalized text is both the key and what gets embedded
+        texts = [" ".join((t or "").split()) for t in texts]
+        keys = [self._key(t) for t in texts]
+        vectors: List[Optional[np.ndarray]] = [self.cache.get(k) for k in keys]
+
+        # embed each distinct missing text once
+        missing: Dict[str, int] = {}
+        for i, v in enumerate(vectors):
+            if v is None:
+                missing.setdefault(keys[i], i)
+
+        if missing:
+            computed = self._embed_missing(missing, texts, batch_size)
+            vectors = [v if v is not None else computed[k] for k, v in zip(keys, vectors)]
+
+        return np.stack(vectors).astype(np.float32)
+
+    def embed(self, text: str) -> List[float]:
+        return self.embed_batch([text], batch_size=1)[0].tolist()
+
+    def _embed_missing(self, missing: Dict[str, int], texts: List[str], batch_size: int) -> Dict[str, np.ndarray]:
+        """
+        Keys already being embedded by another caller are waited for;
+        the rest are embedded here in one call (and their waiters served).
+        A caller only waits after finishing its own keys, so two batches
+        sharing keys cannot deadlock. A key whose leader was interrupted
+        is taken up again (SingleFlight.abandon).
+        """
+        flights = {key: self.flights.begin(key) for key in missing}
+        computed: Dict[str, np.ndarray] = {}
+
+        own = [key for key, (_, leader) in flights.items() if leader]
+
+        if own:
+            error: Optional[BaseException] = None
+            try:
+                fresh = self._embed_uncached([texts[missing[k]] for k in own], batch_size)
+                if len(fresh) != len(own):
+                    raise RuntimeError(f"Embedding client returned {len(fresh)} vectors for {len(own)} texts")
+                for key, vec in zip(own, fresh):
+                    vec = np.array(vec, dtype=np.float32)
+                    vec.setflags(write=False)
+                    computed[key] = vec
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                # every flight led here is finished, whatever failed
+                for key in own:
+                    if key in computed:
+                        self.flights.finish(key, flights[key][0], value=computed[key])
+                    else:
+                        self.flights.finish(
+                            key, flights[key][0], error=error or RuntimeError("Embedding failed")
+                        )
+
+            for key in own:
+                self._cache_put(key, computed[key])
+
+        for key, (flight, leader) in flights.items():
+            if not leader:
+                try:
+                    computed[key] = flight.wait()
+                except FlightAbandoned:
+                    computed.update(self._embed_missing({key: missing[key]}, texts, batch_size))
+        return computed
+
+    def _cache_put(self, key: str, vec: np.ndarray) -> None:
+        # best effort: the vector is already computed and handed out
+        try:
+            self.cache.put(key, vec)
+        except Exception as e:
+            print(f"[EmbedCache] put failed: {e}")
+
+    def _embed_uncached(self, texts: List[str], batch_size: int) -> np.ndarray:
+        if hasattr(self.client, "embed_batch"):
+            return np.asarray(self.client.embed_batch(texts, batch_size=batch_size), dtype=np.float32)
+        # OllamaEmbeddingClient only embeds one text per request
+        return np.asarray([self.client.embed(t) for t in texts], dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.cache.stats(), coalesced=self.flights.coalesced)
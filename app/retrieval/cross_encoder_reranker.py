@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+import threading
+import time
+
+from app.core.lru_cache import LRUCache
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores the head of a result list with a local cross-encoder
+    (sentence-transformers CrossEncoder, loaded on first use).
+
+    Candidates are scored in rank order, in batches, until the time
+    budget is spent; the scored prefix is re-sorted by "rerank_score"
+    and the rest keeps its retrieval order. Pair scores are cached by
+    (query, document id).
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        device: str = "cpu",
+        batch_size: int = 16,
+        max_chars: int = 1000,
+        cache_mb: float = 16,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+
+        self.cache = LRUCache(max_bytes=int(cache_mb * 2**20))
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                print(f"[Rerank] Loading {self.model_name} on {self.device}")
+                self._model = CrossEncoder(self.model_name, device=self.device)
+        return self._model
+
+    def rerank(
+        self,
+        query: str,
+        hits: List[Dict],
+        top_n: int,
+        budget_ms: Optional[float] = None,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict]:
+        """
+        budget_ms: time for scoring (None = no limit). A batch is not
+        started when the budget is spent or the batch would overrun it
+        at the speed of the previous one.
+        stats (if given) receives reranked / rerank_cached / timings_ms["rerank"].
+        """
+        query = " ".join((query or "").split())
+        top_n = min(max(0, top_n), len(hits))
+        if not query or not top_n:
+            return hits
+
+        model = self.load()  # first call only; not charged to the budget
+        start = time.perf_counter()
+
+        head = hits[:top_n]
+        keys = [self._key(query, h) for h in head]
+        scores: List[Optional[float]] = [self.cache.get(key) for key in keys]
+        cached = [score is not None for score in scores]
+        pending = [i for i, hit in enumerate(cached) if not hit]
+
+        pair_ms: Optional[float] = None
+        for b in range(0, len(pending), self.batch_size):
+            batch = pending[b : b + self.batch_size]
+
+            if budget_ms is not None:
+                elapsed_ms = (time.perf_counter() - start) * 1000.0
+                expected_ms = pair_ms * len(batch) if pair_ms is not None else 0.0
+                if elapsed_ms + expected_ms > budget_ms:
+                    break
+
+            t0 = time.perf_counter()
+            batch_scores = model.predict(
+                [(query, self._text(head[i])) for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+            )
+            pair_ms = (time.perf_counter() - t0) * 1000.0 / len(batch)
+
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self.cache.put(keys[i], scores[i])
+
+        # reranked prefix: up to the first candidate left unscored
+        done = next((i for i, score in enumerate(scores) if score is None), top_n)
+
+        reranked = [dict(h, rerank_score=scores[i]) for i, h in enumerate(head[:done])]
+        reranked.sort(key=lambda h: h["rerank_score"], reverse=True)
+
+        if stats is not None:
+            stats["reranked"] = done
+            stats["rerank_cached"] = sum(cached[:done])
+            stats.setdefault("timings_ms", {})["rerank"] = round((time.perf_counter() - start) * 1000.0, 2)
+
+        return reranked + hits[done:]
+
+    def _key(self, query: str, hit: Dict) -> str:
+        return f"{self.model_name}\x1f{query}\x1f{hit['document'].id}"
+
+    def _text(self, hit: Dict) -> str:
+        return (hit["document"].text or "")[: self.max_chars]
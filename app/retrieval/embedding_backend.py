@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Optional
+
+
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def create_embedding_client(
+    model_name: str = "all-MiniLM-L6-v2",
+    backend: str = "torch",
+    device: str = "cpu",
+    onnx_dir: Optional[Path] = None,
+    threads: Optional[int] = None,
+) -> Any:
+    """
+    Local embedding client for the configured backend:
+      torch      SentenceTransformer (PyTorch)
+      onnx       ONNX Runtime, model exported once into onnx_dir
+      onnx-int8  ONNX Runtime with dynamically int8-quantized weights
+    Backends are imported lazily, so the ONNX ones never load torch.
+    """
+    backend = (backend or "torch").strip().lower()
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBED_BACKENDS}")
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+
+        from app.retrieval.local_embedding_client import LocalEmbeddingClient
+        return LocalEmbeddingClient(model_name=model_name, device=device)
+
+    from app.retrieval.onnx_embedding_client import OnnxEmbeddingClient
+
+    if onnx_dir is None:
+        onnx_dir = Path("onnx")
+    return OnnxEmbeddingClient(
+        model_name=model_name,
+        model_dir=Path(onnx_dir) / model_name.replace("/", "__"),
+        quantize=backend == "onnx-int8",
+        threads=threads,
+    )
@@ -1,25 +1,43 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List
-import requests
+from typing import Any, List
+
+from app.ai.ollama_client import OllamaClient, get_ollama_client
+from app.core.config import OLLAMA_BASE_URL
 
 
 @dataclass(frozen=True)
 class OllamaEmbeddingClient:
-    base_url: str = "http://127.0.0.1:11434"
+    base_url: str = OLLAMA_BASE_URL
     model: str = "nomic-embed-text"
     timeout_sec: int = 60
 
+    @property
+    def http(self) -> OllamaClient:
+        # pooled keep-alive client shared by everything talking to this server
+        return get_ollama_client(self.base_url)
+
     def embed(self, text: str) -> List[float]:
         text = (text or "").strip()
         if not text:
             return []
 
-        url = f"{self.base_url.rstrip('/')}/api/embeddings"
-        payload = {"model": self.model, "prompt": text}
+        resp = self.http.post("/api/embeddings", self._payload(text), timeout=self.timeout_sec)
+        return self._parse(resp)
+
+    async def aembed(self, text: str) -> List[float]:
+        text = (text or "").strip()
+        if not text:
+            return []
+
+        resp = await self.http.apost("/api/embeddings", self._payload(text), timeout=self.timeout_sec)
+        return self._parse(resp)
+
+    def _payload(self, text: str) -> dict:
+        return {"model": self.model, "prompt": text}
 
-        resp = requests.post(url, json=payload, timeout=self.timeout_sec)
+    def _parse(self, resp: Any) -> List[float]:
         if resp.status_code != 200:
             raise RuntimeError(f"Ollama embeddings HTTP {resp.status_code}: {resp.text}")
 
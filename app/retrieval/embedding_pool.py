@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Union
+import multiprocessing
+import os
+
+import numpy as np
+
+
+# Smaller jobs run on the in-process client: spawning workers and
+# loading one model per worker costs more than it saves
+MIN_POOL_TEXTS = 2048
+
+
+# --------------------------------------------------------
+# Worker side
+# --------------------------------------------------------
+
+_worker_client = None
+
+
+def _init_worker(
+    model_name: str,
+    backend: str,
+    device: str,
+    onnx_dir: Optional[Path],
+    threads: int,
+) -> None:
+    global _worker_client
+
+    from app.retrieval.embedding_backend import create_embedding_client
+    _worker_client = create_embedding_client(
+        model_name=model_name,
+        backend=backend,
+        device=device,
+        onnx_dir=onnx_dir,
+        threads=threads,
+    )
+
+
+def _embed_in_worker(texts: List[str], batch_size: int) -> np.ndarray:
+    return _worker_client.embed_batch(texts, batch_size=batch_size)
+
+
+# --------------------------------------------------------
+# Pool
+# --------------------------------------------------------
+
+class ProcessEmbeddingPool:
+    """
+    CPU embedding across worker processes for index builds.
+
+    Each worker loads its own model (see create_embedding_client) with
+    threads_per_worker intra-op threads (default: cores / workers), so
+    batches run side by side instead of one model under-using the cores.
+    embed_batches yields results in submission order; workers are only
+    started by the first job of at least min_pool_texts texts.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        workers: int = 0,
+        threads_per_worker: Optional[int] = None,
+        device: str = "cpu",
+        backend: str = "torch",
+        onnx_dir: Optional[Path] = None,
+        local_client: Any = None,
+        min_pool_texts: int = MIN_POOL_TEXTS,
+    ):
+        cores = os.cpu_count() or 1
+
+        # 0 / None means one worker per CPU core
+        self.workers = max(1, int(workers)) if workers else cores
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.workers)
+
+        self.model = model_name
+        self.backend = backend
+        self.device = device
+        self.onnx_dir = onnx_dir
+        self.local_client = local_client
+
+        # vectors are keyed by this name; int8 vectors must not mix with float ones
+        self.model_name = getattr(local_client, "model_name", None) or (
+            f"{model_name}+int8" if backend == "onnx-int8" else model_name
+        )
+        self.min_pool_texts = min_pool_texts
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            print(
+                f"[Embedding] Starting {self.workers} workers "
+                f"x {self.threads_per_worker} threads"
+            )
+            # spawn: forking a process that already initialized torch can deadlock
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(
+                    self.model,
+                    self.backend,
+                    self.device,
+                    self.onnx_dir,
+                    self.threads_per_worker,
+                ),
+            )
+        return self._pool
+
+    # --------------------------------------------------------
+    # Embedding
+    # --------------------------------------------------------
+
+    def embed_batches(
+        self,
+        batches: List[List[str]],
+        batch_size: int = 256,
+    ) -> Iterator[Union[np.ndarray, Exception]]:
+        """
+        Embeds every batch; yields one array (or the exception it raised)
+        per batch, in order, as soon as it and all earlier batches are done.
+        """
+        total = sum(len(b) for b in batches)
+
+        if self.local_client is not None and total < self.min_pool_texts and self._pool is None:
+            for texts in batches:
+                try:
+                    yield self.local_client.embed_batch(texts, batch_size=batch_size)
+                except Exception as e:
+                    yield e
+            return
+
+        pool = self._ensure_pool()
+        futures = [pool.submit(_embed_in_worker, texts, batch_size) for texts in batches]
+
+        for future in futures:
+            try:
+                yield future.result()
+            except Exception as e:
+                yield e
+
+    def embed_batch(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        if not texts:
+            return np.array([])
+
+        chunks = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+        parts = list(self.embed_batches(chunks, batch_size))
+        for part in parts:
+            if isinstance(part, Exception):
+                raise part
+        return np.vstack(parts)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "ProcessEmbeddingPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,15 +1,40 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from app.core.config import RETRIEVER_TYPE
+from app.core.config import (
+    ACTIVE_DOMAIN,
+    BM25_BUILD_WORKERS,
+    BM25_INDEX_DIR,
+    BM25_POSITIONS,
+    BM25_STRATEGY,
+    DATASET_FILE,
+    EMBED_BACKEND,
+    EMBED_CACHE_DISK_ROWS,
+    EMBED_CACHE_FILE,
+    EMBED_CACHE_MAX_MB,
+    EMBED_WORKERS,
+    HYBRID_ADAPTIVE_DEPTH,
+    HYBRID_FUSION,
+    HYBRID_LEG_TIMEOUT_MS,
+    HYBRID_LEG_WORKERS,
+    RETRIEVER_TYPE,
+    VECTOR_CHECKPOINT_SECONDS,
+    VECTOR_CHECKPOINT_VECTORS,
+    VECTOR_INDEX_SPEC,
+)
 
-from app.retrieval.local_embedding_client import LocalEmbeddingClient
-from app.retrieval.vector_index import VectorIndex, VectorIndexArtifacts
+from app.retrieval.cached_embedding_client import CachedEmbeddingClient
+from app.retrieval.embedding_backend import create_embedding_client
+from app.retrieval.embedding_pool import ProcessEmbeddingPool
+from app.retrieval.vector_index import IndexSpec, VectorIndex, VectorIndexArtifacts
 from app.retrieval.vector_retriever import VectorRetriever
 from app.retrieval.bm25_retriever import BM25Retriever
+from app.retrieval.bm25_store import dataset_fingerprint
 from app.retrieval.hybrid_retriever import HybridRetriever
 from app.retrieval.router_retriever import RouterRetriever
+from app.retrieval.two_stage_retriever import TwoStageRetriever
 
 
 def create_retriever(
@@ -17,9 +42,22 @@ def create_retriever(
     data_dir: Path,
     default_mode: str | None = None,
     embed_model: str = "all-MiniLM-L6-v2",
+    dataset_path: Path | None = None,
+    bm25_workers: int | None = None,
+    index_spec: IndexSpec | dict | None = None,
+    embed_workers: int | None = None,
+    embed_backend: str | None = None,
 ) -> RouterRetriever:
 
     mode = (default_mode or RETRIEVER_TYPE or "hybrid").strip().lower()
+    dataset_path = dataset_path or data_dir / DATASET_FILE
+    if bm25_workers is None:
+        bm25_workers = BM25_BUILD_WORKERS
+    if embed_workers is None:
+        embed_workers = EMBED_WORKERS
+    embed_backend = embed_backend or EMBED_BACKEND
+    if not isinstance(index_spec, IndexSpec):
+        index_spec = IndexSpec.from_config(index_spec or VECTOR_INDEX_SPEC)
 
     # -------------------------------------------------
     # Load documents
@@ -41,64 +79,171 @@ def create_retriever(
     bm25 = None
     vector = None
     hybrid = None
+    two_stage = None
 
     # -------------------------------------------------
     # BM25 Mode
     # -------------------------------------------------
     if mode == "bm25":
-        bm25 = BM25Retriever(index_memory=index_memory)
-        bm25.build()
+        bm25 = _create_bm25(index_memory, docs, data_dir, dataset_path, bm25_workers)
 
     # -------------------------------------------------
     # Vector Mode
     # -------------------------------------------------
     elif mode == "vector":
-        client = LocalEmbeddingClient(
-            model_name=embed_model,
-            device="cpu",
+        vector = _create_vector(
+            index_memory, docs, data_dir, dataset_path,
+            embed_model, embed_backend, index_spec, embed_workers,
         )
 
-        artifacts = VectorIndexArtifacts(
-            embeddings_path=data_dir / "embeddings.npy",
-            faiss_index_path=data_dir / "faiss.index",
-            id_map_path=data_dir / "id_map.json",
-        )
+    # -------------------------------------------------
+    # Hybrid Mode
+    # -------------------------------------------------
+    elif mode in ("hybrid", "two_stage"):
+        # Build BM25
+        bm25 = _create_bm25(index_memory, docs, data_dir, dataset_path, bm25_workers)
 
-        vindex = VectorIndex(client=client, artifacts=artifacts)
+        # Build Vector
+        vector = _create_vector(
+            index_memory, docs, data_dir, dataset_path,
+            embed_model, embed_backend, index_spec, embed_workers,
+        )
+        hybrid = HybridRetriever(
+            bm25=bm25,
+            vector=vector,
+            fusion=HYBRID_FUSION,
+            adaptive=HYBRID_ADAPTIVE_DEPTH,
+            leg_timeout_ms=HYBRID_LEG_TIMEOUT_MS,
+            executor=ThreadPoolExecutor(
+                max_workers=HYBRID_LEG_WORKERS, thread_name_prefix="hybrid-leg"
+            ),
+        )
+        if vector.vector_index.has_embeddings:
+            two_stage = TwoStageRetriever(bm25=bm25, vector=vector)
+        elif mode == "two_stage":
+            raise RuntimeError("two_stage mode needs embeddings.npy next to the FAISS index.")
 
-        vindex.build_and_save(
-            documents=docs,
-            text_getter=lambda d: getattr(d, "text", "") or "",
-            id_getter=lambda d: getattr(d, "id", ""),
-            force_rebuild=False,
-            batch_size=256,
-            max_chars=2000,
+    else:
+        raise ValueError(
+            f"Invalid RETRIEVER_TYPE '{mode}'. Use bm25 | vector | hybrid | two_stage."
         )
 
-        vector = VectorRetriever(index_memory=index_memory, vector_index=vindex)
+    return RouterRetriever(
+        bm25=bm25,
+        vector=vector,
+        hybrid=hybrid,
+        default_mode=mode,
+        two_stage=two_stage,
+    )
+
 
-    # -------------------------------------------------
-    # Hybrid Mode
-    # -------------------------------------------------
-    elif mode == "hybrid":
-        # Build BM25
-        bm25 = BM25Retriever(index_memory=index_memory)
+def _create_bm25(
+    index_memory,
+    docs,
+    data_dir: Path,
+    dataset_path: Path,
+    workers: int,
+) -> BM25Retriever:
+    """
+    Memory-map the persisted BM25 index when its fingerprint matches the
+    dataset and tokenizer config, otherwise rebuild and persist it.
+    """
+    bm25 = BM25Retriever(
+        index_memory=index_memory,
+        strategy=BM25_STRATEGY,
+        build_workers=workers,
+        positions=BM25_POSITIONS,
+    )
+
+    if not Path(dataset_path).exists():
         bm25.build()
+        return bm25
 
-        # Build Vector
-        client = LocalEmbeddingClient(
+    index_dir = data_dir / BM25_INDEX_DIR
+    fingerprint = dataset_fingerprint(
+        dataset_path,
+        domain=ACTIVE_DOMAIN,
+        num_docs=len(docs),
+        k1=bm25.k1,
+        b=bm25.b,
+        positions=bm25.positions,
+    )
+
+    if bm25.load(index_dir, fingerprint):
+        print(f"Loaded BM25 index from {index_dir}")
+        return bm25
+
+    print("BM25 index missing or stale, rebuilding...")
+    bm25.build()
+    bm25.save(index_dir, fingerprint)
+    print(f"Saved BM25 index to {index_dir}")
+    return bm25
+
+
+def _create_vector(
+    index_memory,
+    docs,
+    data_dir: Path,
+    dataset_path: Path,
+    embed_model: str,
+    embed_backend: str,
+    index_spec: IndexSpec,
+    embed_workers: int,
+) -> VectorRetriever:
+    """
+    Loads the FAISS index when the dataset is unchanged, otherwise
+    updates it incrementally (only new or changed texts are embedded).
+    A cached index of another type is rebuilt from the stored vectors.
+    """
+    client = create_embedding_client(
+        model_name=embed_model,
+        backend=embed_backend,
+        device="cpu",
+        onnx_dir=data_dir / "onnx",
+    )
+
+    artifacts = VectorIndexArtifacts(
+        embeddings_path=data_dir / "embeddings.npy",
+        faiss_index_path=data_dir / "faiss.index",
+        id_map_path=data_dir / "id_map.npy",
+    )
+
+    query_client = CachedEmbeddingClient(
+        client,
+        max_mb=EMBED_CACHE_MAX_MB,
+        disk_path=data_dir / EMBED_CACHE_FILE if EMBED_CACHE_FILE else None,
+        disk_max_rows=EMBED_CACHE_DISK_ROWS,
+    )
+
+    # corpus embedding may go through a process pool; queries stay in-process
+    build_client = client
+    if embed_workers != 1:
+        build_client = ProcessEmbeddingPool(
             model_name=embed_model,
-            device="cpu",
+            workers=embed_workers,
+            backend=embed_backend,
+            onnx_dir=data_dir / "onnx",
+            local_client=client,
         )
 
-        artifacts = VectorIndexArtifacts(
-            embeddings_path=data_dir / "embeddings.npy",
-            faiss_index_path=data_dir / "faiss.index",
-            id_map_path=data_dir / "id_map.json",
-        )
+    vindex = VectorIndex(
+        client=build_client,
+        artifacts=artifacts,
+        spec=index_spec,
+        query_client=query_client,
+    )
 
-        vindex = VectorIndex(client=client, artifacts=artifacts)
+    source_fingerprint = None
+    if Path(dataset_path).exists():
+        source_fingerprint = dataset_fingerprint(
+            dataset_path,
+            domain=ACTIVE_DOMAIN,
+            num_docs=len(docs),
+            model=client.model_name,
+            max_chars=2000,
+        )
 
+    try:
         vindex.build_and_save(
             documents=docs,
             text_getter=lambda d: getattr(d, "text", "") or "",
@@ -106,19 +251,12 @@ def create_retriever(
             force_rebuild=False,
             batch_size=256,
             max_chars=2000,
+            checkpoint_vectors=VECTOR_CHECKPOINT_VECTORS,
+            checkpoint_seconds=VECTOR_CHECKPOINT_SECONDS,
+            source_fingerprint=source_fingerprint,
         )
+    finally:
+        if build_client is not client:
+            build_client.close()
 
-        vector = VectorRetriever(index_memory=index_memory, vector_index=vindex)
-        hybrid = HybridRetriever(bm25=bm25, vector=vector)
-
-    else:
-        raise ValueError(
-            f"Invalid RETRIEVER_TYPE '{mode}'. Use bm25 | vector | hybrid."
-        )
-
-    return RouterRetriever(
-        bm25=bm25,
-        vector=vector,
-        hybrid=hybrid,
-        default_mode=mode,
-    )
+    return VectorRetriever(index_memory=index_memory, vector_index=vindex)
@@ -1,67 +1,367 @@
 from __future__ import annotations
 
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
+import math
+import time
 
 from app.retrieval.bm25_retriever import BM25Retriever
 from app.retrieval.vector_retriever import VectorRetriever
 
 
+_FUSIONS = ("weighted", "rrf", "zscore")
+
+# Lowest possible leg score: what an unseen document can fall back to
+_SCORE_FLOOR = {"bm25": 0.0, "vector": -1.0}
+
+# zscore: a document a leg did not return scores this far (in std) below
+# the leg's lowest returned hit, not at the leg's theoretical floor
+_ZSCORE_MISSING_MARGIN = 0.5
+
+
 @dataclass
 class HybridRetriever:
     bm25: BM25Retriever
     vector: VectorRetriever
     bm25_weight: float = 0.6
     vector_weight: float = 0.4
+    # weighted (max-normalized BM25 + (cos+1)/2), rrf or zscore
+    fusion: str = "weighted"
+    rrf_k: int = 60
+    # Candidates per leg as multiples of top_k: fixed depth, or adaptive
+    # from min_depth, doubling one leg at a time up to max_depth (zscore
+    # always fetches max_depth: its statistics move with the depth)
+    depth: int = 5
+    adaptive: bool = False
+    min_depth: int = 2
+    max_depth: int = 20
+    # Deadline per pooled leg, from when it starts running; a leg that
+    # misses it is dropped (None = wait). Adaptive rounds stop past it.
+    leg_timeout_ms: Optional[float] = None
+    # Thread pool for the second leg (shared by all requests; the first
+    # runs in the request thread): size it to the request concurrency
+    executor: Optional[Executor] = None
 
-    def search(self, query: str, top_k: int) -> List[Dict]:
-        # Pull more candidates to make hybrid meaningful
-        widen = max(top_k * 5, top_k)
+    def __post_init__(self):
+        self.fusion = self._fusion(self.fusion)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=40, thread_name_prefix="hybrid-leg")
 
-        bm25_hits = self.bm25.search(query, widen)   # list[{document,score,matched_terms}]
-        vec_hits = self.vector.search(query, widen)  # list[{document,score,matched_terms=[]}]
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        phrases: Optional[List[str]] = None,
+        vector_params: Optional[Dict[str, Any]] = None,
+        doc_filter=None,
+        stats: Optional[Dict[str, Any]] = None,
+        fusion: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Both legs run concurrently: BM25 in the request thread, the vector
+        leg on the pool (the encoder, FAISS and the numpy BM25 scoring
+        release the GIL). If the vector leg misses leg_timeout_ms the BM25
+        hits are fused alone.
 
-        # Normalize BM25 by max
-        bm25_max = max([h["score"] for h in bm25_hits], default=0.0) or 1.0
+        With adaptive depth both legs start at top_k * min_depth. While the
+        fused top_k could still change (a document ranked below it, or not
+        fetched yet, can reach the k-th score), the leg with the most
+        headroom is fetched twice as deep. zscore normalizes with the mean
+        and std of what was fetched, so deepening changes every fused
+        score and no depth can be proven final: with adaptive on it
+        fetches max_depth in one round instead. stats (if given) receives
+        partial / timed_out / timings_ms / candidates / rounds / fusion.
+        """
+        fusion = self._fusion(fusion)
+        calls = {
+            "bm25": lambda k: (self.bm25.search, (query, k), {"phrases": phrases, "doc_filter": doc_filter}),   # list[{document,score,matched_terms}]
+            "vector": lambda k: (self.vector.search, (query, k), {"params": vector_params, "doc_filter": doc_filter}),  # list[{document,score,matched_terms=[]}]
+        }
 
-        # Vector scores are cosine-ish; map to [0,1]
-        def vec_norm(s: float) -> float:
-            return (s + 1.0) / 2.0
-
-        # Merge by doc.id
-        merged: Dict[str, Dict] = {}
-
-        for h in bm25_hits:
-            doc = h["document"]
-            doc_id = str(doc.id)
-            merged.setdefault(
-                doc_id,
-                {"document": doc, "bm25": 0.0, "vec": 0.0, "matched_terms": set()},
+        start = time.perf_counter()
+        deadline = None if self.leg_timeout_ms is None else start + self.leg_timeout_ms / 1000.0
+
+        # Pull more candidates to make hybrid meaningful
+        adaptive = self.adaptive and fusion != "zscore"
+        if adaptive:
+            first = self.min_depth
+        else:
+            first = self.max_depth if self.adaptive else self.depth
+        depths = {leg: max(top_k * first, top_k) for leg in calls}
+        max_depth = max(top_k * self.max_depth, top_k)
+
+        hits: Dict[str, List[Dict]] = {}
+        timings: Dict[str, float] = {leg: 0.0 for leg in calls}
+        timed_out: List[str] = []
+        rounds = 0
+
+        pending = list(calls)
+        while pending:
+            rounds += 1
+            done, missed, elapsed = self._run_legs(
+                {leg: calls[leg](depths[leg]) for leg in pending}, self.leg_timeout_ms
             )
-            merged[doc_id]["bm25"] = float(h["score"]) / bm25_max
-            for t in (h.get("matched_terms") or []):
-                merged[doc_id]["matched_terms"].add(t)
-
-        for h in vec_hits:
-            doc = h["document"]
-            doc_id = str(doc.id)
-            merged.setdefault(
-                doc_id,
-                {"document": doc, "bm25": 0.0, "vec": 0.0, "matched_terms": set()},
+            hits.update(done)
+            for leg, ms in elapsed.items():
+                timings[leg] += ms
+            timed_out.extend(missed)
+
+            results, deepen = self._fuse(hits, depths, top_k, fusion)
+            deepen = [leg for leg in deepen if depths[leg] < max_depth]
+            if not adaptive or missed or not deepen:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break  # no time left for another round
+            depths[deepen[0]] = min(depths[deepen[0]] * 2, max_depth)
+            pending = deepen[:1]
+
+        if stats is not None:
+            stats["partial"] = any(leg not in hits for leg in timed_out)
+            stats["timed_out"] = timed_out
+            stats["timings_ms"] = {leg: round(ms, 2) for leg, ms in timings.items()}
+            stats["candidates"] = {leg: len(leg_hits) for leg, leg_hits in hits.items()}
+            stats["rounds"] = rounds
+            stats["fusion"] = fusion
+
+        return results
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int,
+        phrases: Optional[List[Optional[List[str]]]] = None,
+        vector_params: Optional[Dict[str, Any]] = None,
+        doc_filter=None,
+        fusion: Optional[str] = None,
+    ) -> List[List[Dict]]:
+        """
+        search() for a batch: each leg runs once over all queries
+        (concurrently, at the fixed depth, without a deadline).
+        """
+        fusion = self._fusion(fusion)
+        widen = max(top_k * self.depth, top_k)
+        depths = {"bm25": widen, "vector": widen}
+
+        legs, _, _ = self._run_legs(
+            {
+                "bm25": (self.bm25.search_many, (queries, widen), {"phrases": phrases, "doc_filter": doc_filter}),
+                "vector": (self.vector.search_many, (queries, widen), {"params": vector_params, "doc_filter": doc_filter}),
+            },
+            None,
+        )
+
+        return [
+            self._fuse({"bm25": b, "vector": v}, depths, top_k, fusion)[0]
+            for b, v in zip(legs["bm25"], legs["vector"])
+        ]
+
+    # --------------------------------------------------------
+    # Concurrent legs
+    # --------------------------------------------------------
+
+    def _run_legs(
+        self,
+        calls: Dict[str, Tuple[Any, tuple, Dict[str, Any]]],
+        timeout_ms: Optional[float],
+    ) -> Tuple[Dict[str, Any], List[str], Dict[str, float]]:
+        """
+        Runs the first leg in the calling thread (BM25: local and
+        predictable) and submits the others to the pool, where a deadline
+        can drop them. A submitted leg still queued when the inline leg is done
+        is taken back and run inline too, so queueing never costs more
+        than running sequentially. A leg running in the pool is given
+        timeout_ms from the moment it started, not from submit (None =
+        wait for it). The inline leg has no deadline.
+
+        Returns the results of the legs that finished, the legs that
+        missed their deadline and the time per leg; errors are raised.
+        """
+        names = list(calls)
+        started: Dict[str, float] = {}
+
+        def run(name: str):
+            started[name] = time.perf_counter()
+            fn, args, kwargs = calls[name]
+            return _timed(fn, *args, **kwargs)
+
+        futures = {name: self.executor.submit(run, name) for name in names[1:]}
+
+        results: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        missed: List[str] = []
+
+        results[names[0]], timings[names[0]] = run(names[0])
+
+        for name, future in futures.items():
+            if future.cancel():
+                # never started: the pool is busy, run it here
+                results[name], timings[name] = run(name)
+                continue
+
+            timeout = None
+            if timeout_ms is not None:
+                # not set yet only if the worker picked it up a moment ago
+                leg_deadline = started.get(name, time.perf_counter()) + timeout_ms / 1000.0
+                timeout = max(0.0, leg_deadline - time.perf_counter())
+            wait([future], timeout=timeout)
+
+            if future.done():
+                results[name], timings[name] = future.result()
+            else:
+                # running in the pool: the result is discarded
+                missed.append(name)
+                timings[name] = (time.perf_counter() - started.get(name, time.perf_counter())) * 1000.0
+
+        if missed:
+            print(f"[Hybrid] {', '.join(missed)} leg missed the {timeout_ms:g} ms deadline")
+
+        return results, missed, timings
+
+    # --------------------------------------------------------
+    # Fusion
+    # --------------------------------------------------------
+
+    def _fusion(self, fusion: Optional[str]) -> str:
+        fusion = (fusion or self.fusion or "weighted").strip().lower()
+        if fusion not in _FUSIONS:
+            raise ValueError(f"Unknown fusion: {fusion}. Use {' | '.join(_FUSIONS)}.")
+        return fusion
+
+    def _fuse(
+        self,
+        hits: Dict[str, List[Dict]],
+        depths: Dict[str, int],
+        top_k: int,
+        fusion: str,
+    ) -> Tuple[List[Dict], List[str]]:
+        """
+        Fused top_k, plus the legs worth fetching deeper (most headroom
+        first) while the top_k is not final yet; empty when it is.
+
+        Every leg contributes weight * normalized score. A document a leg
+        did not return gets that leg's floor ("missing"; for zscore just
+        below the leg's lowest returned hit, see _missing); had the leg been
+        fetched deeper it could have scored at most the leg's last score
+        ("bound"), unless the leg returned fewer hits than asked for.
+        """
+        weights = {"bm25": self.bm25_weight, "vector": self.vector_weight}
+        legs = [leg for leg in ("bm25", "vector") if leg in hits]
+
+        missing: Dict[str, float] = {}
+        bound: Dict[str, float] = {}
+
+        # Merge by document ordinal (position in IndexMemory), doc.id as fallback
+        merged: Dict[Any, Dict] = {}
+
+        for leg in legs:
+            leg_hits = hits[leg]
+            norm = self._normalizer(fusion, leg, leg_hits)
+            w = weights[leg]
+
+            for rank, h in enumerate(leg_hits):
+                doc_id = _merge_key(h)
+                row = merged.setdefault(
+                    doc_id,
+                    {"document": h["document"], "parts": {}, "matched_terms": set()},
+                )
+                if h.get("ordinal") is not None:
+                    row["ordinal"] = h["ordinal"]
+                row["parts"][leg] = w * norm(rank, float(h["score"]))
+                for t in (h.get("matched_terms") or []):
+                    row["matched_terms"].add(t)
+                if "phrase_matches" in h:
+                    row["phrase_matches"] = h["phrase_matches"]
+
+            missing[leg] = w * self._missing(fusion, leg, leg_hits, norm)
+            exhausted = len(leg_hits) < depths[leg]
+            bound[leg] = (
+                missing[leg] if exhausted or not leg_hits
+                else w * norm(len(leg_hits), float(leg_hits[-1]["score"]))
             )
-            merged[doc_id]["vec"] = vec_norm(float(h["score"]))
 
-        # Final scoring
+        # Final scoring (lower = reported score, upper = best reachable)
         out: List[Dict] = []
+        upper: List[float] = []
         for doc_id, row in merged.items():
-            final = self.bm25_weight * row["bm25"] + self.vector_weight * row["vec"]
-            out.append(
-                {
-                    "document": row["document"],
-                    "score": float(final),
-                    "matched_terms": sorted(list(row["matched_terms"])),
-                }
-            )
+            final = 0.0
+            best = 0.0
+            for leg in legs:
+                final += row["parts"].get(leg, missing[leg])
+                best += row["parts"].get(leg, bound[leg])
+            item = {
+                "document": row["document"],
+                "score": float(final),
+                "matched_terms": sorted(list(row["matched_terms"])),
+            }
+            for key in ("ordinal", "phrase_matches"):
+                if key in row:
+                    item[key] = row[key]
+            out.append(item)
+            upper.append(best)
+
+        order = sorted(range(len(out)), key=lambda i: out[i]["score"], reverse=True)
+        results = [out[i] for i in order[:top_k]]
+
+        # headroom a deeper fetch could add, per leg that is not exhausted
+        slack = {leg: bound[leg] - missing[leg] for leg in legs if bound[leg] > missing[leg]}
+        if not slack:
+            return results, []
+
+        if len(results) == top_k:
+            # top_k is final when nothing below it (fetched or not) can reach the k-th score
+            threat = max([upper[i] for i in order[top_k:]], default=float("-inf"))
+            threat = max(threat, sum(bound[leg] for leg in legs))
+            if results[-1]["score"] >= threat:
+                return results, []
+
+        return results, sorted(slack, key=slack.get, reverse=True)
+
+    def _missing(self, fusion: str, leg: str, leg_hits: List[Dict], norm) -> float:
+        """
+        Normalized leg score of a document the leg did not return.
+        """
+        if fusion == "rrf":
+            return 0.0
+        if fusion == "zscore":
+            # the floor (cosine -1) sits 10-20 std below a tight vector
+            # distribution and would bury every single-leg hit
+            if not leg_hits:
+                return 0.0
+            lowest = min(norm(rank, float(h["score"])) for rank, h in enumerate(leg_hits))
+            return lowest - _ZSCORE_MISSING_MARGIN
+        return norm(None, _SCORE_FLOOR[leg])
+
+    def _normalizer(self, fusion: str, leg: str, leg_hits: List[Dict]):
+        """
+        (rank, score) -> normalized leg score.
+        """
+        if fusion == "rrf":
+            return lambda rank, score: 1.0 / (self.rrf_k + rank + 1) if rank is not None else 0.0
+
+        scores = [float(h["score"]) for h in leg_hits]
+
+        if fusion == "zscore":
+            mean = sum(scores) / len(scores) if scores else 0.0
+            std = math.sqrt(sum((s - mean) ** 2 for s in scores) / len(scores)) if scores else 0.0
+            std = std or 1.0
+            return lambda rank, score: (score - mean) / std
+
+        if leg == "bm25":
+            # Normalize BM25 by max
+            bm25_max = max(scores, default=0.0) or 1.0
+            return lambda rank, score: score / bm25_max
+
+        # Vector scores are cosine-ish; map to [0,1]
+        return lambda rank, score: (score + 1.0) / 2.0
+
+
+def _merge_key(hit: Dict) -> Any:
+    ordinal = hit.get("ordinal")
+    return ordinal if ordinal is not None else str(hit["document"].id)
+
 
-        out.sort(key=lambda x: x["score"], reverse=True)
-        return out[:top_k]
+def _timed(fn, *args, **kwargs) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000.0
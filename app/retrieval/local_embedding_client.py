@@ -13,6 +13,7 @@ class LocalEmbeddingClient:
         device: str = "cpu",   # 👈 NEW PARAM
     ):
         self.device = device
+        self.model_name = model_name
         print(f"[Embedding] Using device: {self.device}")
 
         self.model = SentenceTransformer(model_name, device=self.device)
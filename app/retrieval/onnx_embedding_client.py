@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import os
+import shutil
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+
+
+_MODEL_FILE = "model.onnx"
+_INT8_FILE = "model.int8.onnx"
+_TOKENIZER_FILE = "tokenizer.json"
+_CONFIG_FILE = "export.json"
+
+
+# --------------------------------------------------------
+# Export (needs torch + sentence-transformers, runs once)
+# --------------------------------------------------------
+
+def export_onnx_model(model_name: str, model_dir: Path, quantize: bool = False) -> Path:
+    """
+    Exports the SentenceTransformer's transformer to model_dir/model.onnx
+    (dynamic batch and sequence axes), with its fast tokenizer and pooling
+    config. With quantize, also writes model.int8.onnx (dynamic int8
+    weights). Existing files are kept; returns model_dir.
+    """
+    model_dir = Path(model_dir)
+
+    if not (model_dir / _CONFIG_FILE).exists():
+        _export(model_name, model_dir)
+
+    if quantize and not (model_dir / _INT8_FILE).exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"[Embedding] Quantizing {model_name} to int8")
+        tmp_path = model_dir / (_INT8_FILE + ".tmp")
+        quantize_dynamic(
+            str(model_dir / _MODEL_FILE),
+            str(tmp_path),
+            weight_type=QuantType.QInt8,
+        )
+        os.replace(tmp_path, model_dir / _INT8_FILE)
+
+    return model_dir
+
+
+def _export(model_name: str, model_dir: Path) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    print(f"[Embedding] Exporting {model_name} to ONNX")
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    st_model.eval()
+
+    transformer = st_model[0].auto_model
+    tokenizer = st_model.tokenizer
+    if not getattr(tokenizer, "is_fast", False):
+        raise RuntimeError(f"{model_name} has no fast tokenizer; ONNX export needs tokenizer.json")
+
+    pooling = _pooling_mode(st_model)
+    input_names = ["input_ids", "attention_mask"]
+    if "token_type_ids" in tokenizer.model_input_names:
+        input_names.append("token_type_ids")
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            out = self.model(**dict(zip(input_names, inputs)))
+            return out[0]  # last hidden state
+
+    sample = tokenizer(["an example sentence"], return_tensors="pt")
+    axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    # export into a scratch dir and swap it in, so workers never see half a model
+    tmp_dir = model_dir.with_name(model_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    with torch.inference_mode():
+        torch.onnx.export(
+            _Encoder(transformer),
+            tuple(sample[name] for name in input_names),
+            str(tmp_dir / _MODEL_FILE),
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=axes,
+            opset_version=14,
+            do_constant_folding=True,
+        )
+
+    tokenizer.backend_tokenizer.save(str(tmp_dir / _TOKENIZER_FILE))
+
+    config = {
+        "model": model_name,
+        "inputs": input_names,
+        "pooling": pooling,
+        "max_seq_length": int(st_model.max_seq_length),
+        "pad_id": int(tokenizer.pad_token_id or 0),
+        "pad_token": tokenizer.pad_token or "[PAD]",
+    }
+    with (tmp_dir / _CONFIG_FILE).open("w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    shutil.rmtree(model_dir, ignore_errors=True)
+    model_dir.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_dir, model_dir)
+
+
+def _pooling_mode(st_model: Any) -> str:
+    for module in st_model:
+        if getattr(module, "pooling_mode_cls_token", False):
+            return "cls"
+        if getattr(module, "pooling_mode_max_tokens", False):
+            return "max"
+        if getattr(module, "pooling_mode_mean_tokens", False):
+            return "mean"
+    return "mean"
+
+
+# --------------------------------------------------------
+# Client
+# --------------------------------------------------------
+
+class OnnxEmbeddingClient:
+    """
+    LocalEmbeddingClient served by ONNX Runtime instead of PyTorch.
+
+    Same interface and output: pooled, L2-normalized float32 vectors.
+    The model is exported into model_dir on first use; afterwards only
+    onnxruntime and tokenizers are needed (no torch at serve time).
+    quantize=True runs the dynamic int8 model, which gives slightly
+    different vectors, so its model_name (and cache keys) differ.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        model_dir: Optional[Path] = None,
+        quantize: bool = False,
+        threads: Optional[int] = None,
+    ):
+        model_dir = Path(model_dir or Path("onnx") / model_name.replace("/", "__"))
+        export_onnx_model(model_name, model_dir, quantize=quantize)
+
+        with (model_dir / _CONFIG_FILE).open("r", encoding="utf-8") as f:
+            self.config: Dict[str, Any] = json.load(f)
+
+        self.device = "cpu"
+        self.quantize = quantize
+        self.model_name = f"{model_name}+int8" if quantize else model_name
+        print(f"[Embedding] Using ONNX Runtime ({'int8' if quantize else 'float32'})")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = int(threads)
+
+        model_file = _INT8_FILE if quantize else _MODEL_FILE
+        self.session = ort.InferenceSession(
+            str(model_dir / model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / _TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(
+            pad_id=self.config["pad_id"],
+            pad_token=self.config["pad_token"],
+        )
+
+    # --------------------------------------------------------
+    # Batch embedding (FAST PATH)
+    # --------------------------------------------------------
+
+    def embed_batch(
+        self,
+        texts: List[str],
+        batch_size: int = 256,
+    ) -> np.ndarray:
+
+        if not texts:
+            return np.array([])
+
+        # like SentenceTransformer.encode: similar lengths share a batch
+        order = np.argsort([-len(t or "") for t in texts], kind="stable")
+        out = np.empty((len(texts), 0), dtype=np.float32)
+
+        for start in range(0, len(texts), batch_size):
+            rows = order[start : start + batch_size]
+            vectors = self._encode([texts[i] or "" for i in rows])
+            if out.shape[1] == 0:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[rows] = vectors
+
+        return out
+
+    # --------------------------------------------------------
+    # Single embedding (rare use)
+    # --------------------------------------------------------
+
+    def embed(self, text: str) -> List[float]:
+        return self.embed_batch([text], batch_size=1)[0].tolist()
+
+    # --------------------------------------------------------
+    # Inference
+    # --------------------------------------------------------
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+        }
+        if "token_type_ids" in self.config["inputs"]:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden = self.session.run(None, feeds)[0]
+        pooled = _pool(hidden, mask, self.config["pooling"])
+
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def _pool(hidden: np.ndarray, mask: np.ndarray, mode: str) -> np.ndarray:
+    if mode == "cls":
+        return hidden[:, 0]
+
+    weights = mask[:, :, None].astype(hidden.dtype)
+    if mode == "max":
+        return np.where(weights > 0, hidden, -1e9).max(axis=1)
+
+    summed = (hidden * weights).sum(axis=1)
+    return summed / np.maximum(weights.sum(axis=1), 1e-9)
@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
+import time
 
 from app.retrieval.bm25_retriever import BM25Retriever
 from app.retrieval.vector_retriever import VectorRetriever
 from app.retrieval.hybrid_retriever import HybridRetriever
+from app.retrieval.two_stage_retriever import TwoStageRetriever
 
 
-_ALLOWED_MODES = {"bm25", "vector", "hybrid"}
+_ALLOWED_MODES = {"bm25", "vector", "hybrid", "two_stage"}
 
 
 @dataclass
@@ -17,36 +19,119 @@ class RouterRetriever:
     vector: VectorRetriever
     hybrid: HybridRetriever
     default_mode: str = field(default="hybrid")
+    # BM25 candidates ranked by exact cosine (needs both indexes)
+    two_stage: Optional[TwoStageRetriever] = None
 
     def __post_init__(self):
         mode = (self.default_mode or "hybrid").strip().lower()
         if mode not in _ALLOWED_MODES:
             raise ValueError(
                 f"Invalid default_mode '{self.default_mode}'. "
-                f"Allowed: bm25 | vector | hybrid."
+                f"Allowed: bm25 | vector | hybrid | two_stage."
             )
         self.default_mode = mode
 
+    def has_mode(self, mode: str) -> bool:
+        """
+        Whether the retriever for this mode was built.
+        """
+        mode = (mode or "").strip().lower()
+        return mode in _ALLOWED_MODES and getattr(self, mode) is not None
+
     def search(
         self,
         query: str,
         top_k: int,
-        mode: Optional[str] = None
+        mode: Optional[str] = None,
+        phrases: Optional[List[str]] = None,
+        vector_params: Optional[Dict[str, Any]] = None,
+        doc_filter=None,
+        stats: Optional[Dict[str, Any]] = None,
+        fusion: Optional[str] = None,
     ) -> List[Dict]:
+        """
+        stats (optional) receives partial / timed_out / timings_ms /
+        candidates per leg. fusion only applies to hybrid.
+        """
+        selected_mode = (mode or self.default_mode).strip().lower()
+
+        if selected_mode not in _ALLOWED_MODES:
+            raise ValueError(
+                f"Unknown retrieval mode: {selected_mode}. "
+                f"Use bm25 | vector | hybrid | two_stage."
+            )
+
+        if selected_mode == "two_stage":
+            return self._two_stage().search(
+                query, top_k, phrases=phrases, doc_filter=doc_filter, stats=stats,
+            )
+
+        if selected_mode == "hybrid":
+            return self.hybrid.search(
+                query, top_k, phrases=phrases, vector_params=vector_params,
+                doc_filter=doc_filter, stats=stats, fusion=fusion,
+            )
+
+        start = time.perf_counter()
+        if selected_mode == "bm25":
+            results = self.bm25.search(query, top_k, phrases=phrases, doc_filter=doc_filter)
+        else:
+            results = self.vector.search(query, top_k, params=vector_params, doc_filter=doc_filter)
+
+        if stats is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            stats.update(
+                partial=False,
+                timed_out=[],
+                timings_ms={selected_mode: round(elapsed_ms, 2)},
+                candidates={selected_mode: len(results)},
+            )
+        return results
 
+    def add_snippets(self, results: List[Dict]) -> List[Dict]:
+        """
+        BM25 snippets for the final results (see BM25Retriever.add_snippets).
+        """
+        if self.bm25 is None:
+            return results
+        return self.bm25.add_snippets(results)
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int,
+        mode: Optional[str] = None,
+        phrases: Optional[List[Optional[List[str]]]] = None,
+        vector_params: Optional[Dict[str, Any]] = None,
+        doc_filter=None,
+        fusion: Optional[str] = None,
+    ) -> List[List[Dict]]:
+        """
+        search() for a batch of queries sharing mode, ANN knobs and filter.
+        """
         selected_mode = (mode or self.default_mode).strip().lower()
 
         if selected_mode not in _ALLOWED_MODES:
             raise ValueError(
                 f"Unknown retrieval mode: {selected_mode}. "
-                f"Use bm25 | vector | hybrid."
+                f"Use bm25 | vector | hybrid | two_stage."
             )
 
         if selected_mode == "bm25":
-            return self.bm25.search(query, top_k)
+            return self.bm25.search_many(queries, top_k, phrases=phrases, doc_filter=doc_filter)
 
         if selected_mode == "vector":
-            return self.vector.search(query, top_k)
+            return self.vector.search_many(queries, top_k, params=vector_params, doc_filter=doc_filter)
+
+        if selected_mode == "two_stage":
+            return self._two_stage().search_many(queries, top_k, phrases=phrases, doc_filter=doc_filter)
+
+        return self.hybrid.search_many(
+            queries, top_k, phrases=phrases, vector_params=vector_params,
+            doc_filter=doc_filter, fusion=fusion,
+        )
 
-        # hybrid
-        return self.hybrid.search(query, top_k)
+    def _two_stage(self) -> TwoStageRetriever:
+        if self.two_stage is None:
+            raise ValueError("two_stage mode needs both the BM25 and the vector index (RETRIEVER_TYPE hybrid).")
+        return self.two_stage
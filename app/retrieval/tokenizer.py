@@ -1,8 +1,9 @@
 import re
-from typing import List
+from typing import Any, Dict, List, Tuple
 
 # Keep letters/numbers, treat everything else as separator.
 _NON_WORD_RE = re.compile(r"[^\w]+", flags=re.UNICODE)
+_WORD_RE = re.compile(r"\w+", flags=re.UNICODE)
 
 # Minimal stopword list (can be extended later)
 _STOPWORDS = {
@@ -18,6 +19,20 @@ _STOPWORDS = {
     "to"
 }
 
+def tokenizer_config() -> Dict[str, Any]:
+    """
+    Everything that changes tokenize() / tokenize_spans() output.
+    Persisted indexes are keyed on it.
+    """
+    return {
+        "pattern": _NON_WORD_RE.pattern,
+        "lowercase": True,
+        "stopwords": sorted(_STOPWORDS),
+        # spans: words found in the lowercased text, mapped back
+        "spans": "lowered",
+    }
+
+
 def tokenize(text: str) -> List[str]:
     """
     Deterministic, language-agnostic-ish tokenizer.
@@ -42,3 +57,40 @@ def tokenize(text: str) -> List[str]:
     tokens = [t for t in tokens if t not in _STOPWORDS]
 
     return tokens
+
+
+def tokenize_spans(text: str) -> Tuple[List[str], List[int], List[int]]:
+    """
+    Same tokens as tokenize(), plus the character span of each token
+    in the original text (tokens, starts, ends).
+
+    Words are found in the lowercased text, as in tokenize(): lowercasing
+    can change lengths and word boundaries ("İ" -> "i" + combining dot),
+    so offsets are mapped back to the original characters.
+    """
+    tokens: List[str] = []
+    starts: List[int] = []
+    ends: List[int] = []
+
+    if not text:
+        return tokens, starts, ends
+
+    lowered = text.lower()
+    origin = None
+    if len(lowered) != len(text):
+        # original index of every lowercased character
+        origin = [i for i, ch in enumerate(text) for _ in range(len(ch.lower()))]
+
+    for m in _WORD_RE.finditer(lowered):
+        token = m.group()
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if origin is None:
+            starts.append(m.start())
+            ends.append(m.end())
+        else:
+            starts.append(origin[m.start()])
+            ends.append(origin[m.end() - 1] + 1)
+
+    return tokens, starts, ends
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import time
+
+import numpy as np
+
+from app.retrieval.bm25_retriever import BM25Retriever
+from app.retrieval.vector_retriever import VectorRetriever
+
+
+@dataclass
+class TwoStageRetriever:
+    """
+    BM25 selects the candidates, exact cosine against the stored
+    (memory-mapped) embeddings ranks them. No ANN search is run, so this
+    suits queries where lexical recall is already good (ingredient lists).
+    """
+
+    bm25: BM25Retriever
+    vector: VectorRetriever
+    # BM25 candidates as a multiple of top_k
+    depth: int = 5
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        phrases: Optional[List[str]] = None,
+        doc_filter=None,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict]:
+        widen = max(top_k * self.depth, top_k)
+
+        start = time.perf_counter()
+        hits = self.bm25.search(query, widen, phrases=phrases, doc_filter=doc_filter)
+        bm25_ms = (time.perf_counter() - start) * 1000.0
+
+        start = time.perf_counter()
+        scores = self.vector.score_documents(query, [h["ordinal"] for h in hits])
+        vector_ms = (time.perf_counter() - start) * 1000.0
+
+        if stats is not None:
+            stats.update(
+                partial=False,
+                timed_out=[],
+                timings_ms={"bm25": round(bm25_ms, 2), "vector": round(vector_ms, 2)},
+                candidates={"bm25": len(hits), "vector": int(np.count_nonzero(~np.isnan(scores)))},
+            )
+
+        return self._rank(hits, scores, top_k)
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int,
+        phrases: Optional[List[Optional[List[str]]]] = None,
+        doc_filter=None,
+    ) -> List[List[Dict]]:
+        """
+        search() for a batch: one BM25 pass, one embed_batch call.
+        """
+        widen = max(top_k * self.depth, top_k)
+
+        all_hits = self.bm25.search_many(queries, widen, phrases=phrases, doc_filter=doc_filter)
+        all_scores = self.vector.score_documents_many(
+            queries, [[h["ordinal"] for h in hits] for hits in all_hits]
+        )
+
+        return [self._rank(hits, scores, top_k) for hits, scores in zip(all_hits, all_scores)]
+
+    def _rank(self, hits: List[Dict], scores: np.ndarray, top_k: int) -> List[Dict]:
+        out: List[Dict] = []
+        for h, score in zip(hits, scores):
+            if np.isnan(score):
+                # no stored vector for this document
+                continue
+            item = dict(h)
+            item["score"] = float(score)
+            item["bm25_score"] = float(h["score"])
+            out.append(item)
+
+        # ties keep the BM25 order
+        out.sort(key=lambda x: x["score"], reverse=True)
+        return out[:top_k]
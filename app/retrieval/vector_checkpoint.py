@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import os
+import shutil
+
+import numpy as np
+
+
+_MANIFEST_FILE = "manifest.json"
+_JOURNAL_FILE = "keys.journal"
+
+
+class BuildCheckpoint:
+    """
+    Append-only state of an in-progress VectorIndex build.
+
+    directory/
+      manifest.json      committed state, replaced atomically
+      shard_00000.npy    float32 embeddings written at one checkpoint
+      keys.journal       one JSON-encoded content key per line, in vector order
+
+    Every checkpoint writes one new shard and appends to the journal, so
+    I/O stays linear in corpus size. Data is fsynced before the manifest
+    that references it is swapped in; shards past the manifest and journal
+    bytes past journal_bytes are leftovers of a crash and are discarded.
+    """
+
+    def __init__(self, directory: Path, manifest: Dict[str, Any]):
+        self.directory = Path(directory)
+        self.manifest = manifest
+
+    # --------------------------------------------------------
+    # Open / create
+    # --------------------------------------------------------
+
+    @classmethod
+    def create(cls, directory: Path) -> "BuildCheckpoint":
+        directory = Path(directory)
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+
+        manifest = {
+            "dim": None,
+            "shards": [],
+            "vectors": 0,
+            "journal_bytes": 0,
+        }
+        checkpoint = cls(directory, manifest)
+        (directory / _JOURNAL_FILE).touch()
+        checkpoint._commit()
+        return checkpoint
+
+    @classmethod
+    def open(cls, directory: Path) -> Optional["BuildCheckpoint"]:
+        """
+        Returns the committed state of an interrupted build, or None.
+        Vectors are keyed by content (model included), so they stay valid
+        whatever changed in the dataset or index type since.
+        """
+        directory = Path(directory)
+        path = directory / _MANIFEST_FILE
+        if not (path.exists() and (directory / _JOURNAL_FILE).exists()):
+            return None
+
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        checkpoint = cls(directory, manifest)
+        checkpoint._drop_uncommitted()
+        return checkpoint
+
+    def _drop_uncommitted(self) -> None:
+        committed = {s["file"] for s in self.manifest["shards"]}
+        for path in self.directory.glob("shard_*"):
+            if path.name not in committed:
+                path.unlink()
+
+        with (self.directory / _JOURNAL_FILE).open("r+b") as f:
+            f.truncate(self.manifest["journal_bytes"])
+
+    # --------------------------------------------------------
+    # Append
+    # --------------------------------------------------------
+
+    @property
+    def vectors(self) -> int:
+        return int(self.manifest["vectors"])
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.manifest["dim"]
+
+    def append(self, vectors: np.ndarray, keys: List[str]) -> None:
+        """
+        Commits one checkpoint: a shard of vectors and their keys.
+        """
+        shards = self.manifest["shards"]
+
+        name = f"shard_{len(shards):05d}.npy"
+        path = self.directory / name
+        tmp_path = path.with_name(name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        shards.append({"file": name, "rows": len(vectors)})
+
+        lines = "".join(json.dumps(key) + "\n" for key in keys).encode("utf-8")
+        with (self.directory / _JOURNAL_FILE).open("ab") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.manifest["dim"] = int(vectors.shape[1])
+        self.manifest["vectors"] += len(vectors)
+        self.manifest["journal_bytes"] += len(lines)
+        self._commit()
+
+    def _commit(self) -> None:
+        path = self.directory / _MANIFEST_FILE
+        tmp_path = path.with_name(_MANIFEST_FILE + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(self.directory)
+
+    # --------------------------------------------------------
+    # Read back
+    # --------------------------------------------------------
+
+    def shards(self) -> Iterator[np.ndarray]:
+        for shard in self.manifest["shards"]:
+            yield np.load(self.directory / shard["file"], mmap_mode="r")
+
+    def keys(self) -> List[str]:
+        with (self.directory / _JOURNAL_FILE).open("rb") as f:
+            data = f.read(self.manifest["journal_bytes"])
+        return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+    def discard(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _fsync_dir(directory: Path) -> None:
+    # makes the rename itself durable (no-op where directories can't be opened)
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -2,37 +2,233 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple, Optional, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import hashlib
 import json
+import os
+import shutil
 import numpy as np
 import time
 
+from app.retrieval.vector_checkpoint import BuildCheckpoint
+
 try:
     import faiss
 except Exception:
     faiss = None
 
 
+_INDEX_KINDS = {"flat", "ivf", "hnsw", "ivfpq"}
+_STORAGE_TYPES = {"float32", "float16", "int8", "pq"}
+
+# Filters passing at most this many rows are scored exactly against
+# embeddings.npy instead of searching the ANN index with a selector
+_EXACT_FILTER_ROWS = 20000
+
+# Upper bound for the widened HNSW efSearch under a filter
+_MAX_FILTERED_EF = 1024
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    FAISS index type and its build/search parameters.
+
+    kind:
+    flat  : exact inner product (brute force)
+    ivf   : inverted lists, nlist centroids, nprobe lists scanned per query
+    hnsw  : graph index, hnsw_m links per node, ef_search candidates per query
+    ivfpq : ivf with pq storage
+
+    storage (how vectors are encoded inside the index):
+    float32 : raw floats, 4 bytes per dim
+    float16 : half precision, 2 bytes per dim
+    int8    : scalar quantized, 1 byte per dim (trained min/max per dim)
+    pq      : product quantized, pq_m codes of pq_nbits (pq_m bytes at 8 bits)
+
+    rescore > 0 fetches top_k * rescore candidates from the index and
+    re-ranks them by exact inner product against the raw embeddings.
+    """
+
+    kind: str = "flat"
+    storage: str = "float32"
+    nlist: int = 1024
+    nprobe: int = 16
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    ef_search: int = 64
+    pq_m: int = 16
+    pq_nbits: int = 8
+    rescore: int = 0
+
+    # vectors sampled for training (ivf, int8, pq)
+    train_size: int = 50000
+
+    def __post_init__(self):
+        if self.kind not in _INDEX_KINDS:
+            raise ValueError(f"Unknown index kind '{self.kind}'. Use flat | ivf | hnsw | ivfpq.")
+        if self.storage not in _STORAGE_TYPES:
+            raise ValueError(f"Unknown storage '{self.storage}'. Use float32 | float16 | int8 | pq.")
+        if self.kind == "hnsw" and self.storage == "pq":
+            # IndexHNSWPQ only supports L2
+            raise ValueError("hnsw does not support pq storage; use float16 or int8.")
+
+    @property
+    def codec(self) -> str:
+        return "pq" if self.kind == "ivfpq" else self.storage
+
+    @property
+    def uses_ivf(self) -> bool:
+        return self.kind in ("ivf", "ivfpq")
+
+    @property
+    def trainable(self) -> bool:
+        return self.uses_ivf or self.codec in ("int8", "pq")
+
+    def factory_string(self, nlist: Optional[int] = None, codec: Optional[str] = None) -> str:
+        codec = {
+            "float32": "Flat",
+            "float16": "SQfp16",
+            "int8": "SQ8",
+            "pq": f"PQ{self.pq_m}x{self.pq_nbits}",
+        }[codec or self.codec]
+
+        if self.uses_ivf:
+            return f"IVF{nlist or self.nlist},{codec}"
+        if self.kind == "hnsw":
+            return f"HNSW{self.hnsw_m},{codec}"
+        return codec
+
+    def pq_trainable(self, vectors: int) -> bool:
+        """
+        Whether a corpus of that many vectors trains the PQ codebooks
+        (FAISS wants ~39 training points per centroid); if not, pq
+        storage falls back to float32.
+        """
+        return min(vectors, self.train_size) >= 39 * (1 << self.pq_nbits)
+
+    def build_key(self, codec: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Parameters baked into the index file (search-time knobs excluded).
+        A cached index with a different key has to be rebuilt. codec is
+        the storage actually built, when it differs from the spec's.
+        """
+        codec = codec or self.codec
+        key: Dict[str, Any] = {"kind": self.kind}
+        if codec != "float32":
+            key["storage"] = codec
+        if self.uses_ivf:
+            key["nlist"] = self.nlist
+        if codec == "pq":
+            key.update(pq_m=self.pq_m, pq_nbits=self.pq_nbits)
+        if self.kind == "hnsw":
+            key.update(hnsw_m=self.hnsw_m, ef_construction=self.ef_construction)
+        return key
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "IndexSpec":
+        return cls(**(config or {}))
+
+
 @dataclass
 class VectorIndexArtifacts:
     embeddings_path: Path
     faiss_index_path: Path
+    # doc ids as fixed-width utf-8 bytes (.npy), memory-mapped on load
     id_map_path: Path
 
+    # index type + build parameters of faiss.index
+    meta_path: Optional[Path] = None
+
+    # append-only state of an unfinished build
+    checkpoint_dir: Optional[Path] = None
+
+    # content key of every row (hash of model + normalized text)
+    keys_path: Optional[Path] = None
+
+    # position of every row's document in the build's document list
+    ordinals_path: Optional[Path] = None
+
+    def __post_init__(self):
+        if self.meta_path is None:
+            self.meta_path = self.faiss_index_path.with_name("faiss_meta.json")
+        if self.checkpoint_dir is None:
+            self.checkpoint_dir = self.faiss_index_path.with_name("faiss_build")
+        if self.keys_path is None:
+            self.keys_path = self.faiss_index_path.with_name("vector_keys.npy")
+        if self.ordinals_path is None:
+            self.ordinals_path = self.faiss_index_path.with_name("vector_ordinals.npy")
+
+
+@dataclass(frozen=True)
+class RowSelection:
+    """
+    Index rows a search may return: sorted row ids, and the same set as a
+    packed little-endian bitmap for faiss.IDSelectorBitmap.
+    """
+
+    rows: np.ndarray
+    bitmap: np.ndarray
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "RowSelection":
+        return cls(rows=np.flatnonzero(mask), bitmap=np.packbits(mask, bitorder="little"))
+
+    @property
+    def count(self) -> int:
+        return int(self.rows.size)
+
+
+def _normalize_text(text: Any, max_chars: int) -> str:
+    return " ".join(str(text or "").split())[:max_chars]
+
+
+def _content_key(model: str, text: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(model.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
 
 class VectorIndex:
 
-    def __init__(self, client, artifacts: VectorIndexArtifacts):
+    def __init__(
+        self,
+        client,
+        artifacts: VectorIndexArtifacts,
+        spec: Optional[IndexSpec] = None,
+        query_client=None,
+    ):
         if faiss is None:
             raise RuntimeError("faiss not installed")
 
+        # client embeds the corpus; query_client (e.g. cached) embeds queries
         self.client = client
+        self.query_client = query_client or client
         self.artifacts = artifacts
+        self.spec = spec or IndexSpec()
 
         self._index = None
-        self._id_map: List[str] = []
+        self._factory: Optional[str] = None
+        # storage actually built: spec.codec, or float32 when pq fell back
+        self._codec = self.spec.codec
+        # list of str while building, read-only bytes array once loaded
+        self._id_map: Any = []
         self._dim: Optional[int] = None
 
+        # row -> document ordinal (int32, -1 = unknown), see bind_ordinals
+        self._row_ordinals: Optional[np.ndarray] = None
+
+        # True while _index is a read-only view of faiss.index
+        self._mmapped = False
+
+        # reused / recomputed counts of the last build
+        self.last_build: Dict[str, int] = {}
+
+        # raw float32 vectors (memory-mapped), used for exact re-scoring
+        self._embeddings: Optional[np.ndarray] = None
+
     @property
     def is_ready(self) -> bool:
         return self._index is not None and self._dim is not None
@@ -44,19 +240,259 @@ class VectorIndex:
     def load_if_exists(self) -> bool:
         a = self.artifacts
 
-        if not (a.faiss_index_path.exists() and a.id_map_path.exists()):
+        if not (a.faiss_index_path.exists() and self._id_map_source().exists()):
             return False
 
-        print("Loading existing FAISS index...")
-        self._index = faiss.read_index(str(a.faiss_index_path))
+        stored = self._read_meta()
+        if stored.get("vectors") == "pending":
+            print("Cached FAISS index was interrupted while being replaced; rebuilding.")
+            return False
+        if not self._build_key_matches(stored):
+            print(
+                f"Cached FAISS index is {stored.get('build_key')}, "
+                f"wanted {self.spec.build_key()}; rebuilding."
+            )
+            return False
 
-        with a.id_map_path.open("r", encoding="utf-8") as f:
-            self._id_map = json.load(f)
+        print("Loading existing FAISS index...")
+        self._index = self._read_index_mmap()
+        self._apply_search_defaults()
+        self._id_map = self._load_id_map()
 
         self._dim = self._index.d
+        self._factory = stored.get("factory", "Flat")
+        self._codec = stored["build_key"].get("storage", "float32")
+        self._embeddings = self._load_embeddings()
+        self._row_ordinals = self._load_ordinals()
         print(f"Loaded {len(self._id_map)} vectors.")
         return True
 
+    def _build_key_matches(self, stored: Dict[str, Any]) -> bool:
+        key = stored.get("build_key")
+        if key == self.spec.build_key():
+            return True
+        # pq built as float32 (too few vectors) is what the spec still
+        # gives for as many vectors; a larger corpus rebuilds it as pq
+        return (
+            self.spec.codec == "pq"
+            and key == self.spec.build_key("float32")
+            and not self.spec.pq_trainable(int(stored.get("ntotal", 0)))
+        )
+
+    def _read_index_mmap(self):
+        """
+        Maps the index file instead of copying it into the heap, so load time
+        does not grow with the index and workers share pages through the
+        OS page cache. IVF maps its inverted lists (IO_FLAG_MMAP); flat,
+        scalar-quantized and HNSW storage map their code arrays (IO_FLAG_MMAP_IFC).
+        """
+        path = str(self.artifacts.faiss_index_path)
+
+        if self.spec.uses_ivf:
+            flag = faiss.IO_FLAG_MMAP
+        else:
+            flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+        try:
+            index = faiss.read_index(path, flag)
+            self._mmapped = True
+        except RuntimeError:
+            index = faiss.read_index(path)
+            self._mmapped = False
+        return index
+
+    def _id_map_source(self) -> Path:
+        path = self.artifacts.id_map_path
+        legacy = path.with_name("id_map.json")
+        if not path.exists() and legacy.exists():
+            return legacy
+        return path
+
+    def _load_id_map(self) -> Any:
+        path = self._id_map_source()
+        if path.suffix == ".json":
+            # written before the binary id map existed
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        return np.load(path, mmap_mode="r")
+
+    def _write_id_map(self) -> None:
+        encoded = [doc_id.encode("utf-8") for doc_id in self._id_map]
+        width = max(map(len, encoded), default=1)
+
+        path = self.artifacts.id_map_path
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.save(f, np.array(encoded, dtype=f"S{width}"))
+        os.replace(tmp_path, path)
+
+    def _doc_id(self, row: int) -> str:
+        return self._decode_id(self._id_map[row])
+
+    @staticmethod
+    def _decode_id(doc_id: Any) -> str:
+        return doc_id.decode("utf-8") if isinstance(doc_id, bytes) else doc_id
+
+    def _load_embeddings(self) -> Optional[np.ndarray]:
+        path = self.artifacts.embeddings_path
+        if not path.exists():
+            return None
+
+        emb = np.load(path, mmap_mode="r")
+        if emb.shape != (self._index.ntotal, self._dim):
+            print(f"[Embeddings] {path.name} does not match the index; exact re-scoring disabled.")
+            return None
+        return emb
+
+    def _load_ordinals(self) -> Optional[np.ndarray]:
+        path = self.artifacts.ordinals_path
+        if not path.exists():
+            return None
+
+        ordinals = np.load(path, mmap_mode="r")
+        if len(ordinals) != len(self._id_map):
+            return None
+        return ordinals
+
+    def _write_ordinals(self) -> None:
+        path = self.artifacts.ordinals_path
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.save(f, np.asarray(self._row_ordinals, dtype=np.int32))
+        os.replace(tmp_path, path)
+
+    def _load_keys(self) -> Optional[List[str]]:
+        path = self.artifacts.keys_path
+        if not path.exists():
+            return None
+        return [k.decode("ascii") for k in np.load(path, mmap_mode="r").tolist()]
+
+    def _write_keys(self, keys: List[str]) -> None:
+        path = self.artifacts.keys_path
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.save(f, np.array(keys, dtype="S32"))
+        os.replace(tmp_path, path)
+
+    def _save_index(self, keys: List[str], **meta: Any) -> None:
+        # write + rename: processes mapping the old file keep a valid view
+        path = self.artifacts.faiss_index_path
+        tmp_path = path.with_name(path.name + ".tmp")
+        faiss.write_index(self._index, str(tmp_path))
+        os.replace(tmp_path, path)
+
+        self._write_id_map()
+        self._write_ordinals()
+        self._write_keys(keys)
+        self._write_meta(**meta)
+
+    def _read_meta(self) -> Dict[str, Any]:
+        path = self.artifacts.meta_path
+        if not path.exists():
+            # Indexes written before index specs existed are flat
+            return {"build_key": IndexSpec().build_key()}
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self, **extra: Any) -> None:
+        meta = {
+            "build_key": self.spec.build_key(self._codec),
+            "factory": self._factory,
+            "dim": self._dim,
+            "ntotal": int(self._index.ntotal),
+            **extra,
+        }
+        self._replace_meta(meta)
+
+    def _replace_meta(self, meta: Dict[str, Any]) -> None:
+        path = self.artifacts.meta_path
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, path)
+
+    # --------------------------------------------------------
+    # Index creation
+    # --------------------------------------------------------
+
+    def _create_index(self, dim: int, train: Optional[np.ndarray] = None) -> None:
+        spec = self.spec
+        nlist = None
+        codec = spec.codec
+
+        if spec.uses_ivf:
+            # FAISS wants ~39 training points per centroid
+            nlist = max(1, min(spec.nlist, len(train) // 39))
+
+        if codec == "pq" and not spec.pq_trainable(len(train)):
+            # too few vectors to train the PQ codebooks
+            codec = "float32"
+            print(f"Only {len(train)} vectors; storing float32 instead of pq.")
+
+        self._codec = codec
+        self._factory = spec.factory_string(nlist, codec)
+        self._index = faiss.index_factory(dim, self._factory, faiss.METRIC_INNER_PRODUCT)
+        self._dim = dim
+
+        if spec.kind == "hnsw":
+            self._index.hnsw.efConstruction = spec.ef_construction
+
+        if not self._index.is_trained:
+            sample = train
+            if len(train) > spec.train_size:
+                rng = np.random.default_rng(0)
+                sample = train[rng.choice(len(train), spec.train_size, replace=False)]
+            print(f"Training {self._factory} on {len(sample)} vectors...")
+            self._index.train(np.ascontiguousarray(sample, dtype=np.float32))
+
+        self._apply_search_defaults()
+
+    def _apply_search_defaults(self) -> None:
+        if self.spec.uses_ivf:
+            faiss.extract_index_ivf(self._index).nprobe = self.spec.nprobe
+        elif self.spec.kind == "hnsw":
+            self._index.hnsw.efSearch = self.spec.ef_search
+
+    def _search_parameters(self, params: Optional[Dict[str, Any]]):
+        """
+        Per-request knobs (nprobe / ef_search) without mutating the shared index.
+        """
+        if not params:
+            return None
+
+        if self.spec.uses_ivf and params.get("nprobe"):
+            return faiss.SearchParametersIVF(nprobe=int(params["nprobe"]))
+
+        if self.spec.kind == "hnsw" and params.get("ef_search"):
+            return faiss.SearchParametersHNSW(efSearch=int(params["ef_search"]))
+
+        return None
+
+    def _filtered_parameters(self, params: Optional[Dict[str, Any]], selection: RowSelection, fetch: int):
+        """
+        Search parameters restricted to the selected rows. The ANN breadth is
+        widened by 1 / (selected fraction), so about as many allowed vectors
+        are visited as an unfiltered search visits in total
+        (nprobe capped at nlist, efSearch at _MAX_FILTERED_EF).
+        """
+        params = params or {}
+        ntotal = int(self._index.ntotal)
+        selector = faiss.IDSelectorBitmap(ntotal, faiss.swig_ptr(selection.bitmap))
+        widen = ntotal / max(1, selection.count)
+
+        if self.spec.uses_ivf:
+            ivf = faiss.extract_index_ivf(self._index)
+            nprobe = int(params.get("nprobe") or ivf.nprobe)
+            nprobe = min(int(ivf.nlist), int(np.ceil(nprobe * widen)))
+            return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+
+        if self.spec.kind == "hnsw":
+            ef = int(params.get("ef_search") or self._index.hnsw.efSearch)
+            ef = max(ef, fetch, min(_MAX_FILTERED_EF, int(np.ceil(ef * widen))))
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=ef)
+
+        return faiss.SearchParameters(sel=selector)
+
     # --------------------------------------------------------
     # GPU Optimized Builder
     # --------------------------------------------------------
@@ -69,106 +505,518 @@ class VectorIndex:
         force_rebuild: bool = False,
         batch_size: int = 256,
         max_chars: int = 2000,
+        checkpoint_vectors: int = 20000,
+        checkpoint_seconds: float = 300.0,
+        source_fingerprint: Optional[str] = None,
+        sort_window: int = 32,
     ) -> None:
+        """
+        Incremental build. Every vector is keyed by a hash of the model name
+        and the normalized text (after max_chars truncation): vectors of
+        unchanged texts are reused from the previous build, identical texts
+        are embedded once and vectors of deleted documents are dropped.
+
+        New vectors are committed to append-only checkpoints every
+        checkpoint_vectors vectors or checkpoint_seconds seconds, and the
+        index is assembled once at the end, so an interrupted build resumes
+        without re-embedding what was committed.
+
+        source_fingerprint (dataset + config hash) lets an unchanged start
+        skip hashing the corpus and just load the index.
+
+        Texts are embedded in windows of sort_window batches, sorted by
+        length inside the window (1 = dataset order).
+        """
 
         a = self.artifacts
         a.faiss_index_path.parent.mkdir(parents=True, exist_ok=True)
 
-        if not force_rebuild and self.load_if_exists():
-            start_index = len(self._id_map)
+        if force_rebuild:
+            shutil.rmtree(a.checkpoint_dir, ignore_errors=True)
+        elif (
+            source_fingerprint
+            and not a.checkpoint_dir.exists()
+            and self._read_meta().get("source") == source_fingerprint
+            and self.load_if_exists()
+        ):
+            self._print_stats()
+            return
+
+        model = self._model_id()
+        doc_ids: List[str] = []
+        doc_pos: List[int] = []
+        doc_keys: List[str] = []
+        first_doc: Dict[str, int] = {}
+
+        for pos, doc in enumerate(documents):
+            text = _normalize_text(text_getter(doc), max_chars)
+            if not text:
+                continue
+            key = _content_key(model, text)
+            doc_ids.append(str(id_getter(doc)))
+            doc_pos.append(pos)
+            doc_keys.append(key)
+            first_doc.setdefault(key, pos)
+
+        # Pool of reusable vectors: previous embeddings.npy rows, then checkpoint shards
+        key_row: Dict[str, int] = {}
+        sources: List[np.ndarray] = []
+
+        previous = None if force_rebuild else self._previous_vectors()
+        if previous is not None:
+            old_keys, old_emb = previous
+            key_row = {k: r for r, k in enumerate(old_keys)}
+            sources.append(old_emb)
+        base = sum(len(src) for src in sources)
+        previous_unique = len(key_row)
+
+        checkpoint = None if force_rebuild else BuildCheckpoint.open(a.checkpoint_dir)
+        if checkpoint is not None:
+            print(f"Resuming interrupted build ({checkpoint.vectors} vectors committed)...")
         else:
-            print("Starting fresh GPU index build...")
-            self._id_map = []
-            self._index = None
-            self._dim = None
-            start_index = 0
+            checkpoint = BuildCheckpoint.create(a.checkpoint_dir)
 
-        total_docs = len(documents)
-        start_time = time.time()
-
-        print(f"Total documents: {total_docs}")
-        print(f"Resuming from document index: {start_index}")
+        for r, key in enumerate(checkpoint.keys()):
+            key_row.setdefault(key, base + r)
 
-        for i in range(start_index, total_docs, batch_size):
+        missing = [key for key in first_doc if key not in key_row]
 
-            batch_docs = documents[i : i + batch_size]
+        print(f"Total documents: {len(documents)}")
+        print(f"Unique texts: {len(first_doc)} | to embed: {len(missing)}")
 
-            texts = []
-            ids_batch = []
+        start_time = time.time()
+        last_commit = start_time
+        buffered: List[np.ndarray] = []
+        buffered_keys: List[str] = []
+        done = 0
+
+        window = batch_size * max(1, sort_window)
+        for i in range(0, len(missing), window):
+
+            keys_window = missing[i : i + window]
+            texts = [
+                _normalize_text(text_getter(documents[first_doc[key]]), max_chars)
+                for key in keys_window
+            ]
+
+            X, ok = self._embed_bucketed(texts, batch_size)
+            if ok.any():
+                buffered.append(X[ok])
+                buffered_keys.extend(key for key, good in zip(keys_window, ok) if good)
+
+            done = min(i + window, len(missing))
+            due = (
+                len(buffered_keys) >= checkpoint_vectors
+                or time.time() - last_commit >= checkpoint_seconds
+                or done >= len(missing)
+            )
+            if not due or not buffered:
+                continue
 
-            for doc in batch_docs:
+            offset = base + checkpoint.vectors
+            checkpoint.append(np.vstack(buffered), buffered_keys)
+            for r, key in enumerate(buffered_keys):
+                key_row[key] = offset + r
+            buffered, buffered_keys = [], []
+            last_commit = time.time()
 
-                doc_id = str(id_getter(doc))
-                text = str(text_getter(doc) or "").strip()
+            elapsed = last_commit - start_time
+            speed = done / elapsed if elapsed > 0 else 0
+            eta = (len(missing) - done) / speed if speed > 0 else 0
 
-                if not text:
-                    continue
-
-                if len(text) > max_chars:
-                    text = text[:max_chars]
+            print(
+                f"[Checkpoint] {done}/{len(missing)} "
+                f"({done/len(missing):.2%}) | "
+                f"Speed: {speed:.2f}/s | "
+                f"ETA: {eta/60:.2f} min"
+            )
 
-                texts.append(text)
-                ids_batch.append(doc_id)
+        sources.extend(checkpoint.shards())
+        self._compact(
+            doc_ids, doc_pos, doc_keys, key_row, sources,
+            base, previous_unique, source_fingerprint, model,
+        )
+        checkpoint.discard()
 
-            if not texts:
+        print("Vector index build complete.")
+        print(f"Final vector count: {len(self._id_map)}")
+        print(
+            f"[Vectors] reused {self.last_build['reused']} | "
+            f"recomputed {self.last_build['recomputed']} | "
+            f"duplicate texts {self.last_build['duplicates']} | "
+            f"dropped {self.last_build['dropped']}"
+        )
+        if self._index is not None:
+            self._print_stats()
+
+    def _embed_bucketed(self, texts: List[str], batch_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Embeds texts in length-sorted batches, so each batch is padded to a
+        similar length instead of to the one long text it happens to hold,
+        and scatters the vectors back to input order.
+        Returns (vectors, ok) where ok is False for rows of failed batches.
+        """
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        batches = [order[b : b + batch_size] for b in range(0, len(order), batch_size)]
+        vectors: Optional[np.ndarray] = None
+        ok = np.zeros(len(texts), dtype=bool)
+
+        results = self._embed_batches([[texts[j] for j in idx] for idx in batches], batch_size)
+
+        for idx, X in zip(batches, results):
+            if isinstance(X, Exception):
+                print(f"[Batch Skip] {str(X)[:120]}")
                 continue
 
+            if vectors is None:
+                vectors = np.zeros((len(texts), X.shape[1]), dtype=np.float32)
+            vectors[idx] = X
+            ok[idx] = True
+
+        if vectors is None:
+            vectors = np.zeros((len(texts), 0), dtype=np.float32)
+        return vectors, ok
+
+    def _embed_batches(self, batches: List[List[str]], batch_size: int):
+        """
+        One result (array or exception) per batch, in order. Pooled clients
+        (ProcessEmbeddingPool) embed the batches concurrently.
+        """
+        if hasattr(self.client, "embed_batches"):
+            yield from self.client.embed_batches(batches, batch_size=batch_size)
+            return
+
+        for texts in batches:
             try:
-                X = self.client.embed_batch(texts, batch_size=batch_size)
+                yield self.client.embed_batch(texts, batch_size=batch_size)
             except Exception as e:
-                print(f"[Batch Skip] {str(e)[:120]}")
-                continue
+                yield e
+
+    def _model_id(self) -> str:
+        for attr in ("model_name", "model"):
+            value = getattr(self.client, attr, None)
+            if isinstance(value, str) and value:
+                return value
+        return type(self.client).__name__
+
+    def _previous_vectors(self) -> Optional[Tuple[List[str], np.ndarray]]:
+        """
+        Keys and raw embeddings of the last finished build, whatever its
+        index type: changing the index spec does not re-embed anything.
+        """
+        path = self.artifacts.embeddings_path
+        keys = self._load_keys()
+        if keys is None or not path.exists():
+            return None
+
+        # "pending": embeddings.npy was replaced but the matching keys were
+        # not committed (crash in _compact); rows may belong to other keys
+        if self._read_meta().get("vectors") == "pending":
+            print("[Embeddings] previous build was interrupted; not reusing its vectors.")
+            return None
+
+        emb = np.load(path, mmap_mode="r")
+        if len(emb) != len(keys):
+            return None
+        return keys, emb
+
+    def _compact(
+        self,
+        doc_ids: List[str],
+        doc_pos: List[int],
+        doc_keys: List[str],
+        key_row: Dict[str, int],
+        sources: List[np.ndarray],
+        base: int,
+        previous_unique: int,
+        source_fingerprint: Optional[str],
+        model: str,
+        chunk_rows: int = 65536,
+    ) -> None:
+        """
+        Writes one embeddings.npy row per document (gathered from the pool:
+        rows below base are the previous build's, the rest are new),
+        trains on a random sample and builds a fresh index.
+        The new embeddings.npy replaces the old one only once the index is
+        built, right before the keys and meta are saved. The caller removes
+        the checkpoint afterwards, so a crash here repeats the compaction on
+        the next start; a crash between the swap and the meta write also
+        re-embeds the texts the checkpoint does not hold.
+        """
+        a = self.artifacts
 
-            if self._dim is None:
-                self._dim = X.shape[1]
-                self._index = faiss.IndexFlatIP(self._dim)
+        rows = np.array([key_row.get(k, -1) for k in doc_keys], dtype=np.int64)
+        keep = rows >= 0
+        rows = rows[keep]
+        ids = [doc_id for doc_id, ok in zip(doc_ids, keep) if ok]
+        ordinals = np.asarray(doc_pos, dtype=np.int32)[keep]
+        keys = [key for key, ok in zip(doc_keys, keep) if ok]
+
+        # counted in distinct vectors (texts), duplicates in documents
+        used = np.unique(rows)
+        reused = int((used < base).sum())
+        self.last_build = {
+            "reused": reused,
+            "recomputed": int(len(used) - reused),
+            "duplicates": int(len(rows) - len(used)),
+            "dropped": int(previous_unique - reused),
+        }
+
+        total = len(rows)
+        if not total:
+            print("No documents with text; vector index is empty.")
+            return
+
+        starts = np.cumsum([0] + [len(src) for src in sources])
+        dim = sources[np.searchsorted(starts, rows[0], side="right") - 1].shape[1]
+
+        tmp_path = a.embeddings_path.with_name(a.embeddings_path.name + ".tmp")
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(total, dim))
+
+        for s in range(0, total, chunk_rows):
+            chunk = rows[s : s + chunk_rows]
+            which = np.searchsorted(starts, chunk, side="right") - 1
+            block = np.empty((len(chunk), dim), dtype=np.float32)
+            for src_id in np.unique(which):
+                m = which == src_id
+                block[m] = sources[src_id][chunk[m] - starts[src_id]]
+            out[s : s + len(chunk)] = block
+        out.flush()
+        del out
+
+        emb = np.load(tmp_path, mmap_mode="r")
+
+        train = None
+        if self.spec.trainable:
+            rng = np.random.default_rng(0)
+            sample = rng.choice(total, min(total, self.spec.train_size), replace=False)
+            train = emb[np.sort(sample)]
+
+        self._create_index(dim, train=train)
+        for s in range(0, total, chunk_rows):
+            self._index.add(np.ascontiguousarray(emb[s : s + chunk_rows]))
+        del emb, train
+
+        # embeddings.npy and vector_keys.npy are separate files: the pair is
+        # flagged inconsistent from the swap until _save_index commits the
+        # new keys and meta (see _previous_vectors)
+        if a.meta_path.exists():
+            self._replace_meta(dict(self._read_meta(), vectors="pending"))
+
+        # sources may map the old embeddings.npy; renaming over it is safe
+        os.replace(tmp_path, a.embeddings_path)
+
+        self._id_map = ids
+        self._row_ordinals = ordinals
+        self._embeddings = np.load(a.embeddings_path, mmap_mode="r")
+        self._mmapped = False
+        self._save_index(keys, model=model, source=source_fingerprint, vectors="committed")
 
-            self._index.add(X)
-            self._id_map.extend(ids_batch)
+    # --------------------------------------------------------
+    # Memory stats
+    # --------------------------------------------------------
 
-            # Save checkpoint
-            faiss.write_index(self._index, str(a.faiss_index_path))
+    def stats(self) -> Dict[str, Any]:
+        """
+        Index memory footprint (size of faiss.index, which is what a worker
+        holds in RAM or maps) and the raw embeddings kept on disk.
+        """
+        ntotal = int(self._index.ntotal) if self._index is not None else 0
+        path = self.artifacts.faiss_index_path
+        index_bytes = path.stat().st_size if ntotal and path.exists() else 0
+        raw = self._embeddings
+
+        return {
+            "factory": self._factory,
+            "storage": self._codec,
+            "vectors": ntotal,
+            "dim": self._dim,
+            "bytes_per_vector": index_bytes / ntotal if ntotal else 0.0,
+            "raw_bytes_per_vector": 4 * (self._dim or 0),
+            "index_bytes": index_bytes,
+            "embeddings_bytes": int(raw.nbytes) if raw is not None else 0,
+            "rescore": self.spec.rescore if raw is not None else 0,
+        }
+
+    def _print_stats(self) -> None:
+        st = self.stats()
+        print(
+            f"[Index Stats] {st['factory']} | {st['vectors']} vectors | "
+            f"{st['bytes_per_vector']:.1f} bytes/vector (raw {st['raw_bytes_per_vector']}) | "
+            f"index {st['index_bytes'] / 2**20:.2f} MB"
+        )
 
-            with a.id_map_path.open("w", encoding="utf-8") as f:
-                json.dump(self._id_map, f, ensure_ascii=False)
+    # --------------------------------------------------------
+    # Search
+    # --------------------------------------------------------
 
-            elapsed = time.time() - start_time
-            processed = len(self._id_map)
-            speed = processed / elapsed if elapsed > 0 else 0
-            eta = (total_docs - processed) / speed if speed > 0 else 0
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        params: optional per-request search knobs,
+        {"nprobe": int} for ivf / ivfpq, {"ef_search": int} for hnsw.
+        """
+        return [(self._doc_id(row), score) for row, score in self.search_rows(query, top_k, params)]
+
+    def search_rows(
+        self,
+        query: str,
+        top_k: int,
+        params: Optional[Dict[str, Any]] = None,
+        selection: Optional[RowSelection] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Like search, but returns index rows (see bind_ordinals).
+
+        selection restricts the result to the given rows. Small selections
+        are scored exactly against the raw embeddings; otherwise FAISS
+        skips other rows through an IDSelectorBitmap (see _filtered_parameters).
+        """
+        return self.search_rows_many([query], top_k, params=params, selection=selection)[0]
+
+    def search_rows_many(
+        self,
+        queries: List[str],
+        top_k: int,
+        params: Optional[Dict[str, Any]] = None,
+        selection: Optional[RowSelection] = None,
+        batch_size: int = 256,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        search_rows for a batch: all queries are embedded in one
+        embed_batch call and searched with one matrix index.search.
+        """
 
-            print(
-                f"[Checkpoint] {processed}/{total_docs} "
-                f"({processed/total_docs:.2%}) | "
-                f"Speed: {speed:.2f}/s | "
-                f"ETA: {eta/60:.2f} min"
-            )
+        if not self.is_ready:
+            raise RuntimeError("VectorIndex not ready")
 
-        print("Vector index build complete.")
-        print(f"Final vector count: {len(self._id_map)}")
+        results: List[List[Tuple[int, float]]] = [[] for _ in queries]
 
-    # --------------------------------------------------------
-    # Search
-    # --------------------------------------------------------
+        texts = [(q or "").strip() for q in queries]
+        live = [i for i, text in enumerate(texts) if text]
+        if not live or (selection is not None and not selection.count):
+            return results
+
+        Q = self.query_client.embed_batch([texts[i] for i in live], batch_size=batch_size)
+        Q = np.ascontiguousarray(Q, dtype=np.float32)
+
+        faiss.normalize_L2(Q)
+
+        rescore = self.spec.rescore if self._embeddings is not None else 0
+        fetch = top_k * rescore if rescore > 0 else top_k
+
+        if selection is None:
+            search_params = self._search_parameters(params)
+        elif self._embeddings is not None and selection.count <= _EXACT_FILTER_ROWS:
+            # few rows pass: exact scores of just those rows
+            rows = selection.rows
+            S = self._embeddings[rows] @ Q.T
+            for j, i in enumerate(live):
+                order = np.argsort(-S[:, j], kind="stable")[:top_k]
+                results[i] = [(int(r), float(sc)) for r, sc in zip(rows[order], S[order, j])]
+            return results
+        else:
+            search_params = self._filtered_parameters(params, selection, fetch)
+
+        D, I = self._index.search(Q, fetch, params=search_params)
+
+        for j, i in enumerate(live):
+            rows, scores = I[j], D[j]
 
-    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+            if rescore > 0:
+                rows, scores = self._rescore(Q[j], rows, top_k)
 
+            hits = []
+            for idx, score in zip(rows, scores):
+                if idx < 0 or idx >= len(self._id_map):
+                    continue
+                hits.append((int(idx), float(score)))
+            results[i] = hits
+
+        return results
+
+    @property
+    def has_embeddings(self) -> bool:
+        return self._embeddings is not None
+
+    def score_rows(self, query: str, rows: np.ndarray) -> np.ndarray:
+        """
+        Exact cosine of the query against the given rows (see score_rows_many).
+        """
+        return self.score_rows_many([query], [rows])[0]
+
+    def score_rows_many(
+        self,
+        queries: List[str],
+        rows_per_query: List[np.ndarray],
+        batch_size: int = 256,
+    ) -> List[np.ndarray]:
+        """
+        Exact cosine of each query against its own rows, read from the
+        memory-mapped embeddings; no FAISS search. The queries are embedded
+        in one embed_batch call. Scores come back in the order of the rows
+        given (rows are read in ascending order).
+        """
         if not self.is_ready:
             raise RuntimeError("VectorIndex not ready")
+        if self._embeddings is None:
+            raise RuntimeError("Exact scoring needs embeddings.npy matching the index")
 
-        query = (query or "").strip()
-        if not query:
-            return []
+        results = [np.zeros(len(rows), dtype=np.float32) for rows in rows_per_query]
 
-        q = self.client.embed_batch([query], batch_size=1)
+        texts = [(q or "").strip() for q in queries]
+        live = [i for i, text in enumerate(texts) if text and len(rows_per_query[i])]
+        if not live:
+            return results
 
-        faiss.normalize_L2(q)
-        D, I = self._index.search(q, top_k)
+        Q = self.query_client.embed_batch([texts[i] for i in live], batch_size=batch_size)
+        Q = np.ascontiguousarray(Q, dtype=np.float32)
 
-        results = []
-        for idx, score in zip(I[0], D[0]):
-            if idx < 0 or idx >= len(self._id_map):
-                continue
-            results.append((self._id_map[idx], float(score)))
+        faiss.normalize_L2(Q)
+
+        for j, i in enumerate(live):
+            rows, inverse = np.unique(np.asarray(rows_per_query[i], dtype=np.int64), return_inverse=True)
+            results[i] = (self._embeddings[rows] @ Q[j])[inverse]
 
         return results
+
+    def bind_ordinals(self, ordinal_of: Callable[[str], Optional[int]], sample: int = 64) -> np.ndarray:
+        """
+        row -> document ordinal array for the loaded documents (-1 = unknown
+        id), so hits resolve without any per-query id lookup.
+        The ordinals stored by the build are used when a sample of rows
+        agrees with ordinal_of; otherwise they are recomputed from the id map.
+        """
+        stored = self._row_ordinals
+        n = len(self._id_map)
+
+        if stored is not None and len(stored) == n:
+            rows = np.unique(np.linspace(0, n - 1, num=min(n, sample), dtype=np.int64)) if n else []
+            if all(ordinal_of(self._doc_id(r)) == int(stored[r]) for r in rows):
+                return stored
+
+        print("[Vectors] Mapping index rows to documents...")
+        ordinals = np.full(n, -1, dtype=np.int32)
+        for r in range(n):
+            o = ordinal_of(self._doc_id(r))
+            if o is not None:
+                ordinals[r] = o
+        self._row_ordinals = ordinals
+        return ordinals
+
+    def _rescore(self, q: np.ndarray, rows: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact inner product of the candidates against the raw embeddings.
+        Rows are read in ascending order to keep mmap page access sequential.
+        """
+        rows = np.unique(rows[rows >= 0])
+        if not rows.size:
+            return rows, np.zeros(0, dtype=np.float32)
+
+        scores = self._embeddings[rows] @ q
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return rows[order], scores[order]
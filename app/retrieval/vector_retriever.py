@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
-from app.retrieval.vector_index import VectorIndex
+import numpy as np
+
+from app.core.lru_cache import LRUCache
+from app.retrieval.vector_index import RowSelection, VectorIndex
 
 
 @dataclass
@@ -11,27 +14,127 @@ class VectorRetriever:
     index_memory: Any
     vector_index: VectorIndex
 
-    def search(self, query: str, top_k: int) -> List[Dict]:
-        hits = self.vector_index.search(query, top_k)
+    def __post_init__(self):
+        self._docs: List[Any] = []
+        # FAISS row -> document ordinal, bound once per loaded index
+        self._row_ordinals: Optional[np.ndarray] = None
+        # document ordinal -> FAISS row (-1 = no vector)
+        self._ordinal_rows: Optional[np.ndarray] = None
+        # DocFilter key -> RowSelection over FAISS rows
+        self._selections = LRUCache(
+            max_bytes=16 * 2**20,
+            sizeof=lambda sel: sel.rows.nbytes + sel.bitmap.nbytes,
+        )
+        if self.vector_index.is_ready:
+            self._ordinals()
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        params: Optional[Dict[str, Any]] = None,
+        doc_filter=None,
+    ) -> List[Dict]:
+        row_ordinals = self._ordinals()
+        selection = self._selection(doc_filter) if doc_filter is not None else None
+
+        hits = self.vector_index.search_rows(query, top_k, params=params, selection=selection)
+        return self._results(hits, row_ordinals)
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int,
+        params: Optional[Dict[str, Any]] = None,
+        doc_filter=None,
+    ) -> List[List[Dict]]:
+        """
+        search() for a batch: one embed_batch call, one matrix FAISS search.
+        """
+        row_ordinals = self._ordinals()
+        selection = self._selection(doc_filter) if doc_filter is not None else None
+
+        all_hits = self.vector_index.search_rows_many(queries, top_k, params=params, selection=selection)
+        return [self._results(hits, row_ordinals) for hits in all_hits]
 
-        # Map id -> doc
-        doc_map = self._doc_map_by_id()
+    def score_documents(self, query: str, ordinals: List[int]) -> np.ndarray:
+        """
+        Exact cosine of the query against the stored embeddings of the
+        given documents (NaN for documents without a vector).
+        """
+        return self.score_documents_many([query], [ordinals])[0]
 
+    def score_documents_many(self, queries: List[str], ordinals_per_query: List[List[int]]) -> List[np.ndarray]:
+        self._ordinals()
+        ordinal_rows = self._ordinal_rows
+
+        rows_per_query = []
+        for ordinals in ordinals_per_query:
+            ordinals = np.asarray(ordinals, dtype=np.int64)
+            rows_per_query.append(ordinal_rows[ordinals] if ordinals.size else ordinals)
+
+        scored = self.vector_index.score_rows_many(
+            queries, [rows[rows >= 0] for rows in rows_per_query]
+        )
+
+        out = []
+        for rows, scores in zip(rows_per_query, scored):
+            full = np.full(len(rows), np.nan, dtype=np.float32)
+            full[rows >= 0] = scores
+            out.append(full)
+        return out
+
+    def _results(self, hits, row_ordinals: np.ndarray) -> List[Dict]:
         results: List[Dict] = []
-        for doc_id, score in hits:
-            doc = doc_map.get(doc_id)
-            if not doc:
+        for row, score in hits:
+            ordinal = int(row_ordinals[row])
+            if ordinal < 0:
                 continue
             results.append(
                 {
-                    "document": doc,
+                    "document": self._docs[ordinal],
                     "score": score,
                     "matched_terms": [],  # semantic doesn't do token matches
+                    "ordinal": ordinal,
                 }
             )
         return results
 
-    def _doc_map_by_id(self) -> Dict[str, Any]:
+    def _ordinals(self) -> np.ndarray:
+        if self._row_ordinals is None:
+            self._docs = self._documents()
+            self._row_ordinals = self.vector_index.bind_ordinals(self._ordinal_lookup())
+
+            known = self._row_ordinals >= 0
+            ordinal_rows = np.full(len(self._docs), -1, dtype=np.int64)
+            ordinal_rows[self._row_ordinals[known]] = np.flatnonzero(known)
+            self._ordinal_rows = ordinal_rows
+        return self._row_ordinals
+
+    def _selection(self, doc_filter) -> RowSelection:
+        """
+        The filter's document bitmap translated to FAISS rows (cached per filter).
+        """
+        selection = self._selections.get(doc_filter.key)
+        if selection is None:
+            row_ordinals = self._ordinals()
+            known = row_ordinals >= 0
+            mask = np.zeros(len(row_ordinals), dtype=bool)
+            mask[known] = doc_filter.mask[row_ordinals[known]]
+            selection = RowSelection.from_mask(mask)
+            self._selections.put(doc_filter.key, selection)
+        return selection
+
+    def _ordinal_lookup(self):
+        if hasattr(self.index_memory, "ordinal"):
+            return self.index_memory.ordinal
+
+        ordinals: Dict[str, int] = {}
+        for i, d in enumerate(self._docs):
+            ordinals.setdefault(str(getattr(d, "id", None)), i)
+        return ordinals.get
+
+    def _documents(self) -> List[Any]:
         # Robust: support index_memory.documents, index_memory._documents, or iterator
         docs = []
         if hasattr(self.index_memory, "documents"):
@@ -44,8 +147,4 @@ class VectorRetriever:
             docs = self.index_memory.all()
         else:
             raise RuntimeError("IndexMemory does not expose documents (documents/_documents/get_documents/all).")
-
-        out: Dict[str, Any] = {}
-        for d in docs:
-            out[str(getattr(d, "id", None))] = d
-        return out
+        return docs
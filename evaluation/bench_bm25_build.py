@@ -0,0 +1,113 @@
+"""
+Serial vs parallel BM25 build: build time per worker count, and a check
+that every output is byte-identical to the serial build.
+
+Compared: the vocabulary (terms and ids, in order), term_offsets,
+post_docs, post_tfs, doc_len, idf and length_norm, plus positions /
+token spans when --positions is given. Besides the process-pool builds
+(--workers), hand-split uneven chunks (one document, a few documents,
+odd sizes) are merged directly with merge_partials. Exits non-zero on
+any difference.
+
+Usage:
+    python evaluation/bench_bm25_build.py [--dataset PATH] [--limit N] [--workers 1,2,3,4] [--positions]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.core.config import ACTIVE_DOMAIN, DATA_DIR, DATASET_FILE  # noqa: E402
+from app.domain.registry import DomainRegistry  # noqa: E402
+from app.ingest.loader import load_json_dataset  # noqa: E402
+from app.ingest.normalize import normalize_documents  # noqa: E402
+from app.retrieval.bm25_build import MIN_DOCS_PER_WORKER, build_partial, merge_partials  # noqa: E402
+from app.retrieval.bm25_index import BM25Index  # noqa: E402
+
+ARRAYS = ["term_offsets", "post_docs", "post_tfs", "doc_len", "idf", "length_norm"]
+POSITION_ARRAYS = ["positions", "token_starts", "token_ends"]
+
+
+def differences(index, reference, positions):
+    """
+    Names of the outputs that differ from the reference build.
+    """
+    diff = []
+    if list(index.vocab.items()) != list(reference.vocab.items()):
+        diff.append("vocab")
+
+    for name in ARRAYS + (POSITION_ARRAYS if positions else []):
+        a = getattr(index, name)
+        b = getattr(reference, name)
+        if a.dtype != b.dtype or a.shape != b.shape or a.tobytes() != b.tobytes():
+            diff.append(name)
+    return diff
+
+
+def uneven_chunks(texts, rng):
+    """
+    Chunk boundaries that no worker count would produce.
+    """
+    n = len(texts)
+    cuts = {1, min(n, 8), n // 3, n // 3 + 1, n - 1}
+    cuts.update(rng.randrange(1, n) for _ in range(5))
+    bounds = [0] + sorted(c for c in cuts if 0 < c < n) + [n]
+    return [texts[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", type=Path, default=DATA_DIR / DATASET_FILE)
+    parser.add_argument("--limit", type=int, default=0, help="use only the first N documents")
+    parser.add_argument("--workers", default="1,2,3,4", help="comma-separated worker counts")
+    parser.add_argument("--positions", action="store_true", help="also build and compare positions")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    raw = load_json_dataset(args.dataset)
+    if args.limit:
+        raw = raw[: args.limit]
+
+    documents = normalize_documents(raw, DomainRegistry.get_adapter(ACTIVE_DOMAIN))
+    texts = [doc.text or "" for doc in documents]
+    print(f"Documents: {len(texts)} | positions: {args.positions}")
+    print(f"(pool builds need {MIN_DOCS_PER_WORKER} documents per worker, fewer run serially)\n")
+
+    start = time.perf_counter()
+    reference = BM25Index.from_texts(texts, workers=1, positions=args.positions)
+    print(f"{'build':<14} {'seconds':>8}  differences")
+    print(f"{'serial':<14} {time.perf_counter() - start:>8.2f}  -")
+
+    failed = False
+    for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        start = time.perf_counter()
+        index = BM25Index.from_texts(texts, workers=workers, positions=args.positions)
+        elapsed = time.perf_counter() - start
+
+        diff = differences(index, reference, args.positions)
+        failed = failed or bool(diff)
+        print(f"{f'workers={workers}':<14} {elapsed:>8.2f}  {', '.join(diff) or 'none'}")
+
+    chunks = uneven_chunks(texts, random.Random(args.seed))
+    start = time.perf_counter()
+    merged = merge_partials([build_partial(chunk, positions=args.positions) for chunk in chunks])
+    index = BM25Index._from_merged(merged)
+    elapsed = time.perf_counter() - start
+
+    diff = differences(index, reference, args.positions)
+    failed = failed or bool(diff)
+    print(f"{f'uneven x{len(chunks)}':<14} {elapsed:>8.2f}  {', '.join(diff) or 'none'}")
+    print("  chunk sizes: " + " ".join(str(len(c)) for c in chunks))
+
+    if failed:
+        print("\nparallel build differs from the serial build")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark BM25 execution strategies on session-enhanced queries.
+
+Compares exhaustive scoring with block-max dynamic pruning:
+postings evaluated per query, latency and top-k agreement.
+
+Usage:
+    python evaluation/bench_bm25_pruning.py [--dataset PATH] [--limit N]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.core.config import ACTIVE_DOMAIN, DATA_DIR, DATASET_FILE, TOP_K  # noqa: E402
+from app.domain.registry import DomainRegistry  # noqa: E402
+from app.index.index_memory import IndexMemory  # noqa: E402
+from app.ingest.loader import load_json_dataset  # noqa: E402
+from app.ingest.normalize import normalize_documents  # noqa: E402
+from app.memory.session_memory import SessionMemory  # noqa: E402
+from app.retrieval.bm25_retriever import BM25Retriever  # noqa: E402
+from app.retrieval.tokenizer import tokenize  # noqa: E402
+
+TEST_CASES_PATH = BASE_DIR / "evaluation" / "test_cases.json"
+
+STRATEGIES = ["exhaustive", "blockmax"]
+
+
+def session_queries_from_tests():
+    """
+    Replays every test session through SessionMemory and keeps the
+    enhanced query of each step, like SearchService does.
+    """
+    with open(TEST_CASES_PATH, "r", encoding="utf-8") as f:
+        tests = json.load(f)
+
+    queries = []
+    for test in tests:
+        memory = SessionMemory()
+        for step in test.get("steps", []):
+            memory.store_query("bench", step)
+            memory.store_terms("bench", step.split())
+            queries.append(memory.build_enhanced_query("bench", step))
+    return queries
+
+
+def sampled_session_queries(documents, count, rng):
+    """
+    Long queries made of 15-30 tokens taken from random documents,
+    mimicking step 4+ of a refinement session.
+    """
+    queries = []
+    while len(queries) < count:
+        tokens = tokenize(rng.choice(documents).text or "")
+        if len(tokens) < 15:
+            continue
+        size = rng.randint(15, min(30, len(tokens)))
+        queries.append(" ".join(rng.sample(tokens, size)))
+    return queries
+
+
+def run_strategy(retriever, queries, strategy, top_k, repeat):
+    latencies = []
+    evaluated = []
+    results = []
+
+    for q in queries:
+        best = None
+        for _ in range(repeat):
+            stats = {}
+            start = time.perf_counter()
+            hits = retriever.search(q, top_k, strategy=strategy, stats=stats)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        latencies.append(best * 1000.0)
+        evaluated.append(stats.get("evaluated", 0))
+        results.append([h["document"].id for h in hits])
+
+    return latencies, evaluated, results
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", type=Path, default=DATA_DIR / DATASET_FILE)
+    parser.add_argument("--limit", type=int, default=0, help="use only the first N documents")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--sampled", type=int, default=200, help="number of sampled long queries")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    raw = load_json_dataset(args.dataset)
+    if args.limit:
+        raw = raw[: args.limit]
+
+    documents = normalize_documents(raw, DomainRegistry.get_adapter(ACTIVE_DOMAIN))
+    index_memory = IndexMemory()
+    index_memory.load_documents(documents)
+
+    start = time.perf_counter()
+    retriever = BM25Retriever(index_memory=index_memory, strategy="blockmax")
+    retriever.build()
+    print(f"Indexed {len(documents)} documents in {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(args.seed)
+    queries = session_queries_from_tests() + sampled_session_queries(documents, args.sampled, rng)
+    lengths = [len(tokenize(q)) for q in queries]
+    print(f"Queries: {len(queries)} | mean length {statistics.mean(lengths):.1f} tokens\n")
+
+    baseline = None
+    print(f"{'strategy':<12} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'evaluated':>12} {'agree':>7}")
+
+    for strategy in STRATEGIES:
+        latencies, evaluated, results = run_strategy(
+            retriever, queries, strategy, args.top_k, args.repeat
+        )
+        if baseline is None:
+            baseline = results
+
+        agree = sum(r == b for r, b in zip(results, baseline)) / len(queries)
+
+        print(
+            f"{strategy:<12} "
+            f"{statistics.mean(latencies):>9.3f} "
+            f"{percentile(latencies, 50):>9.3f} "
+            f"{percentile(latencies, 95):>9.3f} "
+            f"{statistics.mean(evaluated):>12.0f} "
+            f"{agree:>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
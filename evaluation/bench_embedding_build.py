@@ -0,0 +1,90 @@
+"""
+Benchmark corpus embedding throughput of VectorIndex.build_and_save.
+
+Compares dataset-order batches (sort_window=1, the previous behaviour)
+with length-bucketed batches, in documents per second on CPU.
+
+Usage:
+    python evaluation/bench_embedding_build.py [--limit N] [--windows 1 8 32]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.core.config import ACTIVE_DOMAIN, DATA_DIR, DATASET_FILE  # noqa: E402
+from app.domain.registry import DomainRegistry  # noqa: E402
+from app.ingest.loader import load_json_dataset  # noqa: E402
+from app.ingest.normalize import normalize_documents  # noqa: E402
+from app.retrieval.local_embedding_client import LocalEmbeddingClient  # noqa: E402
+from app.retrieval.vector_index import VectorIndex, VectorIndexArtifacts  # noqa: E402
+
+
+def run_build(client, documents, sort_window, batch_size, max_chars):
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        artifacts = VectorIndexArtifacts(
+            embeddings_path=tmp / "embeddings.npy",
+            faiss_index_path=tmp / "faiss.index",
+            id_map_path=tmp / "id_map.npy",
+        )
+        vindex = VectorIndex(client=client, artifacts=artifacts)
+
+        start = time.perf_counter()
+        vindex.build_and_save(
+            documents=documents,
+            text_getter=lambda d: getattr(d, "text", "") or "",
+            id_getter=lambda d: getattr(d, "id", ""),
+            force_rebuild=True,
+            batch_size=batch_size,
+            max_chars=max_chars,
+            sort_window=sort_window,
+        )
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", type=Path, default=DATA_DIR / DATASET_FILE)
+    parser.add_argument("--limit", type=int, default=5000, help="use only the first N documents")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--max-chars", type=int, default=2000)
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    raw = load_json_dataset(args.dataset)
+    if args.limit:
+        raw = raw[: args.limit]
+    documents = normalize_documents(raw, DomainRegistry.get_adapter(ACTIVE_DOMAIN))
+
+    client = LocalEmbeddingClient(model_name=args.model, device="cpu")
+
+    # warm-up: model load, first-call allocations
+    client.embed_batch(["warm up"] * 8, batch_size=8)
+
+    results = []
+    for window in args.windows:
+        elapsed = run_build(client, documents, window, args.batch_size, args.max_chars)
+        results.append((window, elapsed))
+
+    print(f"\nDocuments: {len(documents)} | batch size {args.batch_size}\n")
+    print(f"{'sort_window':>12} {'seconds':>10} {'docs/s':>10} {'speedup':>9}")
+
+    baseline = results[0][1]
+    for window, elapsed in results:
+        print(
+            f"{window:>12} "
+            f"{elapsed:>10.2f} "
+            f"{len(documents) / elapsed:>10.1f} "
+            f"{baseline / elapsed:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
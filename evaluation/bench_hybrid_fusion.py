@@ -0,0 +1,111 @@
+"""
+Benchmark hybrid fusion strategies with fixed and adaptive candidate depth.
+
+For every fusion (weighted, rrf, zscore) compares the fixed top_k * 5
+depth with adaptive depth: candidates fetched per query, fetch rounds,
+latency and top-k agreement with a deep fixed fetch (top_k * max_depth)
+of the same fusion: same documents in the same order with the same
+scores. Adaptive depth must agree on every query; --check exits non-zero
+when it does not.
+
+Usage:
+    python evaluation/bench_hybrid_fusion.py [--limit N] [--top-k K] [--check]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.core.config import ACTIVE_DOMAIN, DATA_DIR, DATASET_FILE, TOP_K  # noqa: E402
+from app.domain.registry import DomainRegistry  # noqa: E402
+from app.index.index_memory import IndexMemory  # noqa: E402
+from app.ingest.loader import load_json_dataset  # noqa: E402
+from app.ingest.normalize import normalize_documents  # noqa: E402
+from app.retrieval.factory import create_retriever  # noqa: E402
+from app.retrieval.hybrid_retriever import HybridRetriever  # noqa: E402
+
+from bench_bm25_pruning import percentile, session_queries_from_tests  # noqa: E402
+
+FUSIONS = ["weighted", "rrf", "zscore"]
+
+
+def run(hybrid, queries, top_k):
+    latencies = []
+    candidates = []
+    rounds = []
+    results = []
+
+    for q in queries:
+        stats = {}
+        start = time.perf_counter()
+        hits = hybrid.search(q, top_k, stats=stats)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+        candidates.append(sum(stats["candidates"].values()))
+        rounds.append(stats["rounds"])
+        results.append([(h["document"].id, round(h["score"], 9)) for h in hits])
+
+    return latencies, candidates, rounds, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", type=Path, default=DATA_DIR / DATASET_FILE)
+    parser.add_argument("--limit", type=int, default=0, help="use only the first N queries")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--check", action="store_true", help="fail if adaptive differs from the deep fetch")
+    args = parser.parse_args()
+
+    raw = load_json_dataset(args.dataset)
+    adapter = DomainRegistry.get_adapter(ACTIVE_DOMAIN)
+    index_memory = IndexMemory()
+    index_memory.load_documents(normalize_documents(raw, adapter), adapter)
+
+    # loads (or builds) the cached indexes under data/
+    router = create_retriever(index_memory, DATA_DIR, default_mode="hybrid", dataset_path=args.dataset)
+
+    queries = session_queries_from_tests()
+    if args.limit:
+        queries = queries[: args.limit]
+    print(f"Queries: {len(queries)} | top_k {args.top_k}\n")
+
+    print(
+        f"{'fusion':<10} {'depth':<9} {'mean ms':>9} {'p95 ms':>9} "
+        f"{'candidates':>11} {'rounds':>7} {'agree':>7}"
+    )
+
+    failed = []
+    for fusion in FUSIONS:
+        deep = HybridRetriever(router.bm25, router.vector, fusion=fusion)
+        deep.depth = deep.max_depth
+        _, _, _, baseline = run(deep, queries, args.top_k)
+
+        for label, adaptive in (("fixed", False), ("adaptive", True)):
+            hybrid = HybridRetriever(router.bm25, router.vector, fusion=fusion, adaptive=adaptive)
+            latencies, candidates, rounds, results = run(hybrid, queries, args.top_k)
+            agree = sum(r == b for r, b in zip(results, baseline)) / len(queries)
+
+            print(
+                f"{fusion:<10} {label:<9} "
+                f"{statistics.mean(latencies):>9.3f} "
+                f"{percentile(latencies, 95):>9.3f} "
+                f"{statistics.mean(candidates):>11.0f} "
+                f"{statistics.mean(rounds):>7.2f} "
+                f"{agree:>7.1%}"
+            )
+            if adaptive and agree < 1.0:
+                failed.append(fusion)
+
+    if failed:
+        print(f"\nadaptive differs from the deep fetch: {', '.join(failed)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+English detection on short queries (Translator.is_english, no LLM calls):
+
+  English sent : English queries that would go to the LLM translator
+  other kept   : non-English queries that would skip it (untranslated)
+
+  langdetect : langdetect alone (wordlist_max_words=0)
+  wordlist   : English cooking wordlist check in front of langdetect
+
+The non-English set includes queries made of words a recipe corpus
+vocabulary holds ("pollo con queso", "arroz con leche"): they must still
+be sent.
+
+Usage:
+    python evaluation/bench_language_detection.py [--verbose]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.ai.translator import Translator  # noqa: E402
+from app.core.config import TRANSLATE_MIN_EN_PROB, TRANSLATE_WORDLIST_MAX_WORDS  # noqa: E402
+
+ENGLISH = [
+    "pasta",
+    "salmon",
+    "tuna",
+    "apple pie",
+    "beef stew",
+    "vegan lasagna",
+    "banana bread",
+    "chicken curry",
+    "tomato soup",
+    "garlic bread",
+    "pancakes",
+    "chocolate cake",
+    "fried rice",
+    "lemon chicken",
+    "pumpkin soup",
+    "meatballs",
+    "egg salad",
+    "lamb chops",
+    "pork ribs",
+    "rice pudding",
+    "beef tacos",
+    "corn bread",
+    "chicken coconut garlic",
+    "spicy pork noodles",
+    "quick vegetarian chili",
+    "easy oatmeal cookies",
+    "gluten free brownies",
+    "chicken and rice",
+    "slow cooker pulled pork sandwiches",
+    "something quick with chicken and rice for dinner",
+]
+
+NON_ENGLISH = [
+    "pollo con queso",
+    "arroz con leche",
+    "pollo al horno",
+    "pollo asado",
+    "pollo en salsa",
+    "carne asada",
+    "huevos rancheros",
+    "pan de queso",
+    "sopa de tomate",
+    "tortilla de patatas",
+    "frijoles negros",
+    "salsa verde",
+    "pasta al forno",
+    "pasta e fagioli",
+    "torta di mele",
+    "zuppa di pesce",
+    "insalata di riso",
+    "pesce spada",
+    "pommes frites",
+    "soupe de poisson",
+    "gateau au chocolat",
+    "riz au lait",
+    "kip met rijst",
+    "kyckling med kokos",
+    "köttbullar",
+    "vitlöksbröd",
+    "hähnchen mit reis",
+    "kartoffelsalat",
+    "poulet rôti",
+    "kurczak z ryżem",
+    "något snabbt med kyckling till middag",
+    "receta fácil de pollo para la cena",
+]
+
+
+def run(translator, queries):
+    kept = []
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        english = translator.is_english(q)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        if english:
+            kept.append(q)
+    return kept, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verbose", action="store_true", help="list the misclassified queries")
+    args = parser.parse_args()
+
+    print(f"Queries: {len(ENGLISH)} English, {len(NON_ENGLISH)} non-English\n")
+
+    modes = {
+        "langdetect": Translator(cache_mb=1, min_en_prob=TRANSLATE_MIN_EN_PROB, wordlist_max_words=0),
+        "wordlist": Translator(
+            cache_mb=1,
+            min_en_prob=TRANSLATE_MIN_EN_PROB,
+            wordlist_max_words=TRANSLATE_WORDLIST_MAX_WORDS,
+        ),
+    }
+
+    # langdetect loads its language profiles on the first call
+    modes["langdetect"].is_english("warm up")
+
+    print(f"{'mode':<11} {'English sent':>14} {'other kept':>13} {'mean us':>9}")
+    for label, translator in modes.items():
+        kept_en, lat_en = run(translator, ENGLISH)
+        kept_other, lat_other = run(translator, NON_ENGLISH)
+        sent = [q for q in ENGLISH if q not in kept_en]
+
+        print(
+            f"{label:<11} "
+            f"{len(sent):>5} ({len(sent) / len(ENGLISH):>5.1%}) "
+            f"{len(kept_other):>5} ({len(kept_other) / len(NON_ENGLISH):>5.1%}) "
+            f"{statistics.mean(lat_en + lat_other):>9.0f}"
+        )
+        if args.verbose:
+            for q in sent:
+                print(f"    sent: {q}")
+            for q in kept_other:
+                print(f"    kept: {q}")
+
+
+if __name__ == "__main__":
+    main()
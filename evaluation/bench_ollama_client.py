@@ -0,0 +1,126 @@
+"""
+Benchmark the pooled Ollama client against per-call requests.post,
+using the local stand-in server (fake_ollama.py) with fixed latency.
+
+Sends the translator's generate payload straight through each client
+(no language detection / cache) and compares wall time, throughput and
+TCP connections opened for:
+  requests  : requests.post per call (one connection each)
+  sync      : OllamaClient.post from a thread pool (keep-alive pool)
+  async     : OllamaClient.apost, all calls awaited concurrently
+With --fail-rate > 0 the server answers some calls with 503; "retried"
+counts the jittered retries and "failed" the calls that still failed.
+
+Usage:
+    python evaluation/bench_ollama_client.py [--calls 200] [--concurrency 16] [--latency-ms 50] [--fail-rate 0.1]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+import requests
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.ai.ollama_client import OllamaClient  # noqa: E402
+from app.ai.translator import Translator  # noqa: E402
+
+from fake_ollama import FakeOllamaServer  # noqa: E402
+
+
+def payloads(n):
+    # distinct prompts, same shape as the translator's generate calls
+    translator = Translator()
+    return [translator._payload(f"kyckling med kokos och vitlök {i}") for i in range(n)]
+
+
+def ok(status, body):
+    return status == 200 and "response" in body
+
+
+def run_requests(server, payloads, concurrency):
+    url = f"{server.url}/api/generate"
+
+    def one(payload):
+        try:
+            response = requests.post(url, json=payload, timeout=30)
+            return ok(response.status_code, response.json())
+        except requests.RequestException:
+            return False
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(one, payloads))
+
+
+def run_sync(client, payloads, concurrency):
+
+    def one(payload):
+        try:
+            response = client.post("/api/generate", payload)
+            return ok(response.status_code, response.json())
+        except httpx.HTTPError:
+            return False
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(one, payloads))
+
+
+async def run_async(client, payloads, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(payload):
+        async with limit:
+            try:
+                response = await client.apost("/api/generate", payload)
+                return ok(response.status_code, response.json())
+            except httpx.HTTPError:
+                return False
+
+    try:
+        return await asyncio.gather(*(one(p) for p in payloads))
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    calls = payloads(args.calls)
+    print(f"{'client':<10} {'wall s':>8} {'calls/s':>9} {'connections':>12} {'retried':>8} {'failed':>7}")
+
+    for label in ("requests", "sync", "async"):
+        server = FakeOllamaServer(latency_ms=args.latency_ms, fail_rate=args.fail_rate).start()
+        client = OllamaClient(server.url, max_connections=args.concurrency, max_keepalive=args.concurrency)
+
+        start = time.perf_counter()
+        if label == "requests":
+            results = run_requests(server, calls, args.concurrency)
+        elif label == "sync":
+            results = run_sync(client, calls, args.concurrency)
+        else:
+            results = asyncio.run(run_async(client, calls, args.concurrency))
+        wall = time.perf_counter() - start
+
+        client.close()
+        server.stop()
+
+        retried = "-" if label == "requests" else client.retried
+        print(
+            f"{label:<10} {wall:>8.2f} {args.calls / wall:>9.1f} "
+            f"{server.counts['connections']:>12} {retried:>8} {results.count(False):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark embedding backends: torch, ONNX Runtime and ONNX int8.
+
+Parity against the torch backend (cosine of each vector with the torch
+one, top-k agreement of corpus search), single-query latency and batch
+throughput on CPU.
+
+Usage:
+    python evaluation/bench_onnx_embedding.py [--limit N] [--queries N]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.core.config import ACTIVE_DOMAIN, DATA_DIR, DATASET_FILE  # noqa: E402
+from app.domain.registry import DomainRegistry  # noqa: E402
+from app.ingest.loader import load_json_dataset  # noqa: E402
+from app.ingest.normalize import normalize_documents  # noqa: E402
+from app.retrieval.embedding_backend import EMBED_BACKENDS, create_embedding_client  # noqa: E402
+
+
+def sampled_queries(documents, count, rng):
+    """
+    Short queries (2-6 words) taken from random documents.
+    """
+    queries = []
+    while len(queries) < count:
+        words = (rng.choice(documents).text or "").split()
+        if len(words) < 2:
+            continue
+        size = rng.randint(2, min(6, len(words)))
+        start = rng.randint(0, len(words) - size)
+        queries.append(" ".join(words[start : start + size]))
+    return queries
+
+
+def single_query_latencies(client, queries):
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        client.embed_batch([q], batch_size=1)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", type=Path, default=DATA_DIR / DATASET_FILE)
+    parser.add_argument("--limit", type=int, default=2000, help="use only the first N documents")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--max-chars", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (0 = library default)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backends", nargs="+", default=list(EMBED_BACKENDS))
+    args = parser.parse_args()
+
+    raw = load_json_dataset(args.dataset)
+    if args.limit:
+        raw = raw[: args.limit]
+    documents = normalize_documents(raw, DomainRegistry.get_adapter(ACTIVE_DOMAIN))
+    texts = [" ".join((d.text or "").split())[: args.max_chars] for d in documents]
+
+    queries = sampled_queries(documents, args.queries, random.Random(args.seed))
+    print(f"Documents: {len(texts)} | queries: {len(queries)} | batch size {args.batch_size}\n")
+
+    rows = []
+    reference = None
+
+    for backend in args.backends:
+        client = create_embedding_client(
+            model_name=args.model,
+            backend=backend,
+            onnx_dir=DATA_DIR / "onnx",
+            threads=args.threads or None,
+        )
+
+        # warm-up: session / model init, first-call allocations
+        client.embed_batch(queries[:8], batch_size=8)
+
+        latencies = single_query_latencies(client, queries)
+
+        start = time.perf_counter()
+        corpus = client.embed_batch(texts, batch_size=args.batch_size)
+        batch_seconds = time.perf_counter() - start
+
+        query_vectors = client.embed_batch(queries, batch_size=args.batch_size)
+        top = np.argsort(-(query_vectors @ corpus.T), axis=1)[:, : args.top_k]
+
+        if reference is None:
+            reference = (corpus, top)
+
+        ref_corpus, ref_top = reference
+        cosines = np.sum(corpus * ref_corpus, axis=1)
+        overlap = np.mean([
+            len(set(a) & set(b)) / args.top_k for a, b in zip(top, ref_top)
+        ])
+
+        rows.append((
+            backend,
+            statistics.mean(latencies),
+            percentile(latencies, 50),
+            percentile(latencies, 95),
+            len(texts) / batch_seconds,
+            float(cosines.min()),
+            float(cosines.mean()),
+            overlap,
+        ))
+
+    print(
+        f"{'backend':<10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'docs/s':>9} {'min cos':>9} {'mean cos':>9} {'top-k':>7}"
+    )
+    for backend, mean_ms, p50, p95, docs_s, min_cos, mean_cos, overlap in rows:
+        print(
+            f"{backend:<10} "
+            f"{mean_ms:>9.3f} "
+            f"{p50:>9.3f} "
+            f"{p95:>9.3f} "
+            f"{docs_s:>9.1f} "
+            f"{min_cos:>9.5f} "
+            f"{mean_cos:>9.5f} "
+            f"{overlap:>7.1%}"
+        )
+    print(f"\nParity is measured against {args.backends[0]}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Burst of concurrent identical queries against the local stand-in server
+(fake_ollama.py): how many translation / embedding calls reach it.
+
+--calls callers start together, each with one of --distinct texts
+(non-English, so every translation needs the LLM). Without coalescing
+every caller that misses the cache sends its own request; with it, the
+server sees one request per distinct text.
+
+  translate  : Translator.translate from a thread pool
+  atranslate : Translator.atranslate, all awaited concurrently
+  embed      : CachedEmbeddingClient(OllamaEmbeddingClient).embed from a thread pool
+
+Usage:
+    python evaluation/bench_single_flight.py [--calls 64] [--distinct 4] [--latency-ms 200]
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.ai.ollama_client import OllamaClient  # noqa: E402
+from app.ai.translator import Translator  # noqa: E402
+from app.retrieval.cached_embedding_client import CachedEmbeddingClient  # noqa: E402
+from app.retrieval.embedding_client import OllamaEmbeddingClient  # noqa: E402
+
+from fake_ollama import FakeOllamaServer  # noqa: E402
+
+
+def texts(calls, distinct):
+    return [f"kyckling med kokos och vitlök nummer {i % distinct}" for i in range(calls)]
+
+
+def burst(fn, items):
+    # all callers released at once, like a spike of one popular query
+    gate = threading.Barrier(len(items))
+
+    def one(item):
+        gate.wait()
+        return fn(item)
+
+    with ThreadPoolExecutor(len(items)) as pool:
+        return list(pool.map(one, items))
+
+
+def run_translate(server, items):
+    translator = Translator(client=OllamaClient(server.url, max_connections=len(items)))
+    burst(translator.translate, items)
+    return translator.stats()["coalesced"]
+
+
+def run_atranslate(server, items):
+    client = OllamaClient(server.url, max_connections=len(items))
+    translator = Translator(client=client)
+
+    async def run():
+        try:
+            await asyncio.gather(*(translator.atranslate(t) for t in items))
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    return translator.stats()["coalesced"]
+
+
+def run_embed(server, items):
+    embedder = CachedEmbeddingClient(OllamaEmbeddingClient(base_url=server.url))
+    burst(embedder.embed, items)
+    return embedder.stats()["coalesced"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=64)
+    parser.add_argument("--distinct", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    items = texts(args.calls, args.distinct)
+    print(f"Calls: {args.calls} | distinct texts: {args.distinct} | server latency {args.latency_ms} ms\n")
+    print(f"{'path':<11} {'wall s':>8} {'server requests':>16} {'coalesced':>10}")
+
+    for label, run in (("translate", run_translate), ("atranslate", run_atranslate), ("embed", run_embed)):
+        server = FakeOllamaServer(latency_ms=args.latency_ms).start()
+        start = time.perf_counter()
+        coalesced = run(server, items)
+        wall = time.perf_counter() - start
+        server.stop()
+
+        print(f"{label:<11} {wall:>8.2f} {server.counts['requests']:>16} {coalesced:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark two-stage retrieval against hybrid on ingredient-list queries.
+
+two_stage: BM25 candidates ranked by exact cosine over the memory-mapped
+embeddings (no FAISS search). hybrid: BM25 + FAISS legs fused.
+Reports latency per mode and top-k overlap with hybrid.
+
+Usage:
+    python evaluation/bench_two_stage.py [--queries N] [--top-k K] [--repeat R]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.core.config import ACTIVE_DOMAIN, DATA_DIR, DATASET_FILE, TOP_K  # noqa: E402
+from app.domain.registry import DomainRegistry  # noqa: E402
+from app.index.index_memory import IndexMemory  # noqa: E402
+from app.ingest.loader import load_json_dataset  # noqa: E402
+from app.ingest.normalize import normalize_documents  # noqa: E402
+from app.retrieval.factory import create_retriever  # noqa: E402
+from app.retrieval.tokenizer import tokenize  # noqa: E402
+
+from bench_bm25_pruning import percentile  # noqa: E402
+
+MODES = ["hybrid", "two_stage"]
+
+
+def ingredient_queries(documents, count, rng):
+    """
+    3-6 ingredient words taken from the ingredient list of random recipes,
+    like SearchRequest.ingredients joined by the search service.
+    """
+    queries = []
+    while len(queries) < count:
+        ingredients = rng.choice(documents).metadata.get("ingredients") or ""
+        tokens = sorted(set(tokenize(str(ingredients))))
+        if len(tokens) < 3:
+            continue
+        queries.append(" ".join(rng.sample(tokens, rng.randint(3, min(6, len(tokens))))))
+    return queries
+
+
+def run_mode(router, queries, mode, top_k, repeat):
+    latencies = []
+    results = []
+
+    for q in queries:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            hits = router.search(q, top_k, mode=mode)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        latencies.append(best * 1000.0)
+        results.append({h["document"].id for h in hits})
+
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", type=Path, default=DATA_DIR / DATASET_FILE)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    raw = load_json_dataset(args.dataset)
+    adapter = DomainRegistry.get_adapter(ACTIVE_DOMAIN)
+    documents = normalize_documents(raw, adapter)
+    index_memory = IndexMemory()
+    index_memory.load_documents(documents, adapter)
+
+    # loads (or builds) the cached indexes under data/
+    router = create_retriever(index_memory, DATA_DIR, default_mode="hybrid", dataset_path=args.dataset)
+
+    queries = ingredient_queries(documents, args.queries, random.Random(args.seed))
+    print(f"Queries: {len(queries)} | top_k {args.top_k}\n")
+
+    # warm-up: query embeddings cached, pages mapped
+    for mode in MODES:
+        run_mode(router, queries[:20], mode, args.top_k, 1)
+
+    baseline = None
+    print(f"{'mode':<10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'overlap':>8}")
+
+    for mode in MODES:
+        latencies, results = run_mode(router, queries, mode, args.top_k, args.repeat)
+        if baseline is None:
+            baseline = results
+
+        overlap = statistics.mean(
+            len(r & b) / max(1, len(b)) for r, b in zip(results, baseline)
+        )
+
+        print(
+            f"{mode:<10} "
+            f"{statistics.mean(latencies):>9.3f} "
+            f"{percentile(latencies, 50):>9.3f} "
+            f"{percentile(latencies, 95):>9.3f} "
+            f"{overlap:>8.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
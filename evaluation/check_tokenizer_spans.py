@@ -0,0 +1,75 @@
+"""
+Checks that tokenize_spans() yields exactly the tokens of tokenize()
+(the positional index and the BM25 postings must agree) and that every
+span lies inside the text, in order. Runs over the dataset texts and a
+few strings whose lowercase form changes length ("İstanbul", "ΟΔΟΣ",
+"Straße"). Exits non-zero on the first mismatches.
+
+Usage:
+    python evaluation/check_tokenizer_spans.py [--dataset PATH] [--limit N]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.core.config import ACTIVE_DOMAIN, DATA_DIR, DATASET_FILE  # noqa: E402
+from app.domain.registry import DomainRegistry  # noqa: E402
+from app.ingest.loader import load_json_dataset  # noqa: E402
+from app.ingest.normalize import normalize_documents  # noqa: E402
+from app.retrieval.tokenizer import tokenize, tokenize_spans  # noqa: E402
+
+SAMPLES = [
+    "İstanbul kebab",
+    "aİb İ",
+    "ΟΔΟΣ ΣΟΦΙΑΣ",
+    "Straße and ﬁsh",
+    "Crème Brûlée",
+    "K Kelvin",
+    "Ǆemal ǅ",
+]
+
+
+def problems(text):
+    tokens, starts, ends = tokenize_spans(text)
+    if tokens != tokenize(text):
+        return f"tokens {tokens} != tokenize {tokenize(text)}"
+
+    previous = 0
+    for start, end in zip(starts, ends):
+        if not previous <= start < end <= len(text):
+            return f"bad span ({start}, {end})"
+        previous = end
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", type=Path, default=DATA_DIR / DATASET_FILE)
+    parser.add_argument("--limit", type=int, default=0, help="use only the first N documents")
+    args = parser.parse_args()
+
+    raw = load_json_dataset(args.dataset)
+    if args.limit:
+        raw = raw[: args.limit]
+    documents = normalize_documents(raw, DomainRegistry.get_adapter(ACTIVE_DOMAIN))
+    texts = SAMPLES + [doc.text or "" for doc in documents]
+
+    failures = []
+    for text in texts:
+        problem = problems(text)
+        if problem:
+            failures.append((text, problem))
+
+    print(f"Texts: {len(texts)} | mismatches: {len(failures)}")
+    for text, problem in failures[:10]:
+        print(f"  {text[:60]!r}: {problem}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
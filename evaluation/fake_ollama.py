@@ -0,0 +1,168 @@
+"""
+Local stand-in for the Ollama HTTP API, for testing the client layer
+without a model server.
+
+POST /api/generate    echoes the prompt's "Input:" section as the response
+POST /api/embeddings  deterministic unit vector per prompt
+GET  /stats           requests / connections / injected failures so far
+
+Every request waits --latency-ms (+ up to --jitter-ms); --fail-rate
+answers that share of requests with 503 (to exercise retries).
+Connections are HTTP/1.1 keep-alive, so pooling shows in "connections".
+
+Usage:
+    python evaluation/fake_ollama.py [--port 11434] [--latency-ms 200] [--fail-rate 0.1]
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+_INPUT_RE = re.compile(r"Input:\n(.*)\n\nOutput:", re.S)
+
+
+class FakeOllamaServer:
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        fail_rate: float = 0.0,
+        dim: int = 768,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.dim = dim
+
+        self.counts = {"requests": 0, "connections": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(0.0, self.jitter_ms)
+        return (self.latency_ms + jitter) / 1000.0
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.fail_rate
+
+    def generate(self, payload):
+        match = _INPUT_RE.search(payload.get("prompt", ""))
+        text = match.group(1).strip() if match else payload.get("prompt", "")
+        return {"model": payload.get("model"), "response": text, "done": True}
+
+    def embeddings(self, payload):
+        digest = hashlib.sha256(payload.get("prompt", "").encode("utf-8")).digest()
+        rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+        v = rng.standard_normal(self.dim)
+        return {"embedding": (v / np.linalg.norm(v)).tolist()}
+
+
+def _handler(server: FakeOllamaServer):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def setup(self):
+            super().setup()
+            server.count("connections")
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path != "/stats":
+                return self._send(404, {"error": "not found"})
+            with server._lock:
+                self._send(200, dict(server.counts))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            server.count("requests")
+
+            time.sleep(server.delay())
+
+            if server.should_fail():
+                server.count("failed")
+                return self._send(503, {"error": "server busy"})
+
+            if self.path == "/api/generate":
+                return self._send(200, server.generate(payload))
+            if self.path == "/api/embeddings":
+                return self._send(200, server.embeddings(payload))
+            self._send(404, {"error": "not found"})
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (timeout / closed pool)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        args.host, args.port, args.latency_ms, args.jitter_ms, args.fail_rate, args.dim
+    )
+    print(f"Fake Ollama on {server.url} (latency {args.latency_ms} ms, fail rate {args.fail_rate})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()